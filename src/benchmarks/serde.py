@@ -0,0 +1,143 @@
+"""
+Serialization throughput benchmark for trip and raw line packages.
+
+Usage (from the repository root):
+    PYTHONPATH=src:src/system python3 -m benchmarks.serde [records] [rounds]
+"""
+
+import sys
+import time
+from typing import Any, Callable
+
+from shared.serde import (
+    serialize,
+    deserialize,
+    deserializer,
+    binary_serializer,
+    binary_deserializer,
+)
+from common.messages import RecordType
+from common.messages.basic import BasicRecord, CityTrip
+from common.messages.comms import Package, CommsMessage
+from common.messages.raw import RawLines, RawRecord
+
+DEFAULT_RECORDS = 10000
+DEFAULT_ROUNDS = 10
+
+
+def trips_package(records: int) -> Package[CityTrip]:
+    trips = [
+        CityTrip(
+            city="montreal",
+            start_station_code=str(6000 + i % 500),
+            end_station_code=str(6100 + i % 500),
+            year="2016",
+        )
+        for i in range(records)
+    ]
+    return Package(trips, "montreal;1;0", "job")
+
+
+def lines_package(records: int) -> Package[RawRecord]:
+    lines = [
+        f"2016-04-15 00:{i % 60:02}:00,{6000 + i % 500},"
+        f"2016-04-15 01:{i % 60:02}:00,{6100 + i % 500},{i % 3600},0"
+        for i in range(records)
+    ]
+    columns = "start_date,start_station_code,end_date,end_station_code,duration_sec"
+    return Package([RawLines(RecordType.TRIP, "montreal", columns, lines)], "1", "job")
+
+
+def measure(name: str, records: int, rounds: int, func: Callable[[], Any]) -> None:
+    func()  # warm up, compiles the codecs
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<45} {records * rounds / elapsed:>12,.0f} records/s")
+
+
+def main() -> None:
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RECORDS
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ROUNDS
+
+    package = trips_package(records)
+    data = serialize(package)
+    decode_package = deserializer(Package[CityTrip])
+    decode_message = deserializer(CommsMessage[BasicRecord])  # type: ignore
+    encode_binary = binary_serializer(Package[CityTrip])
+    decode_binary = binary_deserializer(Package[CityTrip])
+    data_binary = encode_binary(package)
+    encode_columnar = binary_serializer(Package[CityTrip], columnar=True)
+    decode_columnar = binary_deserializer(Package[CityTrip], columnar=True)
+    data_columnar = encode_columnar(package)
+    print(
+        f"json: {len(data.encode()):,} bytes, binary: {len(data_binary):,} bytes,"
+        f" columnar: {len(data_columnar):,} bytes"
+    )
+
+    measure("serialize Package[CityTrip]", records, rounds, lambda: serialize(package))
+    measure(
+        "deserialize Package[CityTrip]",
+        records,
+        rounds,
+        lambda: deserialize(Package[CityTrip], data),
+    )
+    measure(
+        "deserializer(Package[CityTrip])",
+        records,
+        rounds,
+        lambda: decode_package(data),
+    )
+    measure(
+        "deserializer(CommsMessage[BasicRecord])",
+        records,
+        rounds,
+        lambda: decode_message(data),
+    )
+    measure(
+        "binary_serializer(Package[CityTrip])",
+        records,
+        rounds,
+        lambda: encode_binary(package),
+    )
+    measure(
+        "binary_deserializer(Package[CityTrip])",
+        records,
+        rounds,
+        lambda: decode_binary(data_binary),
+    )
+    measure(
+        "binary_serializer(..., columnar=True)",
+        records,
+        rounds,
+        lambda: encode_columnar(package),
+    )
+    measure(
+        "binary_deserializer(..., columnar=True)",
+        records,
+        rounds,
+        lambda: decode_columnar(data_columnar),
+    )
+
+    lines = lines_package(records)
+    lines_json = serialize(lines).encode()
+    lines_binary = binary_serializer(Package[RawRecord])(lines)
+    decode_lines = deserializer(Package[RawRecord])
+    decode_lines_binary = binary_deserializer(Package[RawRecord])
+    measure(
+        "deserializer(Package[RawRecord]) from bytes",
+        records,
+        rounds,
+        lambda: decode_lines(lines_json),
+    )
+    measure(
+        "binary_deserializer(Package[RawRecord])",
+        records,
+        rounds,
+        lambda: decode_lines_binary(memoryview(lines_binary)),
+    )
+
+
+if __name__ == "__main__":
+    main()
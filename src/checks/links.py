@@ -0,0 +1,202 @@
+"""
+Checks that the packages each stage sends are decoded as the same records by
+the stages that receive them, in every serialization. Binary union tags are
+hashes of the members' names, so every record sent must be a member of the
+receiver's in type.
+
+Usage (from the repository root):
+    PYTHONPATH=src:src/system python3 -m checks.links
+"""
+
+from functools import partial
+import sys
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from common.comms_base import Serialization
+from common.comms_base.serialization import body_decoder
+from common.messages import End, RecordType, Start, TripsStart
+from common.messages.aggregated import (
+    DateInfo,
+    PartialCityAverages,
+    PartialRainAverages,
+    PartialYearCounts,
+    StationInfo,
+)
+from common.messages.basic import (
+    BasicStation,
+    BasicWeather,
+    CityTrip,
+    RainTrip,
+    TripFilter,
+    YearTrip,
+)
+from common.messages.comms import Package
+from common.messages.joined import (
+    JoinedCityTrip,
+    JoinedRainTrip,
+    JoinedYearTrip,
+    StationNames,
+)
+from common.messages.raw import RawLines
+from common.messages.stats import CityAverages, RainAverages, YearCounts
+
+from aggregators.common.comms import AggregatorComms
+from input.comms import SystemCommunication as InputComms
+from joiners.common.comms import JoinerComms
+from output.comms import SystemCommunication as OutputComms
+from parsers.comms import SystemCommunication as ParserComms
+from reducers.common.comms import ReducerComms
+
+# Encodes the packages of a link
+Encoder = Callable[[Package[Any]], bytes]
+# name, sender's encoder in each serialization, receiver, records sent
+Link = tuple[str, Callable[[Serialization], Encoder], Callable[[], Any], list[Any]]
+
+PARSERS_EXCHANGE = "parsers"
+OUT_EXCHANGE = "out"
+
+
+def comms(comms_type: Any, *types: Any) -> Any:
+    """
+    Returns comms of the given type, with the given generic types, without
+    connecting to anything. Only their in and out types are used.
+    """
+    obj = object.__new__(comms_type)
+    obj.config = SimpleNamespace(parsers_exchange=PARSERS_EXCHANGE)
+    if types:
+        obj.__orig_class__ = comms_type[types]
+    return obj
+
+
+def sent_by(
+    make_comms: Callable[[], Any], exchange: str | None = OUT_EXCHANGE
+) -> Callable[[Serialization], Encoder]:
+    """
+    Returns the encoder of the comms for packages sent to the exchange, which
+    is None for comms with a single encoder
+    """
+
+    def encoder(serialization: Serialization) -> Encoder:
+        sender = make_comms()
+        sender.out_serialization = serialization
+        if exchange is None:
+            return sender.out_encoder  # type: ignore
+        return sender.out_encoder(exchange)  # type: ignore
+
+    return encoder
+
+
+def links() -> list[Link]:
+    station = BasicStation("1", "name", -73.5, 45.5, "2016", "montreal")
+    weather = BasicWeather("2016-01-01", 30.5, "montreal")
+    controls = [TripsStart("1"), End("1")]
+    pipelines = [
+        ("rain", RainTrip, JoinedRainTrip, PartialRainAverages),
+        ("year", YearTrip, JoinedYearTrip, PartialYearCounts),
+        ("city", CityTrip, JoinedCityTrip, PartialCityAverages),
+    ]
+    trips = {
+        "rain": RainTrip("2016-01-01", 30.5, "montreal"),
+        "year": YearTrip("montreal", "1", "2016"),
+        "city": CityTrip("montreal", "1", "2", "2016"),
+    }
+    joined = {
+        "rain": JoinedRainTrip(736000, 30.5),
+        "year": JoinedYearTrip(1, "2016"),
+        "city": JoinedCityTrip(1, (45.5, -73.5), (45.6, -73.6)),
+    }
+    aggregated = {
+        "rain": PartialRainAverages({736000: DateInfo(1, 30.5)}),
+        "year": PartialYearCounts({1: 2}, {1: 3}),
+        "city": PartialCityAverages({1: StationInfo(1, 6.5)}),
+    }
+    stats = {
+        "rain": RainAverages({"2016-01-01": 30.5}),
+        "year": YearCounts({"name": (1, 3)}),
+        "city": CityAverages({"name": 6.5}),
+    }
+
+    result: list[Link] = [
+        (
+            "input -> parsers",
+            sent_by(lambda: comms(InputComms), exchange=None),
+            lambda: comms(ParserComms),
+            [
+                RawLines(RecordType.TRIP, "montreal", "a,b", ["1,2"]),
+                Start("1"),
+                TripsStart("1"),
+                End("1"),
+            ],
+        )
+    ]
+    for name, trip, joined_trip, aggregated_type in pipelines:
+        result += [
+            (
+                f"parsers -> {name} joiners",
+                sent_by(lambda: comms(ParserComms)),
+                partial(comms, JoinerComms, joined_trip, trip),
+                [station, weather, trips[name], *controls],
+            ),
+            (
+                f"{name} joiners -> aggregators",
+                sent_by(partial(comms, JoinerComms, joined_trip, trip)),
+                partial(comms, AggregatorComms, joined_trip, aggregated_type),
+                [joined[name], Start("1"), StationNames(["name"]), End("1")],
+            ),
+            (
+                f"{name} joiners -> parsers",
+                sent_by(
+                    partial(comms, JoinerComms, joined_trip, trip), PARSERS_EXCHANGE
+                ),
+                lambda: comms(ParserComms),
+                [TripFilter(name, [["montreal", "1"]])],
+            ),
+            (
+                f"{name} aggregators -> reducer",
+                sent_by(partial(comms, AggregatorComms, joined_trip, aggregated_type)),
+                partial(comms, ReducerComms, aggregated_type),
+                [aggregated[name], StationNames(["name"]), End("1")],
+            ),
+            (
+                f"{name} reducer -> output",
+                sent_by(partial(comms, ReducerComms, aggregated_type)),
+                lambda: comms(OutputComms),
+                [stats[name]],
+            ),
+        ]
+    return result
+
+
+def check(link: Link, serialization: Serialization) -> str | None:
+    """
+    Sends the records of the link, together and one per package, and returns
+    the error if the receiver doesn't decode them as the same records
+    """
+    _, make_encoder, make_receiver, records = link
+    encode = make_encoder(serialization)
+    decode = body_decoder(Package[make_receiver().in_type])  # type: ignore
+    for messages in [records, *([x] for x in records)]:
+        package = Package(messages, "1;0", "job")
+        try:
+            decoded = decode(encode(package), serialization.content_type)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        if decoded != package:
+            return f"decoded {decoded.messages}, sent {messages}"
+    return None
+
+
+def main() -> None:
+    failed = False
+    for link in links():
+        for serialization in Serialization:
+            error = check(link, serialization)
+            status = "ok" if error is None else f"FAILED ({error})"
+            print(f"{link[0]:<32} {serialization:<10} {status}")
+            failed = failed or error is not None
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Checks that the states stored as a snapshot plus a log are restored as they
+were stored, when they're compacted in the middle of a save: stages store
+them once per record, so more entries are logged after a compaction before
+the save. The persistor writes to a temporary directory, and compacts after
+every few entries.
+
+Usage (from the repository root):
+    PYTHONPATH=src:src/system python3 -m checks.state
+"""
+
+import os
+import random
+import sys
+from tempfile import mkdtemp
+from typing import Any, Callable
+
+from common.persistence import StatePersistor, WithStateArrays, WithStateIncremental
+from common.persistence import persistor, state_snapshot
+
+# compacts once the log has more entries than this, or than the state
+COMPACT_MIN_ENTRIES = 2
+# updates of the state, and how many of them are saved at once
+UPDATES = 200
+UPDATES_PER_SAVE = 5
+
+# name, new state, applies an update to the state, value of the state
+Case = tuple[str, Callable[[], Any], Callable[[Any, int], None], Callable[[Any], Any]]
+
+
+def use_temporary_state() -> None:
+    """
+    Points the persistor to a temporary directory. Must be called before
+    it's first used.
+    """
+    base = mkdtemp()
+    persistor.PATH_BASE = base
+    persistor.PATH_BACKUP = os.path.join(base, "temp")
+    persistor.PATH_CURRENT = os.path.join(base, "current")
+    persistor.WAL_FILE = os.path.join(base, "wal.log")
+    persistor.STATUS_FILE = os.path.join(base, "status.txt")
+    state_snapshot.COMPACT_MIN_ENTRIES = COMPACT_MIN_ENTRIES
+
+
+def cases() -> list[Case]:
+    class Incremental(WithStateIncremental[str, int]):
+        pass
+
+    def update_incremental(state: Incremental, value: int) -> None:
+        key = "abc"[value % 3]
+        if value % 7 == 0:
+            state.state.pop(key, None)
+        else:
+            state.state[key] = value
+
+    class Arrays(WithStateArrays[int]):
+        pass
+
+    def update_arrays(state: Arrays, value: int) -> None:
+        state.add(value % 5, value / 10)
+
+    return [
+        ("incremental", Incremental, update_incremental, lambda x: dict(x.state)),
+        ("arrays", Arrays, update_arrays, lambda x: sorted(x.entries())),
+    ]
+
+
+def check(case: Case) -> str | None:
+    """
+    Updates the state, storing it after each update and saving it every few
+    ones, and returns the error if restoring it after a save gives a
+    different value
+    """
+    name, make, update, value = case
+    key = f"check_{name}"
+    state = make()
+    rng = random.Random(0)
+    for i in range(1, UPDATES + 1):
+        update(state, rng.randrange(1000))
+        state.store_to(key)
+        if i % UPDATES_PER_SAVE != 0:
+            continue
+        StatePersistor().save()
+        restored = make()
+        restored.restore_from(key)
+        if value(restored) != value(state):
+            return f"restored {value(restored)} after {i} updates, not {value(state)}"
+    return None
+
+
+def main() -> None:
+    use_temporary_state()
+    failed = False
+    for case in cases():
+        error = check(case)
+        status = "ok" if error is None else f"FAILED ({error})"
+        print(f"{case[0]:<16} {status}")
+        failed = failed or error is not None
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
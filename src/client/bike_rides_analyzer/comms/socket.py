@@ -23,7 +23,7 @@ class ClientSocket:
         self.__new_inner = new_inner
         self.last_sent = None
 
-    def recv(self) -> str:
+    def recv(self) -> memoryview:
         while True:
             try:
                 return self.inner.recv(timeout_ms=RESEND_AFTER_MS)
@@ -1,5 +1,12 @@
 from .internal.serialize import serialize
-from .internal.deserialize import deserialize
+from .internal.deserialize import deserialize, deserializer
+from .internal.trusted import trusted_deserializer
+from .internal.binary import (
+    serialize_binary,
+    deserialize_binary,
+    binary_serializer,
+    binary_deserializer,
+)
 from .internal.util import (
     SerdeError,
     resolve_generic_types,
@@ -10,6 +17,12 @@ from .internal.util import (
 __all__ = [
     "serialize",
     "deserialize",
+    "deserializer",
+    "trusted_deserializer",
+    "serialize_binary",
+    "deserialize_binary",
+    "binary_serializer",
+    "binary_deserializer",
     "SerdeError",
     "resolve_generic_types",
     "get_generic_types",
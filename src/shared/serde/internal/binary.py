@@ -0,0 +1,775 @@
+"""
+Compact binary format. Values are laid out positionally following their type:
+- int: zigzag varint
+- float: 8 byte little-endian IEEE 754 double
+- bool: 1 byte
+- None: nothing
+- str: varint byte length + utf-8 bytes
+- enum: its value
+- list, set & dict: varint item count + items (keys and values for dicts).
+  Lists and sets of str store their items as a string column (see below), so
+  that large batches of lines are decoded at once.
+- tuple: its items
+- object: its fields, in the order of their type hints (no class name)
+- union: varint tag + the value. The tag is a hash of the member's name (see
+  member_tags()), so it's the same in any union with that member: adding or
+  removing members doesn't change the tags of the rest.
+
+Since nothing but union tags is written about the types, the same type must be
+used to serialize and deserialize a value, except for unions, which can be
+decoded as any union with the members that were encoded.
+
+In the columnar layout, lists of objects (or of unions of objects) are written
+one column per field instead of one object after the other:
+- varint item count
+- union tags: a 0 byte + the tag if all the items are of the same member,
+  or a 1 byte + the varint count and tags of the members present + one byte
+  per item with the position of its member among them. Left out if there's a
+  single member.
+- for each member present (in that order), its items as columns, in the order
+  of the fields:
+  - str: the strings, as a NUL separated utf-8 block if none contains NUL,
+    else with their lengths. Low-cardinality columns are dictionary encoded:
+    the distinct strings + the index of each item in them.
+  - float: packed doubles
+  - others: the values, one after the other
+Integer arrays in columns (string lengths, dictionary indexes) are written as
+a width byte + the little-endian values with that width.
+"""
+
+from array import array
+from enum import Enum, EnumType
+from itertools import accumulate, repeat
+from operator import attrgetter
+import struct
+import sys
+import types
+import zlib
+from typing import Any, Callable, Type, TypeVar, get_args, get_origin, cast, Union
+
+from .util import SIMPLE_TYPES, SerdeError, get_object_types
+
+T = TypeVar("T")
+
+# Data to decode. Memoryviews are read in place.
+BinaryData = bytes | bytearray | memoryview
+# Appends the encoded value to the buffer
+BinaryEncoder = Callable[[bytearray, Any], None]
+# Decodes a value from the buffer at the given offset.
+# Returns the value and the offset right after it.
+BinaryDecoder = Callable[[BinaryData, int], tuple[Any, int]]
+
+# bits of the union tags, so that they take at most 2 varint bytes
+TAG_BITS = 14
+
+DOUBLE = struct.Struct("<d")
+pack_double = DOUBLE.pack
+unpack_double = DOUBLE.unpack_from
+
+# (data type, columnar) -> compiled (encoder, decoder)
+_codecs: dict[tuple[Any, bool], tuple[BinaryEncoder, BinaryDecoder]] = {}
+
+
+def get_codec(
+    data_type: Any, columnar: bool = False
+) -> tuple[BinaryEncoder, BinaryDecoder]:
+    """
+    Returns the binary encoder and decoder for the given type,
+    compiling them on the first call.
+    """
+    codec = _codecs.get((data_type, columnar))
+    if codec is None:
+        codec = compile_codec(data_type, columnar)
+    return codec
+
+
+def compile_codec(
+    data_type: Any, columnar: bool
+) -> tuple[BinaryEncoder, BinaryDecoder]:
+    if data_type in SIMPLE_TYPES:
+        codec = SIMPLE_CODECS[data_type]
+    else:
+        origin = get_origin(data_type)
+        if isinstance(data_type, types.UnionType) or origin is Union:
+            codec = compile_union(data_type, columnar)
+        elif origin in (list, set):
+            codec = compile_sequence(data_type, columnar)
+        elif origin is dict:
+            codec = compile_dict(data_type, columnar)
+        elif origin is tuple:
+            codec = compile_tuple(data_type, columnar)
+        elif isinstance(data_type, EnumType):
+            codec = compile_enum(cast(type[Enum], data_type))
+        else:
+            return compile_object(data_type, columnar)
+    _codecs[(data_type, columnar)] = codec
+    return codec
+
+
+def write_varint(buffer: bytearray, value: int) -> None:
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: BinaryData, offset: int) -> tuple[int, int]:
+    value = data[offset]
+    offset += 1
+    if value < 0x80:
+        return value, offset
+    value &= 0x7F
+    shift = 7
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_int(buffer: bytearray, value: int) -> None:
+    write_varint(buffer, (value << 1) if value >= 0 else ((-value << 1) - 1))
+
+
+def decode_int(data: BinaryData, offset: int) -> tuple[int, int]:
+    value, offset = read_varint(data, offset)
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1), offset
+
+
+def encode_float(buffer: bytearray, value: float) -> None:
+    buffer += pack_double(value)
+
+
+def decode_float(data: BinaryData, offset: int) -> tuple[float, int]:
+    return unpack_double(data, offset)[0], offset + 8
+
+
+def encode_bool(buffer: bytearray, value: bool) -> None:
+    buffer.append(value)
+
+
+def decode_bool(data: BinaryData, offset: int) -> tuple[bool, int]:
+    return data[offset] != 0, offset + 1
+
+
+def encode_none(buffer: bytearray, value: None) -> None:
+    pass
+
+
+def decode_none(data: BinaryData, offset: int) -> tuple[None, int]:
+    return None, offset
+
+
+def encode_str(buffer: bytearray, value: str) -> None:
+    encoded = value.encode()
+    write_varint(buffer, len(encoded))
+    buffer += encoded
+
+
+def decode_str(data: BinaryData, offset: int) -> tuple[str, int]:
+    length = data[offset]
+    offset += 1
+    if length >= 0x80:
+        length, offset = read_varint(data, offset - 1)
+    end = offset + length
+    return str(data[offset:end], "utf-8"), end
+
+
+SIMPLE_CODECS: dict[Any, tuple[BinaryEncoder, BinaryDecoder]] = {
+    int: (encode_int, decode_int),
+    float: (encode_float, decode_float),
+    bool: (encode_bool, decode_bool),
+    types.NoneType: (encode_none, decode_none),
+    str: (encode_str, decode_str),
+}
+
+
+def compile_enum(type_info: type[Enum]) -> tuple[BinaryEncoder, BinaryDecoder]:
+    value_types = {type(x.value) for x in type_info}
+    if len(value_types) != 1 or next(iter(value_types)) not in SIMPLE_CODECS:
+        raise SerdeError(f"Enum {type_info} must have values of a single simple type")
+    encode_value, decode_value = SIMPLE_CODECS[value_types.pop()]
+    get_value = attrgetter("value")
+
+    def encode(buffer: bytearray, value: Enum) -> None:
+        encode_value(buffer, get_value(value))
+
+    def decode(data: BinaryData, offset: int) -> tuple[Any, int]:
+        value, offset = decode_value(data, offset)
+        try:
+            return type_info(value), offset
+        except ValueError as e:
+            raise SerdeError(str(e)) from e
+
+    return encode, decode
+
+
+def compile_sequence(
+    data_type: Any, columnar: bool
+) -> tuple[BinaryEncoder, BinaryDecoder]:
+    origin = get_origin(data_type)
+    item_type = get_args(data_type)[0]
+    if item_type is str:
+        return compile_str_sequence(origin)
+    if columnar and origin is list:
+        members = object_members(item_type)
+        if members:
+            return compile_columns(item_type, members)
+    encode_item, decode_item = get_codec(item_type, columnar)
+
+    def encode(buffer: bytearray, values: list[Any] | set[Any]) -> None:
+        write_varint(buffer, len(values))
+        for value in values:
+            encode_item(buffer, value)
+
+    def decode(data: BinaryData, offset: int) -> tuple[Any, int]:
+        length, offset = read_varint(data, offset)
+        values = []
+        for _ in range(length):
+            value, offset = decode_item(data, offset)
+            values.append(value)
+        return (values if origin is list else origin(values)), offset
+
+    return encode, decode
+
+
+def compile_dict(data_type: Any, columnar: bool) -> tuple[BinaryEncoder, BinaryDecoder]:
+    encode_key, decode_key = get_codec(get_args(data_type)[0], columnar)
+    encode_value, decode_value = get_codec(get_args(data_type)[1], columnar)
+
+    def encode(buffer: bytearray, values: dict[Any, Any]) -> None:
+        write_varint(buffer, len(values))
+        for key, value in values.items():
+            encode_key(buffer, key)
+            encode_value(buffer, value)
+
+    def decode(data: BinaryData, offset: int) -> tuple[Any, int]:
+        length, offset = read_varint(data, offset)
+        values = {}
+        for _ in range(length):
+            key, offset = decode_key(data, offset)
+            values[key], offset = decode_value(data, offset)
+        return values, offset
+
+    return encode, decode
+
+
+def compile_tuple(
+    data_type: Any, columnar: bool
+) -> tuple[BinaryEncoder, BinaryDecoder]:
+    codecs = [get_codec(t, columnar) for t in get_args(data_type)]
+
+    def encode(buffer: bytearray, values: tuple[Any, ...]) -> None:
+        if len(values) != len(codecs):
+            raise SerdeError(f"Expected {len(codecs)} items for {data_type}")
+        for (encode_item, _), value in zip(codecs, values):
+            encode_item(buffer, value)
+
+    def decode(data: BinaryData, offset: int) -> tuple[Any, int]:
+        values = []
+        for _, decode_item in codecs:
+            value, offset = decode_item(data, offset)
+            values.append(value)
+        return tuple(values), offset
+
+    return encode, decode
+
+
+def union_members(type_info: Any) -> list[Any]:
+    members = []
+    for t in get_args(type_info):
+        if isinstance(t, types.UnionType) or get_origin(t) is Union:
+            members.extend(union_members(t))
+        elif t not in members:
+            members.append(t)
+    return sorted(members, key=lambda t: getattr(get_origin(t) or t, "__name__", ""))
+
+
+def member_tags(type_info: Any, members: list[Any]) -> list[int]:
+    """
+    Returns the tag of each union member: the low TAG_BITS bits of the CRC32
+    of its name. Raises SerdeError if two members have the same tag, so
+    they're never mixed up.
+    """
+    tags = [
+        zlib.crc32(getattr(get_origin(t) or t, "__name__", repr(t)).encode())
+        & ((1 << TAG_BITS) - 1)
+        for t in members
+    ]
+    if len(set(tags)) != len(tags):
+        raise SerdeError(f"Members of {type_info} with the same tag, rename one")
+    return tags
+
+
+def member_index(members: list[Any], value: Any) -> int:
+    """
+    Returns the index of the union member the value belongs to
+    """
+    value_type = type(value)
+    for tag, t in enumerate(members):
+        if (get_origin(t) or t) is value_type or (t is float and value_type is int):
+            return tag
+    for tag, t in enumerate(members):
+        if isinstance(value, get_origin(t) or t):
+            return tag
+    raise SerdeError(f"{value_type} is not a member of {members}")
+
+
+def compile_union(
+    type_info: Any, columnar: bool
+) -> tuple[BinaryEncoder, BinaryDecoder]:
+    members = union_members(type_info)
+    tags = member_tags(type_info, members)
+    codecs = [get_codec(t, columnar) for t in members]
+    # runtime class -> (tag, encoder), filled on demand
+    by_class: dict[type, tuple[int, BinaryEncoder]] = {}
+
+    def encode(buffer: bytearray, value: Any) -> None:
+        member = by_class.get(type(value))
+        if member is None:
+            i = member_index(members, value)
+            member = by_class[type(value)] = tags[i], codecs[i][0]
+        tag, encode_member = member
+        write_varint(buffer, tag)
+        encode_member(buffer, value)
+
+    decoders = {tag: decoder for tag, (_, decoder) in zip(tags, codecs)}
+
+    def decode(data: BinaryData, offset: int) -> tuple[Any, int]:
+        tag, offset = read_varint(data, offset)
+        decode_member = decoders.get(tag)
+        if decode_member is None:
+            raise SerdeError(f"Invalid tag {tag} for union {type_info}")
+        return decode_member(data, offset)
+
+    return encode, decode
+
+
+# Field kinds that objects encode and decode inline, without calling their codec
+STR_FIELD, FLOAT_FIELD, OTHER_FIELD = range(3)
+
+
+def field_kind(field_type: Any) -> int:
+    if field_type is str:
+        return STR_FIELD
+    return FLOAT_FIELD if field_type is float else OTHER_FIELD
+
+
+def uses_dict(object_cls: type) -> bool:
+    """
+    Whether the instances of the class keep their fields in __dict__
+    """
+    return not any("__slots__" in vars(c) for c in object_cls.__mro__[:-1])
+
+
+def compile_object(
+    data_type: Type[T], columnar: bool
+) -> tuple[BinaryEncoder, BinaryDecoder]:
+    object_cls = get_origin(data_type) or data_type
+    with_dict = uses_dict(object_cls)
+    # filled after registering the codec, so that recursive types can refer to it
+    fields: list[tuple[str, int, BinaryEncoder, BinaryDecoder]] = []
+    getter: list[Callable[[Any], Any]] = []
+
+    def encode(buffer: bytearray, value: Any) -> None:
+        values = getter[0](value)
+        for (_, kind, encode_field, _), field in zip(fields, values):
+            if kind is STR_FIELD:
+                encoded = field.encode()
+                if len(encoded) < 0x80:
+                    buffer.append(len(encoded))
+                else:
+                    write_varint(buffer, len(encoded))
+                buffer += encoded
+            elif kind is FLOAT_FIELD:
+                buffer += pack_double(field)
+            else:
+                encode_field(buffer, field)
+
+    def decode(data: BinaryData, offset: int) -> tuple[Any, int]:
+        out = object_cls.__new__(object_cls)
+        values = out.__dict__ if with_dict else {}
+        for name, kind, _, decode_field in fields:
+            if kind is STR_FIELD:
+                length = data[offset]
+                offset += 1
+                if length >= 0x80:
+                    length, offset = read_varint(data, offset - 1)
+                end = offset + length
+                values[name] = str(data[offset:end], "utf-8")
+                offset = end
+            elif kind is FLOAT_FIELD:
+                values[name] = unpack_double(data, offset)[0]
+                offset += 8
+            else:
+                values[name], offset = decode_field(data, offset)
+        if not with_dict:
+            for name, value in values.items():
+                object.__setattr__(out, name, value)
+        return out, offset
+
+    _codecs[(data_type, columnar)] = (encode, decode)
+    try:
+        for name, t in get_object_types(data_type).items():
+            fields.append((name, field_kind(t), *get_codec(t, columnar)))
+        names = [name for name, *_ in fields]
+        get_values = attrgetter(*names) if names else lambda _: ()
+        getter.append(get_values if len(names) != 1 else lambda x: (get_values(x),))
+    except Exception:
+        _codecs.pop((data_type, columnar), None)
+        raise
+    return encode, decode
+
+
+# Column codecs encode a list of values and decode the given amount of them
+ColumnEncoder = Callable[[bytearray, list[Any]], None]
+ColumnDecoder = Callable[[BinaryData, int, int], tuple[list[Any], int]]
+
+# byte width -> array typecode of unsigned ints with that size
+UINT_TYPECODES = {array(typecode).itemsize: typecode for typecode in "LIHB"}
+BIG_ENDIAN = sys.byteorder == "big"
+
+# string column layouts
+STRS_SEPARATED, STRS_WITH_LENGTHS, STRS_DICTIONARY = range(3)
+# string columns with at most this ratio of distinct values are dictionary encoded
+DICTIONARY_MAX_RATIO = 0.5
+
+# object type -> compiled (encoder, decoder) for columns of its instances
+_column_codecs: dict[Any, tuple[ColumnEncoder, ColumnDecoder]] = {}
+
+
+def encode_uints(buffer: bytearray, values: list[int]) -> None:
+    top = max(values, default=0)
+    width = 1 if top <= 0xFF else 2 if top <= 0xFFFF else 4
+    items = array(UINT_TYPECODES[width], values)
+    if BIG_ENDIAN:
+        items.byteswap()
+    buffer.append(width)
+    buffer += items
+
+
+def decode_uints(data: BinaryData, offset: int, count: int) -> tuple["array[int]", int]:
+    width = data[offset]
+    if width not in (1, 2, 4):
+        raise SerdeError(f"Invalid integer width {width}")
+    start = offset + 1
+    end = start + width * count
+    if end > len(data):
+        raise SerdeError("Unexpected end of data")
+    items = array(UINT_TYPECODES[width])
+    items.frombytes(data[start:end])
+    if BIG_ENDIAN:
+        items.byteswap()
+    return items, end
+
+
+def encode_str_column(buffer: bytearray, column: list[str]) -> None:
+    distinct = dict.fromkeys(column)
+    if len(column) > 1 and len(distinct) <= len(column) * DICTIONARY_MAX_RATIO:
+        table = list(distinct)
+        indexes = {value: i for i, value in enumerate(table)}
+        buffer.append(STRS_DICTIONARY)
+        write_varint(buffer, len(table))
+        encode_str_column(buffer, table)
+        encode_uints(buffer, list(map(indexes.__getitem__, column)))
+        return
+
+    text = "\0".join(column)
+    if text.count("\0") == len(column) - 1:
+        buffer.append(STRS_SEPARATED)
+    else:
+        buffer.append(STRS_WITH_LENGTHS)
+        encode_uints(buffer, list(map(len, column)))
+        text = "".join(column)
+    encoded = text.encode()
+    write_varint(buffer, len(encoded))
+    buffer += encoded
+
+
+def decode_str_column(
+    data: BinaryData, offset: int, count: int
+) -> tuple[list[str], int]:
+    layout = data[offset]
+    offset += 1
+    if layout == STRS_DICTIONARY:
+        size, offset = read_varint(data, offset)
+        table, offset = decode_str_column(data, offset, size)
+        indexes, offset = decode_uints(data, offset, count)
+        return list(map(table.__getitem__, indexes)), offset
+
+    if layout == STRS_WITH_LENGTHS:
+        lengths, offset = decode_uints(data, offset, count)
+    elif layout != STRS_SEPARATED:
+        raise SerdeError(f"Invalid string column layout {layout}")
+    size, offset = read_varint(data, offset)
+    end = offset + size
+    if end > len(data):
+        raise SerdeError("Unexpected end of data")
+    text = str(data[offset:end], "utf-8")
+    if layout == STRS_SEPARATED:
+        values = text.split("\0")
+    else:
+        ends = list(accumulate(lengths))
+        values = [text[start:stop] for start, stop in zip([0, *ends], ends)]
+    if len(values) != count:
+        raise SerdeError(f"Expected {count} strings, got {len(values)}")
+    return values, end
+
+
+def encode_float_column(buffer: bytearray, column: list[float]) -> None:
+    buffer += struct.pack(f"<{len(column)}d", *column)
+
+
+def decode_float_column(data: BinaryData, offset: int, count: int) -> tuple[Any, int]:
+    return struct.unpack_from(f"<{count}d", data, offset), offset + 8 * count
+
+
+def column_of(
+    codec: tuple[BinaryEncoder, BinaryDecoder],
+) -> tuple[ColumnEncoder, ColumnDecoder]:
+    """
+    Column codec that writes the values one after the other
+    """
+    encode_value, decode_value = codec
+
+    def encode(buffer: bytearray, column: list[Any]) -> None:
+        for value in column:
+            encode_value(buffer, value)
+
+    def decode(data: BinaryData, offset: int, count: int) -> tuple[list[Any], int]:
+        values = []
+        for _ in range(count):
+            value, offset = decode_value(data, offset)
+            values.append(value)
+        return values, offset
+
+    return encode, decode
+
+
+def get_object_columns(data_type: Any) -> tuple[ColumnEncoder, ColumnDecoder]:
+    codec = _column_codecs.get(data_type)
+    if codec is None:
+        codec = compile_object_columns(data_type)
+    return codec
+
+
+def compile_object_columns(data_type: Any) -> tuple[ColumnEncoder, ColumnDecoder]:
+    object_cls = get_origin(data_type) or data_type
+    with_dict = uses_dict(object_cls)
+    # filled after registering the codec, so that recursive types can refer to it
+    fields: list[tuple[Callable[[Any], Any], ColumnEncoder, ColumnDecoder]] = []
+    names: list[str] = []
+
+    def encode(buffer: bytearray, items: list[Any]) -> None:
+        for get_field, encode_column, _ in fields:
+            encode_column(buffer, list(map(get_field, items)))
+
+    def decode(data: BinaryData, offset: int, count: int) -> tuple[list[Any], int]:
+        columns = []
+        for _, _, decode_column in fields:
+            column, offset = decode_column(data, offset, count)
+            columns.append(column)
+
+        new = object_cls.__new__
+        rows = zip(*columns) if columns else repeat((), count)
+        items = []
+        if with_dict:
+            for row in rows:
+                item = new(object_cls)
+                item.__dict__.update(zip(names, row))
+                items.append(item)
+            return items, offset
+        for row in rows:
+            item = new(object_cls)
+            for name, value in zip(names, row):
+                object.__setattr__(item, name, value)
+            items.append(item)
+        return items, offset
+
+    _column_codecs[data_type] = (encode, decode)
+    try:
+        for name, t in get_object_types(data_type).items():
+            kind = field_kind(t)
+            if kind is STR_FIELD:
+                column: tuple[Any, Any] = (encode_str_column, decode_str_column)
+            elif kind is FLOAT_FIELD:
+                column = (encode_float_column, decode_float_column)
+            else:
+                column = column_of(get_codec(t, True))
+            names.append(name)
+            fields.append((attrgetter(name), *column))
+    except Exception:
+        _column_codecs.pop(data_type, None)
+        raise
+    return encode, decode
+
+
+def compile_str_sequence(origin: Any) -> tuple[BinaryEncoder, BinaryDecoder]:
+    def encode(buffer: bytearray, values: list[str] | set[str]) -> None:
+        write_varint(buffer, len(values))
+        if values:
+            encode_str_column(buffer, list(values))
+
+    def decode(data: BinaryData, offset: int) -> tuple[Any, int]:
+        count, offset = read_varint(data, offset)
+        if not count:
+            return (origin() if origin is set else []), offset
+        values, offset = decode_str_column(data, offset, count)
+        return (values if origin is list else origin(values)), offset
+
+    return encode, decode
+
+
+def object_members(data_type: Any) -> list[Any]:
+    """
+    Returns the members of the type (sorted like in unions) if they're all
+    objects, or an empty list otherwise
+    """
+    if isinstance(data_type, types.UnionType) or get_origin(data_type) is Union:
+        members = union_members(data_type)
+    else:
+        members = [data_type]
+    for t in members:
+        origin = get_origin(t)
+        if (
+            t in SIMPLE_TYPES
+            or isinstance(t, EnumType)
+            or origin in (list, set, dict, tuple)
+            or not isinstance(origin or t, type)
+        ):
+            return []
+    return members
+
+
+def compile_columns(
+    item_type: Any, members: list[Any]
+) -> tuple[BinaryEncoder, BinaryDecoder]:
+    """
+    Codec for lists of objects in the columnar layout
+    """
+    if len(members) > 0x100:
+        raise SerdeError(f"Too many union members in {item_type} for columns")
+    tags = member_tags(item_type, members) if len(members) > 1 else [0]
+    codecs = [get_object_columns(t) for t in members]
+    # tag -> index of the member
+    by_tag = {tag: i for i, tag in enumerate(tags)}
+    # runtime class -> index of the member, filled on demand
+    by_class: dict[type, int] = {}
+
+    def index_of(value: Any) -> int:
+        i = by_class.get(type(value))
+        if i is None:
+            i = by_class[type(value)] = member_index(members, value)
+        return i
+
+    def member_of(tag: int) -> int:
+        i = by_tag.get(tag)
+        if i is None:
+            raise SerdeError(f"Invalid tag {tag} for {item_type}")
+        return i
+
+    def encode(buffer: bytearray, values: list[Any]) -> None:
+        write_varint(buffer, len(values))
+        if not values:
+            return
+        if len(codecs) == 1:
+            codecs[0][0](buffer, values)
+            return
+
+        indexes = bytes(map(index_of, values))
+        if indexes.count(indexes[0]) == len(indexes):
+            buffer.append(0)
+            write_varint(buffer, tags[indexes[0]])
+            codecs[indexes[0]][0](buffer, values)
+            return
+        present = sorted(set(indexes))
+        buffer.append(1)
+        write_varint(buffer, len(present))
+        positions = bytearray(0x100)
+        for position, i in enumerate(present):
+            write_varint(buffer, tags[i])
+            positions[i] = position
+        buffer += indexes.translate(positions)
+        groups: list[list[Any]] = [[] for _ in codecs]
+        for i, value in zip(indexes, values):
+            groups[i].append(value)
+        for i in present:
+            codecs[i][0](buffer, groups[i])
+
+    def decode(data: BinaryData, offset: int) -> tuple[Any, int]:
+        count, offset = read_varint(data, offset)
+        if not count:
+            return [], offset
+        if len(codecs) == 1:
+            return codecs[0][1](data, offset, count)
+
+        mixed = data[offset]
+        offset += 1
+        if not mixed:
+            tag, offset = read_varint(data, offset)
+            return codecs[member_of(tag)][1](data, offset, count)
+
+        present_count, offset = read_varint(data, offset)
+        present = []
+        for _ in range(present_count):
+            tag, offset = read_varint(data, offset)
+            present.append(member_of(tag))
+        positions = bytes(data[offset : offset + count])
+        offset += count
+        if len(positions) != count or max(positions) >= len(present):
+            raise SerdeError(f"Invalid tags for {item_type}")
+        groups = []
+        for position, i in enumerate(present):
+            size = positions.count(position)
+            items, offset = codecs[i][1](data, offset, size) if size else ([], offset)
+            groups.append(iter(items))
+        return [next(groups[position]) for position in positions], offset
+
+    return encode, decode
+
+
+def binary_serializer(data_type: Any, columnar: bool = False) -> Callable[[Any], bytes]:
+    """
+    Returns a function that serializes values of the given type to bytes.
+    With columnar, lists of objects are written in the columnar layout.
+    """
+    encode = get_codec(data_type, columnar)[0]
+
+    def serialize(data: Any) -> bytes:
+        buffer = bytearray()
+        encode(buffer, data)
+        return bytes(buffer)
+
+    return serialize
+
+
+def binary_deserializer(
+    data_type: Any, columnar: bool = False
+) -> Callable[[BinaryData], Any]:
+    """
+    Returns a function that deserializes values of the given type from bytes.
+    Memoryviews are read in place, without copying them.
+    The columnar flag must match the one the values were serialized with.
+    """
+    decode = get_codec(data_type, columnar)[1]
+
+    def deserialize(data: BinaryData) -> Any:
+        try:
+            value, offset = decode(data, 0)
+        except (IndexError, struct.error, UnicodeDecodeError) as e:
+            raise SerdeError(f"Invalid binary data for {data_type}: {e}") from e
+        if offset != len(data):
+            raise SerdeError(f"Unexpected trailing data for {data_type}")
+        return value
+
+    return deserialize
+
+
+def serialize_binary(data: Any, data_type: Any, columnar: bool = False) -> bytes:
+    return binary_serializer(data_type, columnar)(data)
+
+
+def deserialize_binary(data_type: Any, data: BinaryData, columnar: bool = False) -> Any:
+    return binary_deserializer(data_type, columnar)(data)
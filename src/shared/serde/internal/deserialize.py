@@ -1,99 +1,225 @@
-from enum import EnumType
+from enum import Enum, EnumType
 import json
 import types
-from typing import Any, Type, TypeVar, get_args, get_origin, cast, Union
+from typing import Any, Callable, Type, TypeVar, get_args, get_origin, cast, Union
 
-from .util import SIMPLE_TYPES, SerdeError, Translated, get_object_types
+from .util import SIMPLE_TYPES, SerdeError, Serialized, Translated, get_object_types
 
 T = TypeVar("T")
 TypeVars = dict[str, Type[Any]]
 
+"""
+A compiled function that turns a translated value into an instance of its type.
+"""
+Decoder = Callable[[Translated], Any]
 
-def deserialize_item(data_type: Any, data: Translated) -> Any:
+# data type -> compiled decoder
+_decoders: dict[Any, Decoder] = {}
+
+
+def get_decoder(data_type: Any) -> Decoder:
+    """
+    Returns the decoder for the given type, compiling it on the first call.
+    """
+    decoder = _decoders.get(data_type)
+    if decoder is None:
+        decoder = compile_decoder(data_type)
+    return decoder
+
+
+def compile_decoder(data_type: Any) -> Decoder:
     if data_type in SIMPLE_TYPES:
-        return deserialize_simple(data_type, data)
+        decoder = compile_simple(data_type)
+    else:
+        origin = get_origin(data_type)
+        if isinstance(data_type, types.UnionType) or origin is Union:
+            decoder = compile_union(data_type)
+        elif origin in (list, set, dict, tuple):
+            decoder = compile_collection(data_type)
+        elif isinstance(data_type, EnumType):
+            decoder = compile_enum(data_type)
+        else:
+            return compile_object(data_type)
+    _decoders[data_type] = decoder
+    return decoder
 
-    origin = get_origin(data_type)
-    if isinstance(data_type, types.UnionType) or origin is Union:
-        return deserialize_union(data_type, data)
-    if origin in (list, set, dict, tuple):
-        return deserialize_collection(data_type, data)
-    if isinstance(data_type, EnumType):
-        return deserialize_enum(data_type, data)
-    return deserialize_object(data_type, data)
 
+def compile_simple(data_type: type) -> Decoder:
+    if data_type == float:
 
-def deserialize_simple(data_type: type, data: Translated) -> Any:
-    if data_type == float and isinstance(data, (int, float)) or type(data) == data_type:
-        return data
-    raise SerdeError(f"Expected {data_type}, got {type(data)}")
+        def decode_float(data: Translated) -> Any:
+            if isinstance(data, (int, float)):
+                return data
+            raise SerdeError(f"Expected {data_type}, got {type(data)}")
 
+        return decode_float
 
-def deserialize_enum(type_info: EnumType, data: Translated) -> Any:
-    return type_info(data)
+    def decode_simple(data: Translated) -> Any:
+        if type(data) is data_type:
+            return data
+        raise SerdeError(f"Expected {data_type}, got {type(data)}")
 
+    return decode_simple
 
-def deserialize_union(type_info: Any, data: Translated) -> Any:
-    for t in get_args(type_info):
+
+def compile_enum(type_info: EnumType) -> Decoder:
+    def decode_enum(data: Translated) -> Any:
         try:
-            return deserialize_item(t, data)
-        except SerdeError:
-            pass
-    raise SerdeError(
-        f"Union type {type_info} has failed to deserialize as any of its types."
-    )
+            return type_info(data)
+        except ValueError as e:
+            raise SerdeError(str(e)) from e
+
+    return decode_enum
+
+
+def union_members(type_info: Any) -> list[Any]:
+    """
+    Returns the members of the union, flattening any nested unions.
+    """
+    members = []
+    for t in get_args(type_info):
+        if isinstance(t, types.UnionType) or get_origin(t) is Union:
+            members.extend(union_members(t))
+        elif t not in members:
+            members.append(t)
+    return members
+
+
+def compile_union(type_info: Any) -> Decoder:
+    """
+    Builds a dispatch table for the union. Objects are picked by the class name
+    they're serialized with, simple types and enums by the type of the data.
+    Collections are only tried for lists that don't match any class name.
+    """
+    # class name -> decoders
+    by_name: dict[str, list[Decoder]] = {}
+    # serialized type -> decoders
+    by_type: dict[type, list[Decoder]] = {}
+    collections: list[Decoder] = []
+    for t in union_members(type_info):
+        decoder = get_decoder(t)
+        if t in SIMPLE_TYPES:
+            accepted = (int, float, bool) if t == float else (t,)
+            for data_type in accepted:
+                by_type.setdefault(data_type, []).append(decoder)
+        elif isinstance(t, EnumType):
+            for data_type in {type(x.value) for x in cast(type[Enum], t)}:
+                by_type.setdefault(data_type, []).append(decoder)
+        elif get_origin(t) in (list, set, dict, tuple):
+            collections.append(decoder)
+        else:
+            name = (get_origin(t) or t).__name__
+            by_name.setdefault(name, []).append(decoder)
+    for decoders in by_name.values():
+        decoders.extend(collections)
+
+    def decode_union(data: Translated) -> Any:
+        if isinstance(data, list):
+            tag = data[0] if data else None
+            decoders = (
+                by_name.get(tag, collections) if type(tag) is str else collections
+            )
+        else:
+            decoders = by_type.get(type(data), [])
+        for decoder in decoders:
+            try:
+                return decoder(data)
+            except SerdeError:
+                pass
+        raise SerdeError(
+            f"Union type {type_info} has failed to deserialize as any of its types."
+        )
+
+    return decode_union
 
 
-def deserialize_collection(data_type: type, data: Translated) -> Any:
+def compile_collection(data_type: type) -> Decoder:
     origin = get_origin(data_type)
     args = get_args(data_type)
-    if not isinstance(data, list):
-        raise SerdeError(f"Can't deserialize {origin}: serialized object is not a list")
-
-    data = cast(list[Translated], data)
-    if origin in (list, set):
-        item_type = args[0]
-        values = origin(deserialize_item(item_type, i) for i in data)
-        return values
-    if origin == dict:
-        key_type, value_type = args
-        values = {}
-        for pair in data:
-            if not isinstance(pair, list) or len(pair) != 2:
-                raise SerdeError("Dicts must be serialized as lists of pairs")
-            pair = cast(list[Translated], pair)
-            k, v = pair
-            values[deserialize_item(key_type, k)] = deserialize_item(value_type, v)
-        return values
-    if origin == tuple:
-        item_types = args
-        values = tuple(deserialize_item(t, d) for t, d in zip(item_types, data))
-        return values
-    raise SerdeError(f"Unknown collection type {origin}")
 
+    def check_list(data: Translated) -> list[Translated]:
+        if not isinstance(data, list):
+            raise SerdeError(
+                f"Can't deserialize {origin}: serialized object is not a list"
+            )
+        return data
 
-def deserialize_object(data_type: Type[T], data: Translated) -> T:
-    type_hints = get_object_types(data_type)
-    object_cls = get_origin(data_type) or data_type
-    out = object_cls.__new__(object_cls)
-    if not isinstance(data, list):
-        raise SerdeError(f"Object {object_cls} must be serialized as a list")
-    data = cast(list[Translated], data)
-    if len(data) != len(type_hints) + 1:
-        raise SerdeError(
-            f"Expected {len(type_hints) + 1} items, but got {len(data)} for type"
-            f" {object_cls}"
-        )
-    if data[0] != object_cls.__name__:
-        raise SerdeError(
-            f"Object name {object_cls.__name__} does not match serialized name"
-            f" {data[0]}"
-        )
-    for i, (name, item_type) in enumerate(type_hints.items(), start=1):
-        item = deserialize_item(item_type, data[i])
-        object.__setattr__(out, name, item)
-    return out
+    if origin is list or origin is set:
+        item = get_decoder(args[0])
+        container = cast(Callable[[Any], Any], origin)
+        if origin is list:
+            return lambda data: [item(i) for i in check_list(data)]
+        return lambda data: container(item(i) for i in check_list(data))
+    if origin is dict:
+        key_decoder, value_decoder = (get_decoder(t) for t in args)
+
+        def decode_dict(data: Translated) -> Any:
+            values = {}
+            for pair in check_list(data):
+                if not isinstance(pair, list) or len(pair) != 2:
+                    raise SerdeError("Dicts must be serialized as lists of pairs")
+                k, v = pair
+                values[key_decoder(k)] = value_decoder(v)
+            return values
+
+        return decode_dict
+    if origin is tuple:
+        items = [get_decoder(t) for t in args]
+        return lambda data: tuple(f(d) for f, d in zip(items, check_list(data)))
+    raise SerdeError(f"Unknown collection type {origin}")
 
 
-def deserialize(data_type: Any, data: str) -> Any:
-    return deserialize_item(data_type, json.loads(data))
+def compile_object(data_type: Type[T]) -> Decoder:
+    object_cls = get_origin(data_type) or data_type
+    name = object_cls.__name__
+    # filled after registering the decoder, so that recursive types can refer to it
+    fields: list[tuple[str, Decoder]] = []
+
+    def decode_object(data: Translated) -> Any:
+        if not isinstance(data, list):
+            raise SerdeError(f"Object {object_cls} must be serialized as a list")
+        if len(data) != len(fields) + 1:
+            raise SerdeError(
+                f"Expected {len(fields) + 1} items, but got {len(data)} for type"
+                f" {object_cls}"
+            )
+        if data[0] != name:
+            raise SerdeError(
+                f"Object name {name} does not match serialized name {data[0]}"
+            )
+        out = object_cls.__new__(object_cls)
+        for i, (field, decoder) in enumerate(fields, start=1):
+            object.__setattr__(out, field, decoder(data[i]))
+        return out
+
+    _decoders[data_type] = decode_object
+    try:
+        type_hints = get_object_types(data_type)
+        fields.extend((field, get_decoder(t)) for field, t in type_hints.items())
+    except Exception:
+        _decoders.pop(data_type, None)
+        raise
+    return decode_object
+
+
+def load_json(data: Serialized) -> Translated:
+    """
+    Parses the data without copying it first. json reads str and bytes directly,
+    memoryviews are decoded straight from their buffer.
+    """
+    if isinstance(data, memoryview):
+        data = str(data, "utf-8")
+    return json.loads(data)
+
+
+def deserializer(data_type: Any) -> Callable[[Serialized], Any]:
+    """
+    Returns a function that deserializes values of the given type.
+    Prefer it over deserialize() in hot paths, as it skips the type lookup.
+    """
+    decoder = get_decoder(data_type)
+    return lambda data: decoder(load_json(data))
+
+
+def deserialize(data_type: Any, data: Serialized) -> Any:
+    return get_decoder(data_type)(load_json(data))
@@ -1,6 +1,7 @@
 from enum import Enum
 import json
-from typing import Any, get_type_hints
+from operator import attrgetter
+from typing import Any, Callable, get_type_hints
 
 from .util import (
     SIMPLE_TYPES,
@@ -8,43 +9,75 @@ from .util import (
     Translated,
 )
 
+"""
+A compiled function that translates an instance of a type into a serializable value.
+"""
+Encoder = Callable[[Any], Translated]
+
+_SIMPLE_TYPES = frozenset(SIMPLE_TYPES)
+
+# runtime class -> compiled encoder
+_encoders: dict[type, Encoder] = {}
+
 
 def serialize_item(item: Any) -> Translated:
-    if type(item) in SIMPLE_TYPES:
+    item_type = type(item)
+    if item_type in _SIMPLE_TYPES:
         return item
 
-    if isinstance(item, (list, dict, tuple, set)):
-        return serialize_generic(item)
-    if isinstance(item, Enum):
-        return serialize_enum(item)
+    encoder = _encoders.get(item_type)
+    if encoder is None:
+        encoder = compile_encoder(item_type)
+    return encoder(item)
+
+
+def compile_encoder(item_type: type) -> Encoder:
+    encoder: Encoder
+    if issubclass(item_type, (list, tuple, set)):
+        encoder = serialize_sequence
+    elif issubclass(item_type, dict):
+        encoder = serialize_dict
+    elif issubclass(item_type, Enum):
+        encoder = compile_enum(item_type)
+    else:
+        encoder = compile_object(item_type)
+    _encoders[item_type] = encoder
+    return encoder
+
 
-    return serialize_object(item)
+def compile_enum(item_type: type[Enum]) -> Encoder:
+    if any(type(x.value) not in _SIMPLE_TYPES for x in item_type):
 
+        def invalid_enum(item: Enum) -> Translated:
+            raise SerdeError(
+                f"Enum values must be one of {', '.join(str(x) for x in SIMPLE_TYPES)}"
+            )
 
-def serialize_enum(item: Enum) -> Translated:
-    if type(item.value) not in SIMPLE_TYPES:
-        raise SerdeError(
-            f"Enum values must be one of {', '.join(str(x) for x in SIMPLE_TYPES)}"
-        )
-    return item.value
+        return invalid_enum
+    return attrgetter("value")
 
 
-def serialize_generic(
-    collection: list[Any] | dict[Any, Any] | set[Any] | tuple[Any, ...],
+def serialize_sequence(
+    collection: list[Any] | tuple[Any, ...] | set[Any],
 ) -> Translated:
-    if isinstance(collection, (list, set, tuple)):
-        return [serialize_item(i) for i in collection]
-    if isinstance(collection, dict):
-        return [[serialize_item(k), serialize_item(v)] for k, v in collection.items()]
-    raise SerdeError(f"Generic type {type(collection)} is not supported")
-
-
-def serialize_object(data: object) -> Translated:
-    type_hints = get_type_hints(type(data))
-    out: list[Translated] = [type(data).__name__]
-    for name in type_hints:
-        out.append(serialize_item(getattr(data, name)))
-    return out
+    return [serialize_item(i) for i in collection]
+
+
+def serialize_dict(collection: dict[Any, Any]) -> Translated:
+    return [[serialize_item(k), serialize_item(v)] for k, v in collection.items()]
+
+
+def compile_object(item_type: type) -> Encoder:
+    name = item_type.__name__
+    fields = tuple(get_type_hints(item_type))
+    if len(fields) == 0:
+        return lambda data: [name]
+    if len(fields) == 1:
+        get_field = attrgetter(fields[0])
+        return lambda data: [name, serialize_item(get_field(data))]
+
+    get_fields = attrgetter(*fields)
+    return lambda data: [name, *map(serialize_item, get_fields(data))]
 
 
 def serialize(
@@ -0,0 +1,146 @@
+"""
+Decoders for data that was serialized by this same process or program with
+the same types, such as stored state. They skip the checks of the regular
+decoders and are generated as a single Python expression for each type, so
+that decoding a value doesn't go through a call per field.
+"""
+
+from enum import EnumType
+import types
+from typing import Any, Callable, Union, get_args, get_origin
+
+from .binary import uses_dict
+from .deserialize import Decoder, get_decoder, load_json, union_members
+from .util import SIMPLE_TYPES, Serialized, get_object_types
+
+# data type -> generated decoder
+_trusted: dict[Any, Decoder] = {}
+
+
+class _Expression:
+    """
+    Source of a decoder being generated, with the values it refers to
+    """
+
+    names: dict[str, Any]
+    variables: int
+    # objects being generated, to fall back to the regular decoder on recursion
+    generating: set[Any]
+
+    def __init__(self) -> None:
+        self.names = {}
+        self.variables = 0
+        self.generating = set()
+
+    def name(self, value: Any) -> str:
+        name = f"_v{len(self.names)}"
+        self.names[name] = value
+        return name
+
+    def variable(self) -> str:
+        self.variables += 1
+        return f"_x{self.variables}"
+
+    def of(self, data_type: Any, data: str) -> str:
+        """
+        Returns the expression that decodes the given data expression. The
+        data is always a variable or an item of one, so it's cheap to repeat.
+        """
+        if data_type in SIMPLE_TYPES:
+            return data
+        origin = get_origin(data_type)
+        if isinstance(data_type, types.UnionType) or origin is Union:
+            members = union_members(data_type)
+            if len(members) == 2 and types.NoneType in members:
+                (member,) = (t for t in members if t is not types.NoneType)
+                return f"(None if {data} is None else {self.of(member, data)})"
+            return f"{self.name(get_decoder(data_type))}({data})"
+        if isinstance(data_type, EnumType):
+            return f"{self.name(data_type)}({data})"
+        if origin in (list, set):
+            (item_type,) = get_args(data_type)
+            if item_type in SIMPLE_TYPES:
+                return data if origin is list else f"set({data})"
+            x = self.variable()
+            item = self.of(item_type, x)
+            if origin is list:
+                return f"[{item} for {x} in {data}]"
+            return f"{{{item} for {x} in {data}}}"
+        if origin is dict:
+            key_type, value_type = get_args(data_type)
+            k, v = self.variable(), self.variable()
+            return (
+                f"{{{self.of(key_type, k)}: {self.of(value_type, v)}"
+                f" for {k}, {v} in {data}}}"
+            )
+        if origin is tuple:
+            args = get_args(data_type)
+            if all(t in SIMPLE_TYPES for t in args):
+                return f"tuple({data})"
+            items = "".join(
+                f"{self.of(t, f'{data}[{i}]')}, " for i, t in enumerate(args)
+            )
+            return f"({items})"
+        return self.of_object(data_type, data)
+
+    def of_object(self, data_type: Any, data: str) -> str:
+        if data_type in self.generating:
+            return f"{self.name(get_decoder(data_type))}({data})"
+        self.generating.add(data_type)
+        object_cls = get_origin(data_type) or data_type
+        fields = get_object_types(data_type)
+        make = self.name(_maker(object_cls))
+        values = ", ".join(
+            f"{field!r}: {self.of(t, f'{data}[{i}]')}"
+            for i, (field, t) in enumerate(fields.items(), start=1)
+        )
+        self.generating.discard(data_type)
+        return f"{make}({{{values}}})"
+
+
+def _maker(object_cls: Any) -> Callable[[dict[str, Any]], Any]:
+    """
+    Returns a function that builds an instance of the class from a dict with
+    its fields, without calling __init__
+    """
+    new = object_cls.__new__
+    if uses_dict(object_cls):
+
+        def make_with_dict(fields: dict[str, Any]) -> Any:
+            out = new(object_cls)
+            out.__dict__ = fields
+            return out
+
+        return make_with_dict
+
+    def make(fields: dict[str, Any]) -> Any:
+        out = new(object_cls)
+        for field, value in fields.items():
+            object.__setattr__(out, field, value)
+        return out
+
+    return make
+
+
+def get_trusted_decoder(data_type: Any) -> Decoder:
+    """
+    Returns the trusted decoder for the given type, generating it on the
+    first call.
+    """
+    decoder = _trusted.get(data_type)
+    if decoder is None:
+        expression = _Expression()
+        source = f"lambda _x0: {expression.of(data_type, '_x0')}"
+        decoder = eval(source, expression.names)
+        _trusted[data_type] = decoder
+    return decoder
+
+
+def trusted_deserializer(data_type: Any) -> Callable[[Serialized], Any]:
+    """
+    Like deserializer(), but without validating the data. Only for data that
+    was serialized with the same type, as anything else is decoded wrong
+    instead of raising SerdeError.
+    """
+    decoder = get_trusted_decoder(data_type)
+    return lambda data: decoder(load_json(data))
@@ -19,6 +19,11 @@ Translated = list["Translated"] | str | int | float | bool | None
 
 SIMPLE_TYPES = [str, int, float, types.NoneType, bool]
 
+"""
+Serialized data, as text or as the utf-8 bytes received from a socket or queue.
+"""
+Serialized = str | bytes | bytearray | memoryview
+
 
 class SerdeError(Exception):
     """
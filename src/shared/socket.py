@@ -21,9 +21,12 @@ class SocketStopWrapper:
         self.socket.send_string(data)
         self.last_sent = data
 
-    def recv(self, timeout_ms: float | None = None) -> str:
+    def recv(self, timeout_ms: float | None = None) -> memoryview:
+        """
+        Receives a message without copying it out of the zmq frame
+        """
         self.__wait_until_ready(zmq.POLLIN, timeout_ms=timeout_ms)
-        return self.socket.recv_string()
+        return self.socket.recv(copy=False).buffer
 
     def __wait_until_ready(self, flag: int, timeout_ms: float | None) -> None:
         start = time.time()
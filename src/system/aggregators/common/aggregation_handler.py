@@ -2,7 +2,7 @@ import logging
 from typing import Callable, Generic
 
 from common.messages import End, Message, Start
-from common.messages.joined import GenericJoinedTrip
+from common.messages.joined import GenericJoinedTrip, StationNames
 from common.messages.aggregated import GenericAggregatedRecord
 from common.job_tracker import JobTracker
 
@@ -49,7 +49,9 @@ class AggregationHandler(Generic[GenericJoinedTrip, GenericAggregatedRecord]):
         self.job_tracker.finished_job(job_id)
         self.comms.finished_job(job_id)
 
-    def handle_record(self, msg: Message[GenericJoinedTrip | End | Start]) -> None:
+    def handle_record(
+        self, msg: Message[GenericJoinedTrip | End | Start | StationNames]
+    ) -> None:
         if msg.job_id in self.job_tracker.state.completed:
             return
 
@@ -1,8 +1,8 @@
 from typing import Callable, Generic
 
 from common.comms_base import ReliableComms, HeartbeatSender
-from common.messages import End, Start
-from common.messages.joined import GenericJoinedTrip
+from common.messages import End
+from common.messages.joined import GenericJoinedTrip, JoinerRecord, StationNames
 from common.messages.aggregated import GenericAggregatedRecord
 
 from .config import Config
@@ -10,8 +10,8 @@ from .config import Config
 
 class AggregatorComms(
     ReliableComms[
-        GenericJoinedTrip | End | Start,
-        GenericAggregatedRecord | End,
+        JoinerRecord[GenericJoinedTrip],
+        GenericAggregatedRecord | End | StationNames,
     ],
     Generic[GenericJoinedTrip, GenericAggregatedRecord],
 ):
@@ -20,7 +20,10 @@ class AggregatorComms(
     def __init__(self, config: Config) -> None:
         self.config = config
         super().__init__(
-            config, duplicate_filter_config=config, add_job_id_to_routing_key=False
+            config,
+            duplicate_filter_config=config,
+            add_job_id_to_routing_key=False,
+            out_serialization=config.out_serialization,
         )
         HeartbeatSender(self, config).setup_timer()
 
@@ -35,7 +38,7 @@ class AggregatorComms(
         self._start_consuming_from(others_queue)
 
     def _get_routing_details(
-        self, msg: GenericAggregatedRecord | End
+        self, msg: GenericAggregatedRecord | End | StationNames
     ) -> tuple[str, str]:
         return self.config.out_exchange, self.config.out_queue
 
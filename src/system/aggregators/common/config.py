@@ -1,4 +1,5 @@
 from common.config_base import ConfigBase
+from common.comms_base import FilterMode, Serialization
 
 
 class Config(ConfigBase):
@@ -6,6 +7,9 @@ class Config(ConfigBase):
     joiners_count: int
     send_interval_seconds: float
     prefetch_count: int
+    group_commit_messages: int
+    group_commit_millis: int
+    async_commit: bool
 
     in_exchange: str
     in_trips_queue_format: str
@@ -13,8 +17,10 @@ class Config(ConfigBase):
     in_others_queue_routing_keys: list[str]
     out_exchange: str
     out_queue: str
+    out_serialization: Serialization
 
     host_count: int
+    duplicate_filter: FilterMode
     filters_exchange: str
     filters_routing_keys_format: list[str]
     filters_queue_format: str
@@ -25,6 +31,9 @@ class Config(ConfigBase):
         self.send_interval_seconds = self.get_float("SendIntervalSeconds")
         self.joiners_count = self.get_int(f"{name.upper()}_JOINERS_SCALE")
         self.prefetch_count = self.get_int("PrefetchCount")
+        self.group_commit_messages = self.get_int("GroupCommitMessages")
+        self.group_commit_millis = self.get_int("GroupCommitMillis")
+        self.async_commit = self.get_bool("AsyncCommit")
 
         self.in_exchange = self.get_named("InExchangeFormat")
         self.in_trips_queue_format = self.get_named("InTripsQueueFormat")
@@ -34,7 +43,14 @@ class Config(ConfigBase):
         self.out_queue = self.get("InQueueFormat", section="reducers").replace(
             "{name}", self.name
         )
+        self.out_serialization = Serialization(
+            self.get(
+                "InSerialization",
+                section=ConfigBase.subsection("reducers", self.name),
+            )
+        )
         self.host_count = self.get_int(f"{name.upper()}_AGGREGATORS_SCALE")
+        self.duplicate_filter = FilterMode(self.get("DuplicateFilter"))
         self.filters_exchange = self.get_named("FiltersExchangeFormat")
         self.filters_routing_keys_format = self.get_json("FiltersRoutingKeysFormat")
         self.filters_queue_format = self.get_named("FiltersQueueFormat")
@@ -3,20 +3,24 @@ from dataclasses import dataclass
 from typing import Callable, Generic
 
 from common.messages import End, Start
-from common.messages.joined import GenericJoinedTrip
+from common.messages.joined import GenericJoinedTrip, StationNames
 from common.messages.aggregated import GenericAggregatedRecord
-from common.persistence import WithState, StatePersistor
+from common.persistence import WithState, StatePersistor, job_key
 
 from .config import Config
 from .comms import AggregatorComms
 from .aggregator import Aggregator
 from .timer import TimerSender
 
+# id of the aggregator that forwards the station names to the reducer
+NAMES_SENDER_ID = "1"
+
 
 @dataclass
 class State:
     ends_received: set[str]
     count: int
+    station_names_sent: bool
 
 
 class JobAggregator(
@@ -37,7 +41,7 @@ class JobAggregator(
         job_id: str,
         on_finished: Callable[[str], None],
     ):
-        super().__init__(State(set(), 0))
+        super().__init__(State(set(), 0, False))
         self.config = config
         self.comms = comms
         self.aggregator = aggregator
@@ -59,6 +63,15 @@ class JobAggregator(
         # which is done on __init__() so that it only happens once
         pass
 
+    def handle_station_names(self, station_names: StationNames) -> None:
+        # Only needed by the reducer, to translate the ids back to names.
+        # Every joiner sends the same names to every aggregator, so only the
+        # first aggregator forwards them, once per job
+        if self.comms.id != NAMES_SENDER_ID or self.state.station_names_sent:
+            return
+        self.state.station_names_sent = True
+        self.comms.send(self.job_id, station_names, force_msg_id=None)
+
     def handle_end(self, end: End) -> None:
         if end.host is None:
             logging.warn("Received End without host id")
@@ -87,8 +100,7 @@ class JobAggregator(
 
         self.timer.remove_timer()
         self.comms.stop_consuming_trips(self.job_id)
-        StatePersistor().remove(self._aggregator_store_key())
-        StatePersistor().remove(self._control_store_key())
+        StatePersistor().remove_job(self.job_id)
         self.on_finished(self.job_id)
         self.comms.send(self.job_id, End(self.comms.id), force_msg_id=None)
 
@@ -102,7 +114,7 @@ class JobAggregator(
         self.aggregator.store_to(self._aggregator_store_key())
 
     def _control_store_key(self) -> str:
-        return f"control_{self.job_id}"
+        return job_key(self.job_id, "control")
 
     def _aggregator_store_key(self) -> str:
-        return f"aggregator_{self.job_id}"
+        return job_key(self.job_id, "aggregator")
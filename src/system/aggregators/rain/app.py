@@ -3,6 +3,7 @@ from shared.log import setup_logs
 
 from common.messages.joined import JoinedRainTrip
 from common.messages.aggregated import PartialRainAverages
+from common.persistence import setup_durability
 from common.util import process_loop
 
 from ..common.aggregation_handler import AggregationHandler
@@ -13,6 +14,7 @@ from .aggregator import RainAggregator
 
 def main() -> None:
     setup_logs(Config().log_level)
+    setup_durability(Config().durability, Config().durability_fsync_millis)
 
     process_loop(
         lambda: AggregationHandler[JoinedRainTrip, PartialRainAverages](
@@ -1,41 +1,29 @@
 import logging
-from dataclasses import dataclass
 
 from common.messages.joined import JoinedYearTrip
 from common.messages.aggregated import PartialYearCounts
-from common.persistence import WithState
+from common.persistence import WithStateArrays
 
 from .config import Config
 
 
-@dataclass
-class Counts:
-    # station name -> count
-    counts_year_base: dict[str, int]
-    counts_year_compared: dict[str, int]
-
-
-class YearAggregator(WithState[Counts]):
-    def __init__(self) -> None:
-        super().__init__(Counts({}, {}))
-
+# (year, station id) -> count
+class YearAggregator(WithStateArrays[tuple[str, int]]):
     def handle_joined(self, trip: JoinedYearTrip) -> None:
-        if trip.year == Config().year_base:
-            self.__add_to(self.state.counts_year_base, trip)
-        elif trip.year == Config().year_compared:
-            self.__add_to(self.state.counts_year_compared, trip)
-        else:
+        if trip.year not in (Config().year_base, Config().year_compared):
             logging.warning(f"Received trip from unexpected year: {trip.year}")
-
-    def __add_to(self, counts: dict[str, int], trip: JoinedYearTrip) -> None:
-        counts[trip.start_station_name] = counts.get(trip.start_station_name, 0) + 1
+            return
+        self.add((trip.year, trip.start_station))
 
     def get_value(self) -> PartialYearCounts | None:
-        if len(self.state.counts_year_base) + len(self.state.counts_year_compared) == 0:
+        entries = self.entries()
+        if len(entries) == 0:
             return None
-        return PartialYearCounts(
-            self.state.counts_year_base, self.state.counts_year_compared
-        )
-
-    def reset(self) -> None:
-        self.state = Counts({}, {})
+        counts_year_base = {}
+        counts_year_compared = {}
+        for (year, station), count, _ in entries:
+            if year == Config().year_base:
+                counts_year_base[station] = count
+            else:
+                counts_year_compared[station] = count
+        return PartialYearCounts(counts_year_base, counts_year_compared)
@@ -3,6 +3,7 @@ from shared.log import setup_logs
 
 from common.messages.joined import JoinedYearTrip
 from common.messages.aggregated import PartialYearCounts
+from common.persistence import setup_durability
 from common.util import process_loop
 
 from ..common.aggregation_handler import AggregationHandler
@@ -13,6 +14,7 @@ from .config import Config
 
 def main() -> None:
     setup_logs(Config().log_level)
+    setup_durability(Config().durability, Config().durability_fsync_millis)
 
     process_loop(
         lambda: AggregationHandler[JoinedYearTrip, PartialYearCounts](
@@ -2,13 +2,16 @@ from .protocol import CommsProtocol
 
 from .base import SystemCommunicationBase
 from .send import CommsSend
-from .send.reliable import ReliableComms
+from .send.reliable import ReliableComms, ReliableConfig
 from .receive import CommsReceive
 from .receive.reliable import (
     ReliableReceive,
     FilterConfig,
+    FilterMode,
 )
 from .util import setup_job_queues
+from .serialization import Serialization
+from .envelope import package_headers
 from .heartbeat import HeartbeatSender, AliveMessage
 
 __all__ = [
@@ -18,8 +21,12 @@ __all__ = [
     "CommsReceive",
     "ReliableReceive",
     "ReliableComms",
+    "ReliableConfig",
     "setup_job_queues",
+    "Serialization",
+    "package_headers",
     "FilterConfig",
+    "FilterMode",
     "HeartbeatSender",
     "AliveMessage",
     "SystemCommunicationBase",
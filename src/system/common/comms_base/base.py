@@ -1,19 +1,45 @@
+from dataclasses import dataclass
 import logging
+import time
+from typing import Any, Callable
 
 from pika import BlockingConnection, ConnectionParameters
 from pika.adapters.blocking_connection import BlockingChannel
-from pika.exceptions import ChannelWrongStateError, ConnectionWrongStateError
+from pika.exceptions import (
+    AMQPError,
+    AMQPConnectionError,
+    ChannelWrongStateError,
+    ConnectionWrongStateError,
+)
 
 from .protocol import CommsProtocol
 from common.config_base import ConfigProtocol
 from .util import get_host_data
 
+# Attempts to connect again after losing the connection, and the seconds
+# between them
+RECONNECT_ATTEMPTS = 5
+RECONNECT_DELAY_SECONDS = 1.0
+
+
+@dataclass(eq=False)
+class Timer:
+    """
+    Timer set with call_later(), kept to set it again after reconnecting
+    """
+
+    callback: Callable[[], None]
+    deadline: float  # time.monotonic() when it's due
+    handle: Any = None  # the timer of the current connection
+
 
 # Base communication class. See protocol.py for more details about the methods.
 class SystemCommunicationBase(CommsProtocol):
     __conn: BlockingConnection
     __ch: BlockingChannel
     __data: tuple[str, str] | None = None
+    __rabbit_host: str
+    __timers: set[Timer]
 
     @property
     def connection(self) -> BlockingConnection:
@@ -37,9 +63,75 @@ class SystemCommunicationBase(CommsProtocol):
 
     def __init__(self, config: ConfigProtocol) -> None:
         logging.info(f"Host ID: {self.id}")
-        self.__conn = BlockingConnection(ConnectionParameters(host=config.rabbit_host))
+        self.__rabbit_host = config.rabbit_host
+        self.__timers = set()
+        self.__connect()
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """
+        Like connection.call_later(), but the timer is kept if the connection
+        is replaced in the meantime. Returns the timer to cancel it.
+        """
+        timer = Timer(callback, time.monotonic() + delay)
+        self.__timers.add(timer)
+        self.__schedule(timer)
+        return timer
+
+    def remove_timeout(self, timer: Timer) -> None:
+        """
+        Cancels a timer set with call_later()
+        """
+        self.__timers.discard(timer)
+        self.connection.remove_timeout(timer.handle)
+
+    def reconnect(self) -> None:
+        """
+        Replaces the connection and the channel after losing them, then
+        restores what was set up on them with _reconnected()
+        """
+        started = time.monotonic()
+        try:
+            self.close()
+        except AMQPError:
+            # already lost
+            pass
+        for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+            try:
+                self.__connect()
+                break
+            except AMQPConnectionError as e:
+                if attempt == RECONNECT_ATTEMPTS:
+                    raise
+                logging.warning(
+                    f"Failed to reconnect ({attempt}/{RECONNECT_ATTEMPTS})."
+                    f" Details: {e}"
+                )
+                time.sleep(RECONNECT_DELAY_SECONDS)
+
+        for timer in self.__timers:
+            self.__schedule(timer)
+        self._reconnected()
+        logging.info(f"Reconnected in {(time.monotonic() - started) * 1000:.0f}ms")
+
+    def _reconnected(self) -> None:
+        """
+        Called after reconnecting, once the timers are set again. Subclasses
+        set up the new channel like the previous one.
+        """
+        pass
+
+    def __connect(self) -> None:
+        self.__conn = BlockingConnection(ConnectionParameters(host=self.__rabbit_host))
         self.__ch = self.connection.channel()
 
+    def __schedule(self, timer: Timer) -> None:
+        def fire() -> None:
+            self.__timers.discard(timer)
+            timer.callback()
+
+        delay = max(0.0, timer.deadline - time.monotonic())
+        timer.handle = self.connection.call_later(delay, fire)
+
     def close(self) -> None:
         # Ignore errors if the connection/channel is already closed
         try:
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, TypeVar
+
+from pika import BasicProperties
+
+from common.messages.comms import Package
+
+T = TypeVar("T")
+
+# AMQP headers with the package metadata, so that receivers can filter
+# duplicates without decoding the body
+KIND_HEADER = "kind"
+JOB_ID_HEADER = "job_id"
+MSG_ID_HEADER = "msg_id"
+MAYBE_REDELIVERED_HEADER = "maybe_redelivered"
+SEQUENCE_ID_HEADER = "seq_id"
+PACKAGE_KIND = "package"
+
+
+def sequence_id(stream: str, number: int) -> str:
+    """
+    Id of the package number in a producer's stream, with the same
+    "{prefix};{number}" format as message ids
+    """
+    return f"{stream};{number}"
+
+
+def package_headers(package: Package[Any], seq_id: str | None = None) -> dict[str, Any]:
+    headers: dict[str, Any] = {
+        KIND_HEADER: PACKAGE_KIND,
+        JOB_ID_HEADER: package.job_id,
+        MAYBE_REDELIVERED_HEADER: package.maybe_redelivered,
+    }
+    if package.msg_id is not None:
+        headers[MSG_ID_HEADER] = package.msg_id
+    if seq_id is not None:
+        headers[SEQUENCE_ID_HEADER] = seq_id
+    return headers
+
+
+@dataclass
+class ReceivedPackage(Generic[T]):
+    """
+    A received package whose body is only decoded when load() is called
+    """
+
+    job_id: str
+    msg_id: str | None
+    maybe_redelivered: bool
+    load: Callable[[], Package[T]]
+    # sequence id stamped by the producer, if any
+    seq_id: str | None = None
+
+    @staticmethod
+    def from_headers(
+        properties: BasicProperties, load: Callable[[], Package[T]]
+    ) -> "ReceivedPackage[T] | None":
+        """
+        Reads the package metadata from the message headers.
+        Returns None if the message wasn't sent with them.
+        """
+        headers = properties.headers
+        if not headers or headers.get(KIND_HEADER) != PACKAGE_KIND:
+            return None
+        return ReceivedPackage(
+            headers[JOB_ID_HEADER],
+            headers.get(MSG_ID_HEADER),
+            bool(headers.get(MAYBE_REDELIVERED_HEADER)),
+            load,
+            headers.get(SEQUENCE_ID_HEADER),
+        )
+
+    @staticmethod
+    def of(package: Package[T]) -> "ReceivedPackage[T]":
+        """
+        Wraps an already decoded package
+        """
+        return ReceivedPackage(
+            package.job_id, package.msg_id, package.maybe_redelivered, lambda: package
+        )
@@ -22,9 +22,7 @@ class HeartbeatSender:
         self.msg = serialize(AliveMessage(self.comms.name)).encode()
 
     def setup_timer(self) -> None:
-        self.comms.connection.call_later(
-            self.config.heartbeat_frequency, self.__heartbeat_timer
-        )
+        self.comms.call_later(self.config.heartbeat_frequency, self.__heartbeat_timer)
 
     def __heartbeat_timer(self) -> None:
         self.setup_timer()
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Protocol, TypeVar
+from typing import Any, Callable, Protocol, TypeVar
 
 from pika import BlockingConnection
 from pika.adapters.blocking_connection import BlockingChannel
@@ -46,6 +46,29 @@ class CommsProtocol(Protocol):
     def __init__(self, config: ConfigProtocol) -> None:
         ...
 
+    @abstractmethod
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Any:
+        """
+        Calls the callback after delay seconds, even if the connection is
+        replaced in the meantime. Returns the timer to cancel it.
+        """
+        ...
+
+    @abstractmethod
+    def remove_timeout(self, timer: Any) -> None:
+        """
+        Cancels a timer set with call_later()
+        """
+        ...
+
+    @abstractmethod
+    def reconnect(self) -> None:
+        """
+        Replaces the lost connection and channel with new ones, setting them
+        up like the previous ones
+        """
+        ...
+
     @abstractmethod
     def close(self) -> None:
         """
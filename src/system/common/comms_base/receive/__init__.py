@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+import logging
 from threading import Event
 import time
 from typing import Callable, Protocol, TypeVar, Generic, Any
@@ -8,12 +9,14 @@ from signal import signal, SIGTERM
 
 from pika import spec
 from pika.adapters.blocking_connection import BlockingChannel
+from pika.exceptions import AMQPConnectionError
 
-from shared.serde import deserialize, get_generic_types
+from shared.serde import get_generic_types
 from common.config_base import ConfigProtocol
 from common.util import register_self_destruct
 
 from ..protocol import TIMEOUT_SECONDS, CommsProtocol
+from ..serialization import BodyDecoder, body_decoder
 from ..util import set_healthy
 
 IN = TypeVar("IN")
@@ -35,11 +38,17 @@ class CommsReceive(CommsProtocol, Generic[IN], ABC):
     callback: Callable[[IN], None] | None = None
     timeout_callbacks: dict[str, "TimeoutInfo"]
     ctags: dict[str, str]
+    # handler callbacks running. It's left above 0 when one fails midway, as
+    # its state may be half updated
+    handling: int
+    prefetch_count: int
 
     def __init__(self, config: ReceiveConfig, with_interrupt: bool = True) -> None:
         super().__init__(config)
-        self.channel.basic_qos(prefetch_count=config.prefetch_count)
+        self.prefetch_count = config.prefetch_count
+        self.channel.basic_qos(prefetch_count=self.prefetch_count)
         self.callback = None
+        self.handling = 0
         self.timeout_callbacks = {}
         self.interrupted = Event()
         self.stopped = Event()
@@ -55,11 +64,28 @@ class CommsReceive(CommsProtocol, Generic[IN], ABC):
         """
         return get_generic_types(self, CommsReceive)[0]
 
+    @cached_property
+    def in_decoder(self) -> BodyDecoder:
+        """
+        Compiled decoder for messages of the input type
+        """
+        return body_decoder(self.in_type)
+
     def start_consuming(self) -> None:
         """
-        Start consuming messages from the queues
+        Start consuming messages from the queues. If the connection is lost,
+        it reconnects and keeps consuming with the same handlers, unless one
+        of them was interrupted.
         """
-        self.channel.start_consuming()
+        while True:
+            try:
+                self.channel.start_consuming()
+                return
+            except AMQPConnectionError as e:
+                if self.handling > 0:
+                    raise
+                logging.warning(f"Lost the connection, reconnecting. Details: {e}")
+                self.reconnect()
 
     def stop_consuming(self) -> None:
         """
@@ -79,13 +105,13 @@ class CommsReceive(CommsProtocol, Generic[IN], ABC):
         Returns an object that can be used to cancel the timer.
         """
         # logging.debug(f"Setting timer for {timeout_seconds} seconds")
-        return self.connection.call_later(timeout_seconds, callback)
+        return self.call_later(timeout_seconds, lambda: self._handle(callback))
 
     def cancel_timer(self, timer: Any) -> None:
         """
         Cancels the timer
         """
-        self.connection.remove_timeout(timer)
+        self.remove_timeout(timer)
 
     def is_stopped(self) -> bool:
         """
@@ -100,6 +126,27 @@ class CommsReceive(CommsProtocol, Generic[IN], ABC):
         """
         ...
 
+    def _reconnected(self) -> None:
+        """
+        Sets up the new channel: declares the definitions again and consumes
+        from the same queues. Messages not acknowledged on the previous one
+        are redelivered.
+        """
+        self.channel.basic_qos(prefetch_count=self.prefetch_count)
+        queues = list(self.ctags)
+        self.ctags = {}
+        self._load_definitions()
+        for queue in queues:
+            self._start_consuming_from(queue)
+
+    def _handle(self, callback: Callable[[], None]) -> None:
+        """
+        Runs a callback of the handlers, which may update their state
+        """
+        self.handling += 1
+        callback()
+        self.handling -= 1
+
     def _start_consuming_from(self, queue: str) -> None:
         """
         Starts consuming from the given queue.
@@ -148,11 +195,11 @@ class CommsReceive(CommsProtocol, Generic[IN], ABC):
         """
         prev = self.timeout_callbacks.get(queue, None)
         if prev is not None:
-            self.connection.remove_timeout(prev.timer)
+            self.remove_timeout(prev.timer)
 
         info = self.TimeoutInfo(queue, callback, timeout, None)
         self.timeout_callbacks[queue] = info
-        info.timer = self.set_timer(lambda: self.__timeout_handler(info), timeout)
+        info.timer = self.call_later(timeout, lambda: self.__timeout_handler(info))
 
     def _set_empty_queue_callback(
         self, queue: str, callback: Callable[[], None]
@@ -166,17 +213,23 @@ class CommsReceive(CommsProtocol, Generic[IN], ABC):
         )
 
     def _process_message(
-        self, message: str, queue: str, delivery_tag: int | None, redelivered: bool
+        self,
+        body: bytes,
+        properties: spec.BasicProperties,
+        queue: str,
+        delivery_tag: int | None,
+        redelivered: bool,
     ) -> None:
         """
         Processes a message. Can be overridden by subclasses.
 
-        Deserializes the message and calls the callback if it's set.
-        Should acknowledge the message.
+        Deserializes the message according to its content type and calls the
+        callback if it's set. Should acknowledge the message.
         """
-        decoded = deserialize(self.in_type, message)  # type: ignore
-        if self.callback is not None:
-            self.callback(decoded)
+        decoded = self.in_decoder(body, properties.content_type)
+        callback = self.callback
+        if callback is not None:
+            self._handle(lambda: callback(decoded))
 
         if delivery_tag is not None:
             register_self_destruct("pre_ack")
@@ -227,7 +280,7 @@ class CommsReceive(CommsProtocol, Generic[IN], ABC):
         queue: str,
         ch: BlockingChannel,
         method: spec.Basic.Deliver,
-        _props: spec.BasicProperties,
+        props: spec.BasicProperties,
         body: bytes,
     ) -> None:
         """
@@ -245,7 +298,7 @@ class CommsReceive(CommsProtocol, Generic[IN], ABC):
             timeout_info.last_message_on = time.time()
 
         self._process_message(
-            body.decode(), queue, method.delivery_tag, method.redelivered
+            body, props, queue, method.delivery_tag, method.redelivered
         )
 
     def __timeout_handler(self, info: "TimeoutInfo") -> None:
@@ -262,15 +315,15 @@ class CommsReceive(CommsProtocol, Generic[IN], ABC):
         #     f" {info.last_message_on}, now: {now}"
         # )
         if info.last_message_on is None:
-            info.callback()
+            self._handle(info.callback)
             return
 
         seconds_remaining = info.time_seconds - (now - info.last_message_on)
         if seconds_remaining <= 0:
-            info.callback()
+            self._handle(info.callback)
             self.timeout_callbacks.pop(info.queue)
         else:
-            info.timer = self.connection.call_later(
+            info.timer = self.call_later(
                 seconds_remaining, lambda: self.__timeout_handler(info)
             )
 
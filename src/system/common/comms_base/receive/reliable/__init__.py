@@ -1,6 +1,8 @@
 from typing import Generic, Any
 from functools import cached_property
 
+from pika import BasicProperties
+
 from shared.serde import get_generic_types
 from common.messages import Message, P
 from common.messages.comms import Package
@@ -8,9 +10,11 @@ from common.util import register_self_destruct
 
 from .. import CommsReceive, ReceiveConfig
 from .duplicate_filters.simple import DuplicateFilter, DuplicateFilterSimple
+from .duplicate_filters import FilterMode
 from .duplicate_filters.distributed import DuplicateFilterDistributed, FilterConfig
+from .duplicate_filters.sequence import DuplicateFilterSequence
 
-__all__ = ["FilterConfig"]
+__all__ = ["FilterConfig", "FilterMode"]
 
 
 class ReliableReceive(Generic[P], CommsReceive[Message[P]]):
@@ -23,8 +27,25 @@ class ReliableReceive(Generic[P], CommsReceive[Message[P]]):
         distributed_filter_config: FilterConfig | None = None,
         with_interrupt: bool = True,
     ) -> None:
+        if (
+            distributed_filter_config
+            and distributed_filter_config.duplicate_filter == FilterMode.SEQUENCE
+            and distributed_filter_config.host_count > 1
+        ):
+            # the nodes of a stage share its queues, so a stream can be
+            # consumed by more than one of them
+            raise ValueError(
+                f"The {FilterMode.SEQUENCE} duplicate filter is only exactly-once"
+                " with a single node consuming each stream, this stage has"
+                f" {distributed_filter_config.host_count}"
+            )
         super().__init__(config, with_interrupt)
-        if distributed_filter_config:
+        if (
+            distributed_filter_config
+            and distributed_filter_config.duplicate_filter == FilterMode.SEQUENCE
+        ):
+            self.duplicate_filter = DuplicateFilterSequence(self)
+        elif distributed_filter_config:
             self.duplicate_filter = DuplicateFilterDistributed(
                 self, distributed_filter_config
             )
@@ -45,19 +66,35 @@ class ReliableReceive(Generic[P], CommsReceive[Message[P]]):
     def handle_package(self, package: Package[P], delivery_tag: int | None) -> None:
         self.current_msg_id = package.msg_id
 
-        if self.callback is not None:
-            for msg in package.messages:
-                self.callback(Message(package.job_id, msg))
+        callback = self.callback
+        if callback is not None:
+
+            def handle_messages() -> None:
+                for msg in package.messages:
+                    callback(Message(package.job_id, msg))
+
+            self._handle(handle_messages)
 
         self._post_process(delivery_tag)
 
     def finished_job(self, job_id: str) -> None:
         self.duplicate_filter.clear_job(job_id)
 
+    def _reconnected(self) -> None:
+        super()._reconnected()
+        self.duplicate_filter.reconnected()
+
     def _process_message(
-        self, data: str, queue: str, delivery_tag: int | None, redelivered: bool
+        self,
+        body: bytes,
+        properties: BasicProperties,
+        queue: str,
+        delivery_tag: int | None,
+        redelivered: bool,
     ) -> None:
-        self.duplicate_filter.received_message(data, queue, delivery_tag, redelivered)
+        self.duplicate_filter.received_message(
+            body, properties, queue, delivery_tag, redelivered
+        )
 
     def _post_process(self, delivery_tag: int | None) -> None:
         """
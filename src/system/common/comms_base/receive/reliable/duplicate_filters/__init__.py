@@ -1,21 +1,35 @@
 import logging
-from typing import Generic, TypeVar, Any, Protocol
+from typing import Callable, Generic, TypeVar, Any, Protocol
 from abc import abstractmethod, ABC
-from datetime import datetime
+from enum import StrEnum
+
+from pika import BasicProperties
 
 from common.comms_base.protocol import CommsProtocol
 from common.messages.comms import PackageHandler
-from common.persistence import StatePersistor
+from common.persistence import StatePersistor, job_key
 from common.util import register_self_destruct
 
+from .processed import HashedIds, HashedIndex, ProcessedIds, Sequences, split_msg_id
 
 RECEIVED_PACKAGES_KEY = "_received_packages"
-KEEP_MINUTES = 2
+RECEIVED_SEQUENCES_KEY = "_received_sequences"
+RECEIVED_OTHERS_KEY = "_received_others"
+RECEIVED_OTHERS_INDEX_KEY = "_received_others_index"
+# minimum amount of lines in the received packages log before compacting it
+COMPACT_MIN_LINES = 1000
 
 IN = TypeVar("IN", covariant=True)
 T = TypeVar("T", contravariant=True)
 
 
+class FilterMode(StrEnum):
+    # checks possibly redelivered packages with the other nodes of the stage
+    DISTRIBUTED = "distributed"
+    # checks the producers' sequence numbers locally
+    SEQUENCE = "sequence"
+
+
 class PackageComms(PackageHandler[T], CommsProtocol, Protocol[T]):
     @property
     def in_type(self) -> Any:
@@ -24,14 +38,23 @@ class PackageComms(PackageHandler[T], CommsProtocol, Protocol[T]):
     def _start_consuming_from(self, queue: str) -> None:
         pass
 
+    def set_timer(self, callback: Callable[[], None], timeout_seconds: float) -> Any:
+        pass
+
+    def cancel_timer(self, timer: Any) -> None:
+        pass
+
 
 class DuplicateFilter(Generic[IN], ABC):
-    # job_id -> timestamp -> msg_id
-    received_messages: dict[str, dict[datetime, set[str]]]
+    # job_id -> processed message ids, loaded from disk on first use
+    processed_ids: dict[str, ProcessedIds]
+    # job_id -> lines in the received packages log
+    log_lines: dict[str, int]
     comms: PackageComms[IN]
 
     def __init__(self, package_handler: PackageComms[IN]) -> None:
-        self.received_messages = {}
+        self.processed_ids = {}
+        self.log_lines = {}
         self.comms = package_handler
 
     def _ack(self, delivery_tag: int | None) -> None:
@@ -45,49 +68,108 @@ class DuplicateFilter(Generic[IN], ABC):
 
     def _processed(self, job_id: str, msg_id: str) -> None:
         """
-        Mark the message as processed.
+        Mark the message as processed. Ids that end in a number are appended
+        to a log that is compacted into the per prefix sequences once it
+        outgrows them, the rest are kept in their own log, with the index of
+        their hashes stored next to it each time it's merged.
         """
-        last_ids = self.received_messages.setdefault(job_id, {})
-        timestamp = datetime.now().replace(second=0, microsecond=0)
-        last_ids.setdefault(timestamp, set())
-        last_ids[timestamp].add(msg_id)
-        self.__remove_old(last_ids, timestamp)
-        StatePersistor().append(self.__key(job_id), msg_id)
+        ids = self.__processed_ids(job_id)
+        if split_msg_id(msg_id) is None:
+            others = ids.others
+            if not others.add(msg_id):
+                return
+            StatePersistor().append(self.__key(RECEIVED_OTHERS_KEY, job_id), msg_id)
+            if not others.recent:
+                StatePersistor().store(
+                    self.__key(RECEIVED_OTHERS_INDEX_KEY, job_id), others.index()
+                )
+            return
+
+        ids.add(msg_id)
+
+        lines = self.log_lines.get(job_id, 0) + 1
+        if lines < max(COMPACT_MIN_LINES, ids.sequences_size()):
+            StatePersistor().append(self.__key(RECEIVED_PACKAGES_KEY, job_id), msg_id)
+            self.log_lines[job_id] = lines
+            return
+
+        logging.debug(f"Job {job_id} | Compacting processed message ids")
+        StatePersistor().store(
+            self.__key(RECEIVED_SEQUENCES_KEY, job_id), ids.stored_sequences()
+        )
+        StatePersistor().remove(self.__key(RECEIVED_PACKAGES_KEY, job_id))
+        self.log_lines[job_id] = 0
 
     def _was_processed(self, job_id: str, msg_id: str) -> bool:
         """
-        Check if the message was already processed. Checks first
-        if it's available in memory, then in disk.
+        Check if the message was already processed.
         """
-        last_ids = self.received_messages.get(job_id, {})
-        for ids_per_min in last_ids.values():
-            if msg_id in ids_per_min:
-                return True
-        logging.debug(f"Iterating over all past message ids for job {job_id} in disk")
-        return msg_id in StatePersistor().iter(self.__key(job_id))
+        return msg_id in self.__processed_ids(job_id)
 
     def clear_job(self, job_id: str) -> None:
         """
-        Clears all the messages for the given job_id
+        Clears all the messages for the given job_id, along with the rest of
+        the job's namespace
         """
-        self.received_messages.pop(job_id, None)
-        # StatePersistor().remove(self.__key(job_id))
+        self.processed_ids.pop(job_id, None)
+        self.log_lines.pop(job_id, None)
+        StatePersistor().remove_job(job_id)
 
-    def __remove_old(self, ids: dict[datetime, set[str]], current: datetime) -> None:
-        for timestamp in list(ids):
-            if (current - timestamp).total_seconds() / 60 <= KEEP_MINUTES:
-                break
-            ids.pop(timestamp, None)
-
-    def __key(self, job_id: str) -> str:
-        return f"{RECEIVED_PACKAGES_KEY}_{job_id}"
+    def __processed_ids(self, job_id: str) -> ProcessedIds:
+        """
+        Returns the processed ids of the job. The first time, they're loaded
+        from the ids committed to disk.
+        """
+        ids = self.processed_ids.get(job_id)
+        if ids is None:
+            logging.debug(f"Job {job_id} | Loading processed message ids from disk")
+            persistor = StatePersistor()
+            sequences = persistor.load(
+                self.__key(RECEIVED_SEQUENCES_KEY, job_id), Sequences
+            )
+            others = HashedIds(
+                persistor.read(self.__key(RECEIVED_OTHERS_KEY, job_id)),
+                persistor.load(
+                    self.__key(RECEIVED_OTHERS_INDEX_KEY, job_id), HashedIndex
+                ),
+            )
+            ids = ProcessedIds(sequences, others)
+            lines = 0
+            for msg_id in persistor.iter(self.__key(RECEIVED_PACKAGES_KEY, job_id)):
+                ids.add(msg_id)
+                lines += 1
+            self.processed_ids[job_id] = ids
+            self.log_lines[job_id] = lines
+        return ids
+
+    def __key(self, prefix: str, job_id: str) -> str:
+        return job_key(job_id, prefix)
 
     @abstractmethod
     def received_message(
-        self, message: str, queue: str, delivery_tag: int | None, redelivered: bool
+        self,
+        body: bytes,
+        properties: BasicProperties,
+        queue: str,
+        delivery_tag: int | None,
+        redelivered: bool,
     ) -> None:
         ...
 
+    def reconnected(self) -> None:
+        """
+        Called after the comms reconnected. The messages it didn't acknowledge
+        yet will be redelivered.
+        """
+        pass
+
+    def has_pending_checks(self) -> bool:
+        """
+        Returns whether any received message is waiting on a check, without
+        being acknowledged yet.
+        """
+        return False
+
     @abstractmethod
     def pending_count(self, queue: str) -> int:
         """
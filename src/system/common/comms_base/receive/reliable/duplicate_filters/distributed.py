@@ -1,24 +1,37 @@
-from typing import Generic, Protocol
+from typing import Any, Generic, Protocol
 from dataclasses import dataclass
-from functools import singledispatchmethod
+from functools import singledispatchmethod, cached_property
 from uuid import uuid4
 import logging
 
-from shared.serde import deserialize, serialize
+from pika import BasicProperties
+
+from shared.serde import serialize
 from common.messages.comms import (
     Package,
     CommsMessage,
     CheckProcessed,
     CheckProcessedResponse,
+    CheckProcessedBatch,
+    CheckProcessedResponseBatch,
     RemoveCheck,
 )
 
-from . import DuplicateFilter, IN, PackageComms
+from common.comms_base.envelope import ReceivedPackage
+from common.comms_base.serialization import BodyDecoder, body_decoder
+
+from . import DuplicateFilter, FilterMode, IN, PackageComms
 
 __all__ = ["DuplicateFilter"]
 
+# Checks are sent in batches of up to this size, or after waiting this long
+# for more packages to check
+CHECK_BATCH_SIZE = 100
+CHECK_LINGER_SECONDS = 0.05
+
 
 class FilterConfig(Protocol):
+    duplicate_filter: FilterMode
     filters_exchange: str
     filters_queue_format: str
     filters_routing_keys_format: list[str]
@@ -28,7 +41,7 @@ class FilterConfig(Protocol):
 @dataclass
 class PendingCheck(Generic[IN]):
     queue: str
-    package: Package[IN]
+    package: ReceivedPackage[IN]
     responses: set[str]
     delivery_tag: int | None
 
@@ -37,11 +50,25 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
     config: FilterConfig
     # uuid -> PendingCheck
     pending_checks: dict[str, PendingCheck[IN]]
+    # (job_id, msg_id) -> uuid
+    checks_by_package: dict[tuple[str, str | None], str]
+    # queue -> uuids
+    checks_by_queue: dict[str, set[str]]
+    # checks not sent yet
+    outgoing_checks: list[CheckProcessed]
+    outgoing_checks_timer: Any
+    # host_id -> responses not sent yet
+    outgoing_responses: dict[str, list[CheckProcessedResponse]]
 
     def __init__(self, package_handler: PackageComms[IN], config: FilterConfig) -> None:
         super().__init__(package_handler)
         self.config = config
         self.pending_checks = {}
+        self.checks_by_package = {}
+        self.checks_by_queue = {}
+        self.outgoing_checks = []
+        self.outgoing_checks_timer = None
+        self.outgoing_responses = {}
 
     def load_definitions(self) -> None:
         for i in range(1, self.config.host_count + 1):
@@ -54,29 +81,57 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
         filters_queue = self.config.filters_queue_format.format(host_id=self.comms.id)
         self.comms._start_consuming_from(filters_queue)
 
+    def reconnected(self) -> None:
+        # the packages being checked are redelivered and checked again
+        if self.outgoing_checks_timer is not None:
+            self.comms.cancel_timer(self.outgoing_checks_timer)
+            self.outgoing_checks_timer = None
+        self.pending_checks = {}
+        self.checks_by_package = {}
+        self.checks_by_queue = {}
+        self.outgoing_checks = []
+        self.outgoing_responses = {}
+        self.load_definitions()
+
     def received_message(
-        self, data: str, queue: str, delivery_tag: int | None, redelivered: bool
+        self,
+        body: bytes,
+        properties: BasicProperties,
+        queue: str,
+        delivery_tag: int | None,
+        redelivered: bool,
     ) -> None:
-        message = self.__deserialize_package(data)
+        message: ReceivedPackage[IN] | CommsMessage[IN] | None
+        message = ReceivedPackage.from_headers(
+            properties, lambda: self.__decode_package(body, properties.content_type)
+        )
+        if message is None:
+            # sent without headers, the kind is only known after decoding it
+            message = self.__decode_message(body, properties.content_type)
+            if isinstance(message, Package):
+                message = ReceivedPackage.of(message)
         self.handle_message(message, queue, delivery_tag, redelivered)
 
     def pending_count(self, queue: str) -> int:
-        return sum(1 for c in self.pending_checks.values() if c.queue == queue)
+        return len(self.checks_by_queue.get(queue, ()))
+
+    def has_pending_checks(self) -> bool:
+        return bool(self.pending_checks)
 
     @singledispatchmethod
     def handle_message(
         self,
-        message: CommsMessage[IN],
+        message: ReceivedPackage[IN] | CommsMessage[IN],
         queue: str,
         delivery_tag: int | None,
         redelivered: bool,
     ) -> None:
         raise NotImplementedError("Unknown message type")
 
-    @handle_message.register(Package)
+    @handle_message.register(ReceivedPackage)
     def handle_package(
         self,
-        package: Package[IN],
+        package: ReceivedPackage[IN],
         queue: str,
         delivery_tag: int | None,
         redelivered: bool,
@@ -112,8 +167,29 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
         delivery_tag: int | None,
         redelivered: bool,
     ) -> None:
+        self.__answer_check(check)
+        self.__send_responses()
+        self._ack(delivery_tag)
+
+    @handle_message.register
+    def handle_check_processed_batch(
+        self,
+        batch: CheckProcessedBatch,
+        queue: str,
+        delivery_tag: int | None,
+        redelivered: bool,
+    ) -> None:
+        for check in batch.checks:
+            self.__answer_check(check)
+        self.__send_responses()
+        self._ack(delivery_tag)
+
+    def __answer_check(self, check: CheckProcessed) -> None:
+        """
+        Buffers the response to the check, to be sent with the rest of the
+        responses to the same host
+        """
         if check.host_id == self.comms.id:
-            self._ack(delivery_tag)
             return
 
         if self.__verify_local_checks_for(check):
@@ -123,42 +199,48 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
                 f" {check.host_id} for {check.msg_id}. Processed locally: {processed}"
             )
             response = CheckProcessedResponse(check.check_id, processed, self.comms.id)
+            self.outgoing_responses.setdefault(check.host_id, []).append(response)
+
+    def __send_responses(self) -> None:
+        for host_id, responses in self.outgoing_responses.items():
+            batch = CheckProcessedResponseBatch(responses)
             self.comms.channel.basic_publish(
                 self.config.filters_exchange,
-                f"{response.get_routing_key()}.{check.host_id}",
-                serialize(response).encode(),
+                f"{batch.get_routing_key()}.{host_id}",
+                serialize(batch).encode(),
             )
-        self._ack(delivery_tag)
+        self.outgoing_responses = {}
 
     def __verify_local_checks_for(self, check: CheckProcessed) -> bool:
         """
         Verifies if a received check is for the same package as a local pending check.
         Returns whether to answer with a CheckProcessedResponse or not.
         """
-        for id, pc in list(self.pending_checks.items()):
-            if (pc.package.job_id, pc.package.msg_id) != (check.job_id, check.msg_id):
-                continue
-            if check.host_id < self.comms.id:
-                logging.warn(
-                    f"Job {check.job_id} | Received CheckProcessed from host"
-                    f" {check.host_id} < self ({self.comms.id}) for {check.msg_id}"
-                    " already checking locally, answering with RemoveCheck"
-                )
-                response = RemoveCheck(check.check_id, self.comms.id)
-                self.comms.channel.basic_publish(
-                    self.config.filters_exchange,
-                    f"{response.get_routing_key()}.{check.host_id}",
-                    serialize(response).encode(),
-                )
-                return False
+        id = self.checks_by_package.get((check.job_id, check.msg_id))
+        if id is None:
+            return True
+
+        if check.host_id < self.comms.id:
             logging.warn(
                 f"Job {check.job_id} | Received CheckProcessed from host"
-                f" {check.host_id} > self ({self.comms.id}) for {check.msg_id} already"
-                " checking locally, removing local check and nacking message"
+                f" {check.host_id} < self ({self.comms.id}) for {check.msg_id}"
+                " already checking locally, answering with RemoveCheck"
             )
-            self.pending_checks.pop(id)
-            self._nack(pc.delivery_tag)
-            return True
+            response = RemoveCheck(check.check_id, self.comms.id)
+            self.comms.channel.basic_publish(
+                self.config.filters_exchange,
+                f"{response.get_routing_key()}.{check.host_id}",
+                serialize(response).encode(),
+            )
+            return False
+        logging.warn(
+            f"Job {check.job_id} | Received CheckProcessed from host"
+            f" {check.host_id} > self ({self.comms.id}) for {check.msg_id} already"
+            " checking locally, removing local check and nacking message"
+        )
+        pc = self.pending_checks[id]
+        self.__pop_check(id)
+        self._nack(pc.delivery_tag)
         return True
 
     @handle_message.register
@@ -169,9 +251,24 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
         delivery_tag: int | None,
         redelivered: bool,
     ) -> None:
+        self.__handle_response(response)
+        self._ack(delivery_tag)
+
+    @handle_message.register
+    def handle_check_processed_response_batch(
+        self,
+        batch: CheckProcessedResponseBatch,
+        queue: str,
+        delivery_tag: int | None,
+        redelivered: bool,
+    ) -> None:
+        for response in batch.responses:
+            self.__handle_response(response)
+        self._ack(delivery_tag)
+
+    def __handle_response(self, response: CheckProcessedResponse) -> None:
         check = self.pending_checks.get(response.check_id, None)
         if check is None:
-            self._ack(delivery_tag)
             return
 
         if response.processed:
@@ -180,9 +277,8 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
                 f" {check.package.msg_id} had been processed by"
                 f" {response.host_id}, acknowledging message"
             )
-            self.pending_checks.pop(response.check_id)
+            self.__pop_check(response.check_id)
             self._ack(check.delivery_tag)
-            self._ack(delivery_tag)
             return
 
         check.responses.add(response.host_id)
@@ -197,9 +293,8 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
                 f" {check.package.msg_id} hadn't been processed by"
                 " any other node, processing locally"
             )
-            check = self.pending_checks.pop(response.check_id)
+            self.__pop_check(response.check_id)
             self.__process(check.package, check.delivery_tag)
-        self._ack(delivery_tag)
 
     @handle_message.register
     def handle_remove_check(
@@ -209,7 +304,7 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
         delivery_tag: int | None,
         redelivered: bool,
     ) -> None:
-        check = self.pending_checks.pop(response.check_id, None)
+        check = self.__pop_check(response.check_id)
         if check:
             logging.info(
                 f"Job {check.package.job_id} | Received RemoveCheck from host"
@@ -220,14 +315,12 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
         self._ack(delivery_tag)
 
     def __send_check(
-        self, msg: Package[IN], queue: str, delivery_tag: int | None
+        self, msg: ReceivedPackage[IN], queue: str, delivery_tag: int | None
     ) -> None:
         if not msg.msg_id:
             return
 
-        for ch in self.pending_checks.values():
-            if (ch.package.job_id, ch.package.msg_id) != (msg.job_id, msg.msg_id):
-                continue
+        if (msg.job_id, msg.msg_id) in self.checks_by_package:
             logging.warn(
                 f"Job {msg.job_id} | Received package {msg.msg_id} already being"
                 " checked, acknowledging duplicate"
@@ -237,17 +330,60 @@ class DuplicateFilterDistributed(DuplicateFilter[IN], Generic[IN]):
 
         check_id = str(uuid4())
         self.pending_checks[check_id] = PendingCheck(queue, msg, set(), delivery_tag)
+        self.checks_by_package[(msg.job_id, msg.msg_id)] = check_id
+        self.checks_by_queue.setdefault(queue, set()).add(check_id)
         check = CheckProcessed(check_id, msg.job_id, msg.msg_id, self.comms.id)
+        self.outgoing_checks.append(check)
+        if len(self.outgoing_checks) >= CHECK_BATCH_SIZE:
+            self.__send_checks()
+        elif self.outgoing_checks_timer is None:
+            self.outgoing_checks_timer = self.comms.set_timer(
+                self.__send_checks, CHECK_LINGER_SECONDS
+            )
+
+    def __send_checks(self) -> None:
+        if self.outgoing_checks_timer is not None:
+            self.comms.cancel_timer(self.outgoing_checks_timer)
+            self.outgoing_checks_timer = None
+        # skip the ones removed while waiting
+        checks = [c for c in self.outgoing_checks if c.check_id in self.pending_checks]
+        self.outgoing_checks = []
+        if not checks:
+            return
+
+        batch = CheckProcessedBatch(checks)
         self.comms.channel.basic_publish(
             self.config.filters_exchange,
-            check.get_routing_key(),
-            serialize(check).encode(),
+            batch.get_routing_key(),
+            serialize(batch).encode(),
         )
 
-    def __deserialize_package(self, message: str) -> CommsMessage[IN]:
-        return deserialize(CommsMessage[self.comms.in_type], message)  # type: ignore
+    def __pop_check(self, check_id: str) -> PendingCheck[IN] | None:
+        """
+        Removes the check from the pending ones and its indexes
+        """
+        check = self.pending_checks.pop(check_id, None)
+        if check is None:
+            return None
+        key = (check.package.job_id, check.package.msg_id)
+        self.checks_by_package.pop(key, None)
+        self.checks_by_queue[check.queue].discard(check_id)
+        return check
+
+    @cached_property
+    def __decode_package(self) -> BodyDecoder:
+        return body_decoder(Package[self.comms.in_type])  # type: ignore
+
+    @cached_property
+    def __decode_message(self) -> BodyDecoder:
+        """
+        Packages may be sent in binary, but the filter messages between nodes
+        are always JSON
+        """
+        in_type = self.comms.in_type
+        return body_decoder(CommsMessage[in_type], Package[in_type])  # type: ignore
 
-    def __process(self, package: Package[IN], delivery_tag: int | None) -> None:
+    def __process(self, package: ReceivedPackage[IN], delivery_tag: int | None) -> None:
         if package.msg_id:
             self._processed(package.job_id, package.msg_id)
-        self.comms.handle_package(package, delivery_tag)
+        self.comms.handle_package(package.load(), delivery_tag)
@@ -0,0 +1,300 @@
+from array import array
+from base64 import b64decode, b64encode
+from bisect import bisect_left
+from hashlib import blake2b
+from itertools import chain
+
+# prefix -> (first number in the bitmap, base64 bitmap of the processed numbers)
+Sequences = dict[str, tuple[int, str]]
+# bytes of ids covered, base64 sorted hashes and offsets of their lines
+HashedIndex = tuple[int, str, str]
+
+BLOOM_BITS_PER_ID = 10
+BLOOM_HASHES = 4
+BLOOM_MIN_CAPACITY = 1024
+# amount of recently added ids kept apart before merging them into the sorted array
+MERGE_SIZE = 1024
+
+
+class BloomFilter:
+    """
+    Bloom filter over 64-bit hashes. Positions are derived with double hashing
+    from the two halves of the hash.
+    """
+
+    bits: bytearray
+    size: int
+    capacity: int
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.size = capacity * BLOOM_BITS_PER_ID
+        self.bits = bytearray((self.size >> 3) + 1)
+
+    def add(self, value: int) -> None:
+        step = (value >> 32) | 1
+        position = value & 0xFFFFFFFF
+        for _ in range(BLOOM_HASHES):
+            position = (position + step) % self.size
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: int) -> bool:
+        step = (value >> 32) | 1
+        position = value & 0xFFFFFFFF
+        for _ in range(BLOOM_HASHES):
+            position = (position + step) % self.size
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class HashedIds:
+    """
+    Set of message ids, kept as the lines of a block of bytes, just like the
+    log they're stored in, so that restoring them is a single read. They're
+    indexed by a stable 64-bit hash: a sorted array with the offset of each
+    id's line, plus a small dict with the latest ones. A Bloom filter in front
+    answers most lookups for ids that weren't added, the rest take a binary
+    search, and a matching hash is confirmed by comparing the id in its line,
+    so a collision can't make a new id look added.
+
+    The sorted index is returned by index() to be stored next to the log, so
+    that restoring them only hashes the ids added after it.
+    """
+
+    data: bytearray
+    hashes: "array[int]"
+    offsets: "array[int]"
+    # hash -> offsets of the ids added after the sorted index
+    recent: dict[int, list[int]]
+    recent_count: int
+    # bytes of data covered by the sorted index
+    indexed: int
+    bloom: BloomFilter
+
+    def __init__(self, data: bytes = b"", index: HashedIndex | None = None) -> None:
+        self.data = bytearray(data)
+        self.hashes = array("q")
+        self.offsets = array("q")
+        self.recent = {}
+        self.recent_count = 0
+        self.indexed = 0
+        if index is not None and index[0] <= len(self.data):
+            self.indexed, hashes, offsets = index
+            self.hashes.frombytes(b64decode(hashes))
+            self.offsets.frombytes(b64decode(offsets))
+        offset = self.indexed
+        while offset < len(self.data):
+            end = self.__line_end(offset)
+            self.__add_recent(_hash(bytes(self.data[offset:end])), offset)
+            offset = end + 1
+        self.__rebuild_bloom()
+
+    def add(self, msg_id: str) -> bool:
+        """
+        Adds the id, returning whether it wasn't added already
+        """
+        encoded = msg_id.encode()
+        value = _hash(encoded)
+        if self.__contains_hash(value, encoded):
+            return False
+        offset = len(self.data)
+        self.data += encoded
+        self.data.append(ord("\n"))
+        self.__add_recent(value, offset)
+
+        if len(self) > self.bloom.capacity:
+            self.__rebuild_bloom()
+        else:
+            self.bloom.add(value)
+        return True
+
+    def index(self) -> HashedIndex:
+        """
+        Returns the sorted index, to be restored with the ids
+        """
+        return (
+            self.indexed,
+            b64encode(self.hashes.tobytes()).decode(),
+            b64encode(self.offsets.tobytes()).decode(),
+        )
+
+    def __contains__(self, msg_id: object) -> bool:
+        if not isinstance(msg_id, str):
+            return False
+        encoded = msg_id.encode()
+        return self.__contains_hash(_hash(encoded), encoded)
+
+    def __len__(self) -> int:
+        return len(self.hashes) + self.recent_count
+
+    def __contains_hash(self, value: int, msg_id: bytes) -> bool:
+        if value not in self.bloom:
+            return False
+        for offset in self.recent.get(value, ()):
+            if self.__id_at(offset) == msg_id:
+                return True
+        i = bisect_left(self.hashes, value)
+        while i < len(self.hashes) and self.hashes[i] == value:
+            if self.__id_at(self.offsets[i]) == msg_id:
+                return True
+            i += 1
+        return False
+
+    def __add_recent(self, value: int, offset: int) -> None:
+        self.recent.setdefault(value, []).append(offset)
+        self.recent_count += 1
+        if self.recent_count >= MERGE_SIZE:
+            self.__merge()
+
+    def __merge(self) -> None:
+        """
+        Merges the recent ids into the sorted index
+        """
+        recent = (
+            (value, offset)
+            for value, offsets in self.recent.items()
+            for offset in offsets
+        )
+        merged = sorted(chain(zip(self.hashes, self.offsets), recent))
+        self.hashes = array("q", (value for value, _ in merged))
+        self.offsets = array("q", (offset for _, offset in merged))
+        self.recent = {}
+        self.recent_count = 0
+        self.indexed = len(self.data)
+
+    def __id_at(self, offset: int) -> bytearray:
+        return self.data[offset : self.__line_end(offset)]
+
+    def __line_end(self, offset: int) -> int:
+        end = self.data.find(b"\n", offset)
+        return len(self.data) if end < 0 else end
+
+    def __rebuild_bloom(self) -> None:
+        self.bloom = BloomFilter(max(2 * len(self), BLOOM_MIN_CAPACITY))
+        for value in chain(self.hashes, self.recent):
+            self.bloom.add(value)
+
+
+def _hash(msg_id: bytes) -> int:
+    """
+    Stable 64-bit hash of the id, as the index is stored
+    """
+    digest = blake2b(msg_id, digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def split_msg_id(msg_id: str) -> tuple[str, int] | None:
+    """
+    Splits ids like "{city};{batch_number}" or "{parent_id};{routing_count}"
+    into their prefix and number. Returns None for any other id.
+    """
+    prefix, _, number = msg_id.rpartition(";")
+    if not prefix or not number.isdigit():
+        return None
+    return prefix, int(number)
+
+
+class ProcessedNumbers:
+    """
+    Processed numbers of a prefix, as a bitmap of a bit per number from the
+    first one in it. The whole bytes of processed numbers at its start are
+    dropped, moving the first number past them, so numbers that arrive in
+    order take constant space. Otherwise it takes a bit per number from the
+    first one missing to the last one, like when replicas share a queue and
+    each one only sees some of the numbers, instead of growing with the
+    numbers' values.
+    """
+
+    # first number in the bitmap, every number before it was processed
+    low: int
+    bits: bytearray
+
+    def __init__(self, low: int = 0, bits: bytes = b"") -> None:
+        self.low = low
+        self.bits = bytearray(bits)
+
+    def add(self, number: int) -> None:
+        offset = number - self.low
+        if offset < 0:
+            return
+        byte = offset >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        self.bits[byte] |= 1 << (offset & 7)
+        if byte == 0 and self.bits[0] == 0xFF:
+            full = 1
+            while full < len(self.bits) and self.bits[full] == 0xFF:
+                full += 1
+            del self.bits[:full]
+            self.low += full * 8
+
+    def __contains__(self, number: int) -> bool:
+        offset = number - self.low
+        if offset < 0:
+            return True
+        byte = offset >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] >> (offset & 7) & 1)
+
+    def stored(self) -> tuple[int, str]:
+        return self.low, b64encode(self.bits).decode()
+
+    @staticmethod
+    def from_stored(stored: tuple[int, str]) -> "ProcessedNumbers":
+        low, bits = stored
+        return ProcessedNumbers(low, b64decode(bits))
+
+
+class ProcessedIds:
+    """
+    Set of processed message ids. Ids that end in a number are kept per
+    prefix as ProcessedNumbers, so a prefix whose numbers arrive in order
+    takes constant space and membership is an index and a mask. Any other id
+    goes to a HashedIds.
+    """
+
+    sequences: dict[str, ProcessedNumbers]
+    others: HashedIds
+
+    def __init__(
+        self, sequences: Sequences | None = None, others: HashedIds | None = None
+    ) -> None:
+        self.sequences = {
+            prefix: ProcessedNumbers.from_stored(stored)
+            for prefix, stored in (sequences or {}).items()
+        }
+        self.others = HashedIds() if others is None else others
+
+    def add(self, msg_id: str) -> None:
+        split = split_msg_id(msg_id)
+        if split is None:
+            self.others.add(msg_id)
+            return
+        prefix, number = split
+        numbers = self.sequences.get(prefix)
+        if numbers is None:
+            numbers = self.sequences[prefix] = ProcessedNumbers()
+        numbers.add(number)
+
+    def __contains__(self, msg_id: object) -> bool:
+        if not isinstance(msg_id, str):
+            return False
+        split = split_msg_id(msg_id)
+        if split is None:
+            return msg_id in self.others
+        prefix, number = split
+        numbers = self.sequences.get(prefix)
+        return numbers is not None and number in numbers
+
+    def stored_sequences(self) -> Sequences:
+        """
+        Returns the processed numbers of every prefix, to be stored
+        """
+        return {prefix: x.stored() for prefix, x in self.sequences.items()}
+
+    def sequences_size(self) -> int:
+        """
+        Returns the size of the stored sequences in logged ids, as a logged id
+        takes about as much as 16 bytes of bitmap, plus one per prefix
+        """
+        return sum(1 + len(x.bits) // 16 for x in self.sequences.values())
@@ -0,0 +1,52 @@
+import logging
+from typing import Generic
+
+from pika import BasicProperties
+
+from common.comms_base.envelope import ReceivedPackage
+
+from . import IN
+from .simple import DuplicateFilterSimple
+
+__all__ = ["DuplicateFilterSequence"]
+
+
+class DuplicateFilterSequence(DuplicateFilterSimple[IN], Generic[IN]):
+    """
+    Filters packages by the sequence numbers producers stamp on them, one
+    stream per (producer, job, routing key). The processed numbers of each
+    stream are kept as a watermark plus the ones after it (see ProcessedIds),
+    so every package is checked locally, without any messages to other nodes.
+
+    It's exactly-once as long as each stream is consumed by a single node:
+    if another node processed a package before crashing, it may be processed
+    again here. The nodes of a stage share its queues, so it's rejected for
+    stages with more than one. Packages without a sequence id are filtered by
+    message id, like DuplicateFilterSimple does.
+    """
+
+    def received_message(
+        self,
+        body: bytes,
+        properties: BasicProperties,
+        queue: str,
+        delivery_tag: int | None,
+        redelivered: bool,
+    ) -> None:
+        package: ReceivedPackage[IN] | None = ReceivedPackage.from_headers(
+            properties, lambda: self._decode_package(body, properties.content_type)
+        )
+        if package is None or package.seq_id is None:
+            super().received_message(body, properties, queue, delivery_tag, redelivered)
+            return
+
+        if self._was_processed(package.job_id, package.seq_id):
+            logging.warn(
+                f"Job {package.job_id} | Received package {package.msg_id}"
+                f" ({package.seq_id}) already processed, acknowledging"
+            )
+            self._ack(delivery_tag)
+            return
+
+        self._processed(package.job_id, package.seq_id)
+        self.comms.handle_package(package.load(), delivery_tag)
@@ -1,8 +1,12 @@
 import logging
 from typing import Generic
+from functools import cached_property
+
+from pika import BasicProperties
 
-from shared.serde import deserialize
 from common.messages.comms import Package
+from common.comms_base.envelope import ReceivedPackage
+from common.comms_base.serialization import BodyDecoder, body_decoder
 
 from . import DuplicateFilter, IN
 
@@ -11,9 +15,20 @@ __all__ = ["DuplicateFilter"]
 
 class DuplicateFilterSimple(DuplicateFilter[IN], Generic[IN]):
     def received_message(
-        self, message: str, queue: str, delivery_tag: int | None, redelivered: bool
+        self,
+        body: bytes,
+        properties: BasicProperties,
+        queue: str,
+        delivery_tag: int | None,
+        redelivered: bool,
     ) -> None:
-        package = self.__deserialize_package(message)
+        package: ReceivedPackage[IN] | None = ReceivedPackage.from_headers(
+            properties, lambda: self._decode_package(body, properties.content_type)
+        )
+        if package is None:
+            package = ReceivedPackage.of(
+                self._decode_package(body, properties.content_type)
+            )
         if package.msg_id:
             if (redelivered or package.maybe_redelivered) and self._was_processed(
                 package.job_id, package.msg_id
@@ -26,10 +41,11 @@ class DuplicateFilterSimple(DuplicateFilter[IN], Generic[IN]):
                 return
 
             self._processed(package.job_id, package.msg_id)
-        self.comms.handle_package(package, delivery_tag)
+        self.comms.handle_package(package.load(), delivery_tag)
 
-    def __deserialize_package(self, message: str) -> Package[IN]:
-        return deserialize(Package[self.comms.in_type], message)  # type: ignore
+    @cached_property
+    def _decode_package(self) -> BodyDecoder:
+        return body_decoder(Package[self.comms.in_type])  # type: ignore
 
     def pending_count(self, queue: str) -> int:
         return 0
@@ -1,9 +1,11 @@
-from typing import TypeVar, Generic
+from typing import Any, Callable, TypeVar, Generic
 from abc import ABC, abstractmethod
+from functools import cached_property
 
-from shared.serde import serialize
+from shared.serde import get_generic_types
 
 from ..protocol import CommsProtocol
+from ..serialization import Serialization
 
 OUT = TypeVar("OUT", contravariant=True)
 
@@ -13,6 +15,16 @@ class CommsSend(CommsProtocol, Generic[OUT], ABC):
     Comms with send capabilities. See protocol.py for more details about the methods.
     """
 
+    out_serialization: Serialization = Serialization.JSON
+
+    @cached_property
+    def out_encoder(self) -> Callable[[Any], bytes]:
+        """
+        Compiled encoder for the output type
+        """
+        out_type = get_generic_types(self, CommsSend)[0]
+        return self.out_serialization.encoder(out_type)
+
     def send(self, record: OUT) -> None:
         """
         Sends a record to the appropriate queue
@@ -24,9 +36,16 @@ class CommsSend(CommsProtocol, Generic[OUT], ABC):
         self.channel.basic_publish(
             exchange,
             routing_key,
-            serialize(record).encode(),
+            self.out_encoder(record),
+            self.out_serialization.properties(self._get_headers(record)),
         )
 
+    def _get_headers(self, record: OUT) -> dict[str, Any] | None:
+        """
+        Returns the AMQP headers to send this record with. None by default
+        """
+        return None
+
     @abstractmethod
     def _get_routing_details(self, record: OUT) -> tuple[str, str]:
         """
@@ -1,7 +1,8 @@
 from abc import abstractmethod
-from typing import Generic, TypeVar
+from functools import cached_property
+from typing import Any, Callable, Generic, Iterable, Protocol, TypeVar
 
-from shared.serde import serialize, get_generic_types
+from shared.serde import get_generic_types
 
 from common.messages import P
 from common.messages.comms import Package
@@ -11,10 +12,13 @@ from common.util import register_self_destruct
 from ..receive import ReceiveConfig
 from ..receive.reliable import ReliableReceive, FilterConfig
 from ..base import SystemCommunicationBase
+from ..envelope import package_headers, sequence_id
 from ..protocol import OUT
+from ..serialization import Serialization
 
 
 PENDING_PACKAGES_KEY = "_pending_packages"
+SENT_SEQUENCES_KEY = "_sent_sequences"
 IN = TypeVar("IN", contravariant=True)
 
 
@@ -22,66 +26,303 @@ class _Unset:
     ...
 
 
+class ReliableConfig(ReceiveConfig, Protocol):
+    # packages processed before committing their state and acknowledging them
+    group_commit_messages: int
+    # max time to wait for more packages before committing
+    group_commit_millis: int
+    # write the commits in the persistor's writer thread
+    async_commit: bool
+
+
 class ReliableComms(ReliableReceive[P], SystemCommunicationBase, Generic[P, OUT]):
     """
     Comms with send batching capabilities. It will group messages in packages
     with the same routing key and send them when the batch being received is
     done.
+
+    Received packages are committed in groups: the state changes and output
+    packages of up to group_commit_messages packages (or the ones received in
+    group_commit_millis) are saved at once, then all of them are acknowledged
+    and the output packages are sent. With async_commit, the save is written
+    in the background while the next packages are processed, and the
+    acknowledgements and output are held until it's done.
+
+    If the connection is lost between packages, the ones processed so far are
+    committed and their output is sent on the new connection. They're dropped
+    as duplicates when they're redelivered.
     """
 
     # exchange, routing_key -> batch
     packages: dict[tuple[str, str], Package[OUT]]
+    # job_id -> stream -> next sequence number
+    sequences: dict[str, dict[str, int]]
+    # jobs whose sequences are dropped once their last packages are sent
+    finished_jobs: set[str]
     routing_count: int = 0
     add_job_id_to_routing_key: bool
+    out_serialization: Serialization
+    group_commit_messages: int
+    group_commit_millis: int
+    # packages processed since the last commit, and their delivery tags
+    uncommitted_count: int
+    uncommitted_tags: list[int]
+    commit_timer: Any
+    async_commit: bool
+    # delivery tags and output packages of the commit being written
+    committing: tuple[list[int], dict[tuple[str, str], Package[OUT]]] | None
+    # syncs the commits made within the persistor's sync interval
+    sync_timer: Any
 
     def __init__(
         self,
-        config: ReceiveConfig,
+        config: ReliableConfig,
         duplicate_filter_config: FilterConfig | None = None,
         add_job_id_to_routing_key: bool = True,
+        out_serialization: Serialization = Serialization.JSON,
     ) -> None:
         super().__init__(config, duplicate_filter_config)
         self.packages = {}
+        self.sequences = {}
+        self.finished_jobs = set()
         self.add_job_id_to_routing_key = add_job_id_to_routing_key
+        self.out_serialization = out_serialization
+        self.group_commit_messages = config.group_commit_messages
+        self.group_commit_millis = config.group_commit_millis
+        self.uncommitted_count = 0
+        self.uncommitted_tags = []
+        self.commit_timer = None
+        self.async_commit = config.async_commit
+        self.committing = None
+        self.sync_timer = None
         self.channel.confirm_delivery()
 
     def send(
         self, job_id: str, record: OUT, force_msg_id: str | None | _Unset = _Unset()
     ) -> None:
+        if not isinstance(force_msg_id, _Unset):
+            self.send_all(job_id, [record], force_msg_id)
+            return
         key = self._get_routing_details(record)
         if self.add_job_id_to_routing_key:
             key = key[0], f"{job_id}.{key[1]}"
+        self.__package(job_id, key).messages.append(record)
 
-        if isinstance(force_msg_id, _Unset):
-            package = self.packages.get(key) or Package(
-                [], self.__next_message_id(), job_id
-            )
-            package.messages.append(record)
-            self.packages[key] = package
-        else:
-            package = Package([record], force_msg_id, job_id)
-            if key in self.packages:
-                raise ValueError(
-                    "Can't force message id for the same routing key"
-                    " as a buffered package"
-                )
-            self.packages[key] = package
+    def send_all(
+        self,
+        job_id: str,
+        records: Iterable[OUT],
+        force_msg_id: str | None | _Unset = _Unset(),
+    ) -> None:
+        """
+        Like send() for each record, but the records with the same routing key
+        are added to their package at once. With force_msg_id, they're all
+        committed and sent at once, so after a crash either all of them or
+        none are sent.
+        """
+        by_key: dict[tuple[str, str], list[OUT]] = {}
+        for record in records:
+            by_key.setdefault(self._get_routing_details(record), []).append(record)
+        packages: dict[tuple[str, str], Package[OUT]] = {}
+        for key, grouped in by_key.items():
+            if self.add_job_id_to_routing_key:
+                key = key[0], f"{job_id}.{key[1]}"
+            if isinstance(force_msg_id, _Unset):
+                self.__package(job_id, key).messages.extend(grouped)
+            else:
+                packages[key] = Package(grouped, force_msg_id, job_id)
+        if packages:
+            self.__send_now(packages)
+
+    def __send_now(self, packages: dict[tuple[str, str], Package[OUT]]) -> None:
+        self.__finish_commit()
+        if any(key in self.packages for key in packages):
+            # buffered by packages not committed yet, send them first
             self.__save_state()
             self.__send_messages()
+        self.packages.update(packages)
+        self.__save_state()
+        self.__send_messages()
+
+    @cached_property
+    def out_type(self) -> Any:
+        """
+        Output type (resolved OUT TypeVar from ReliableComms[P, OUT])
+        """
+        return get_generic_types(self, ReliableComms)[1]
+
+    @cached_property
+    def out_encoders(self) -> dict[str, Callable[[Package[OUT]], bytes]]:
+        """
+        Compiled encoders of the packages sent to each exchange
+        """
+        return {}
+
+    def out_encoder(self, exchange: str) -> Callable[[Package[OUT]], bytes]:
+        """
+        Returns the compiled encoder for packages sent to the exchange
+        """
+        encoder = self.out_encoders.get(exchange)
+        if encoder is None:
+            package_type = Package[self._get_out_type(exchange)]  # type: ignore
+            encoder = self.out_serialization.encoder(package_type)
+            self.out_encoders[exchange] = encoder
+        return encoder
 
     def start_consuming(self) -> None:
         self.__send_pending()
         super().start_consuming()
 
+    def finished_job(self, job_id: str) -> None:
+        super().finished_job(job_id)
+        self.finished_jobs.add(job_id)
+
+    def _reconnected(self) -> None:
+        """
+        Commits the state of the packages processed so far, as none of them
+        was interrupted, and sends their output. They can't be acknowledged on
+        the new channel, so they're redelivered and dropped as duplicates.
+        """
+        self.channel.confirm_delivery()
+        if self.commit_timer is not None:
+            self.remove_timeout(self.commit_timer)
+            self.commit_timer = None
+        self.uncommitted_count = 0
+        self.uncommitted_tags = []
+        if self.committing is not None:
+            self.committing = ([], self.committing[1])
+            self.__finish_commit(maybe_redelivered=True)
+        self.__save_state()
+        self.__send_messages(maybe_redelivered=True)
+        super()._reconnected()
+
     def _post_process(self, delivery_tag: int | None) -> None:
         self.routing_count = 0
+        self.current_msg_id = None
+        if delivery_tag is not None:
+            self.uncommitted_tags.append(delivery_tag)
+        self.uncommitted_count += 1
+        if self.uncommitted_count >= self.group_commit_messages:
+            self.__commit()
+        elif self.commit_timer is None:
+            self.commit_timer = self.call_later(
+                self.group_commit_millis / 1000, self.__commit
+            )
+
+    def __commit(self) -> None:
+        """
+        Saves the state of the packages processed since the last commit,
+        acknowledges them and sends their output
+        """
+        if self.commit_timer is not None:
+            self.remove_timeout(self.commit_timer)
+            self.commit_timer = None
+        if self.async_commit:
+            self.__commit_async()
+            return
         self.__save_state()
-        super()._post_process(delivery_tag)
+        self.__ack_uncommitted()
         self.__send_messages()
 
+    def __commit_async(self) -> None:
+        """
+        Hands the state of the packages processed since the last commit off to
+        the persistor's writer thread. They're acknowledged and their output is
+        sent once it's saved, after the previous commit.
+        """
+        self.__finish_commit()
+        StatePersistor().store(PENDING_PACKAGES_KEY, self.packages)
+        StatePersistor().store(SENT_SEQUENCES_KEY, self.sequences)
+        self.committing = (self.uncommitted_tags, self.packages)
+        self.packages = {}
+        self.uncommitted_count = 0
+        self.uncommitted_tags = []
+        StatePersistor().save_async(
+            lambda: self.connection.add_callback_threadsafe(self.__finish_commit)
+        )
+        self.__schedule_sync()
+
+    def __finish_commit(self, maybe_redelivered: bool = False) -> None:
+        """
+        Waits for the commit being written, if any, then acknowledges its
+        packages and sends their output
+        """
+        if self.committing is None:
+            return
+        StatePersistor().wait_saved()
+        tags, packages = self.committing
+        self.__ack(tags)
+        # kept until it's sent, to send it again after reconnecting
+        self.committing = ([], packages)
+        if packages:
+            # they're no longer pending, which is saved with the next commit:
+            # saving it now would also save the state of the packages processed
+            # since. Until then, they're sent again after a crash with the same
+            # sequence numbers, and dropped as duplicates.
+            self.__publish(packages, maybe_redelivered)
+        self.committing = None
+
+    def __ack_uncommitted(self) -> None:
+        tags = self.uncommitted_tags
+        self.uncommitted_count = 0
+        self.uncommitted_tags = []
+        self.__ack(tags)
+
+    def __ack(self, tags: list[int]) -> None:
+        """
+        Acknowledges the deliveries of a committed group. With async commits,
+        the packages processed since it was handed off aren't committed yet,
+        including the ones the duplicate filter held back then, which can have
+        earlier delivery tags.
+        """
+        if not tags:
+            return
+
+        register_self_destruct("pre_ack")
+        last = max(tags)
+        if (
+            len(tags) > 1
+            and not self.duplicate_filter.has_pending_checks()
+            and all(tag > last for tag in self.uncommitted_tags)
+        ):
+            # every delivery up to the last one was processed in the group or
+            # already acknowledged by the duplicate filter
+            self.channel.basic_ack(last, multiple=True)
+            return
+        for tag in tags:
+            self.channel.basic_ack(tag)
+
     def __save_state(self) -> None:
         StatePersistor().store(PENDING_PACKAGES_KEY, self.packages)
+        StatePersistor().store(SENT_SEQUENCES_KEY, self.sequences)
         StatePersistor().save()
+        self.__schedule_sync()
+
+    def __schedule_sync(self) -> None:
+        """
+        Syncs the commits once the persistor's sync interval passes, as the
+        ones made within it aren't synced until the next commit after it
+        """
+        if self.sync_timer is not None:
+            return
+        interval = StatePersistor().sync_interval()
+        if interval is not None:
+            self.sync_timer = self.call_later(interval, self.__sync)
+
+    def __sync(self) -> None:
+        self.sync_timer = None
+        StatePersistor().sync()
+
+    def __package(self, job_id: str, key: tuple[str, str]) -> Package[OUT]:
+        """
+        Returns the package being buffered for the routing key, starting it if
+        there's none
+        """
+        package = self.packages.get(key)
+        if package is None:
+            package = Package([], self.__next_message_id(), job_id)
+            self.packages[key] = package
+        return package
 
     def __next_message_id(self) -> str | None:
         """
@@ -94,27 +335,86 @@ class ReliableComms(ReliableReceive[P], SystemCommunicationBase, Generic[P, OUT]
         self.routing_count += 1
         return id
 
+    def __next_sequence_id(
+        self,
+        package: Package[OUT],
+        exchange: str,
+        routing_key: str,
+        sent: dict[tuple[str, str], int],
+    ) -> str | None:
+        """
+        Stamps the package with the next number of the (producer, job, routing key)
+        stream, recording it in sent. The counters are only committed with the
+        packages already cleared, so packages sent again after a crash get the
+        same numbers.
+        """
+        if package.msg_id is None:
+            return None
+        stream = f"{self.name}.{self.id}:{package.job_id}:{exchange}:{routing_key}"
+        number = sent.get((package.job_id, stream))
+        if number is None:
+            number = self.sequences.get(package.job_id, {}).get(stream, 0)
+        sent[(package.job_id, stream)] = number + 1
+        return sequence_id(stream, number)
+
     def __send_messages(self, maybe_redelivered: bool = False) -> None:
-        if not self.packages:
+        if self.packages:
+            self.__publish(self.packages, maybe_redelivered)
+            self.packages = {}
+        elif not self.finished_jobs:
             return
 
+        # the last packages of the finished jobs were just sent
+        for job_id in self.finished_jobs:
+            self.sequences.pop(job_id, None)
+        self.finished_jobs = set()
+        self.__save_state()
+
+    def __publish(
+        self,
+        packages: dict[tuple[str, str], Package[OUT]],
+        maybe_redelivered: bool = False,
+    ) -> None:
         register_self_destruct("pre_send")
-        for (exchange, routing_key), package in self.packages.items():
+        # (job_id, stream) -> next number
+        sent: dict[tuple[str, str], int] = {}
+        for (exchange, routing_key), package in packages.items():
             package.maybe_redelivered = maybe_redelivered
             self.channel.basic_publish(
-                exchange, routing_key, serialize(package).encode()
+                exchange,
+                routing_key,
+                self.out_encoder(exchange)(package),
+                self.out_serialization.properties(
+                    package_headers(
+                        package,
+                        self.__next_sequence_id(package, exchange, routing_key, sent),
+                    )
+                ),
             )
+        # counted once they're all sent, so that if it fails midway they're
+        # sent again with the same numbers
+        for (job_id, stream), number in sent.items():
+            self.sequences.setdefault(job_id, {})[stream] = number
         register_self_destruct("post_send")
-        self.packages = {}
-        self.__save_state()
 
     def __send_pending(self) -> None:
-        out_type = get_generic_types(self, ReliableComms)[1]
+        out_type = self.out_type
         self.packages = (
             StatePersistor().load(PENDING_PACKAGES_KEY, dict[tuple[str, str], Package[out_type]]) or []  # type: ignore # noqa
         ) or {}
+        self.sequences = (
+            StatePersistor().load(SENT_SEQUENCES_KEY, dict[str, dict[str, int]]) or {}
+        )
         self.__send_messages(maybe_redelivered=True)
 
+    def _get_out_type(self, exchange: str) -> Any:
+        """
+        Type of the records of the packages sent to the exchange, the output
+        type by default. Its records must be members of the in type of the
+        stage consuming from it.
+        """
+        return self.out_type
+
     @abstractmethod
     def _get_routing_details(self, record: OUT) -> tuple[str, str]:
         ...
@@ -0,0 +1,83 @@
+from enum import StrEnum
+from typing import Any, Callable
+
+from pika import BasicProperties
+
+from shared.serde import (
+    SerdeError,
+    serialize,
+    deserializer,
+    binary_serializer,
+    binary_deserializer,
+)
+
+JSON_CONTENT_TYPE = "application/json"
+BINARY_CONTENT_TYPE = "application/x-serde-binary"
+COLUMNAR_CONTENT_TYPE = "application/x-serde-columnar"
+
+# Decodes a message body given its content type
+BodyDecoder = Callable[[bytes, str | None], Any]
+
+
+class Serialization(StrEnum):
+    """
+    Wire format of the messages sent to an exchange. Consumers pick the decoder
+    from the content type of each message, so nodes sending different formats
+    can share a queue.
+    Columnar is the binary format with the lists of records laid out by column,
+    which pays off for large packages of records of the same type.
+    """
+
+    JSON = "json"
+    BINARY = "binary"
+    COLUMNAR = "columnar"
+
+    @property
+    def content_type(self) -> str:
+        return CONTENT_TYPES[self]
+
+    def properties(self, headers: dict[str, Any] | None = None) -> BasicProperties:
+        """
+        Properties to publish the messages with
+        """
+        return BasicProperties(content_type=self.content_type, headers=headers)
+
+    def encoder(self, data_type: Any) -> Callable[[Any], bytes]:
+        """
+        Returns a function that encodes values of the given type in this format
+        """
+        if self == Serialization.JSON:
+            return lambda data: serialize(data).encode()
+        return binary_serializer(data_type, columnar=self == Serialization.COLUMNAR)
+
+
+CONTENT_TYPES = {
+    Serialization.JSON: JSON_CONTENT_TYPE,
+    Serialization.BINARY: BINARY_CONTENT_TYPE,
+    Serialization.COLUMNAR: COLUMNAR_CONTENT_TYPE,
+}
+
+
+def body_decoder(json_type: Any, binary_type: Any | None = None) -> BodyDecoder:
+    """
+    Returns a function that decodes message bodies according to their content type.
+    JSON bodies are decoded as json_type and binary ones as binary_type (json_type
+    by default), since the binary format needs the exact type they were sent as.
+    Messages without a content type are JSON.
+    """
+    if binary_type is None:
+        binary_type = json_type
+    decode_json = deserializer(json_type)
+    decode_binary = binary_deserializer(binary_type)
+    decode_columnar = binary_deserializer(binary_type, columnar=True)
+
+    def decode(body: bytes, content_type: str | None) -> Any:
+        if content_type == COLUMNAR_CONTENT_TYPE:
+            return decode_columnar(body)
+        if content_type == BINARY_CONTENT_TYPE:
+            return decode_binary(body)
+        if content_type is None or content_type == JSON_CONTENT_TYPE:
+            return decode_json(body)
+        raise SerdeError(f"Unsupported content type {content_type}")
+
+    return decode
@@ -3,6 +3,8 @@ import json
 import os
 from configparser import ConfigParser, ExtendedInterpolation, DEFAULTSECT, NoOptionError
 
+from common.persistence import Durability
+
 CONFIG_PATH = "/config.ini"
 SECTION_SEP = "."
 
@@ -46,6 +48,8 @@ class ConfigBase:
     rabbit_host: str
     log_level: str | None
     system_name: str
+    durability: Durability
+    durability_fsync_millis: int
 
     heartbeat_exchange: str
     heartbeat_frequency: float
@@ -69,6 +73,8 @@ class ConfigBase:
         self.heartbeat_frequency = self.get_float("HeartbeatFrequency")
         self.heartbeat_routing_key = self.get("HeartbeatRoutingKey")
         self.system_name = self.get("SystemName")
+        self.durability = Durability(self.get("Durability"))
+        self.durability_fsync_millis = self.get_int("DurabilityFsyncMillis")
 
     @staticmethod
     def subsection(section: str, subsection: str) -> str:
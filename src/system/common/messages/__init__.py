@@ -13,6 +13,8 @@ class RecordType(StrEnum):
     END = "end"
     START = "start"
     TRIPS_START = "trips_start"
+    TRIP_FILTER = "trip_filter"
+    STATION_NAMES = "station_names"
 
 
 class WithRoutingKey(Protocol):
@@ -21,7 +21,7 @@ class DateInfo:
 
 @dataclass
 class PartialRainAverages(AggregatedBase):
-    duration_averages: dict[str, DateInfo]  # start_date -> DateInfo
+    duration_averages: dict[int, DateInfo]  # start day -> DateInfo
 
     def be_handled_by(self, handler: "AggregatedHandler[T, PartialRainAverages]") -> T:
         return handler.handle_aggregated(self)
@@ -32,8 +32,8 @@ PartialRainRecords = PartialRainAverages | End
 
 @dataclass
 class PartialYearCounts(AggregatedBase):
-    counts_year_base: dict[str, int]  # station name -> trip count
-    counts_year_compared: dict[str, int]  # station name -> trip count
+    counts_year_base: dict[int, int]  # station id -> trip count
+    counts_year_compared: dict[int, int]  # station id -> trip count
 
     def be_handled_by(self, handler: "AggregatedHandler[T, PartialYearCounts]") -> T:
         return handler.handle_aggregated(self)
@@ -50,7 +50,7 @@ class StationInfo:
 
 @dataclass
 class PartialCityAverages(AggregatedBase):
-    distance_averages: dict[str, StationInfo]  # station name -> StationInfo
+    distance_averages: dict[int, StationInfo]  # station id -> StationInfo
 
     def be_handled_by(self, handler: "AggregatedHandler[T, PartialCityAverages]") -> T:
         return handler.handle_aggregated(self)
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from common.messages import End, RecordType, TripsStart
 
 T = TypeVar("T", covariant=True)
+U = TypeVar("U", contravariant=True)
 
 
 @dataclass()
@@ -16,42 +17,103 @@ class BasicStation:
     city: str
 
     def get_routing_key(self) -> str:
-        return f"{RecordType.STATION}.{self.city}.{self.year}"
+        return f"{RecordType.STATION.value}.{self.city}.{self.year}"
 
     def be_handled_by(self, handler: "BasicStationHandler[T]") -> T:
         return handler.handle_station(self)
 
 
 @dataclass()
-class BasicTrip:
+class BasicWeather:
+    date: str
+    precipitation: float
+    city: str
+
+    def get_routing_key(self) -> str:
+        return f"{RecordType.WEATHER.value}.{self.city}"
+
+    def be_handled_by(self, handler: "BasicWeatherHandler[T]") -> T:
+        return handler.handle_weather(self)
+
+
+# Trips with only the fields used by the joiners of each pipeline. The parsers
+# send one for each pipeline. join_keys are the fields of each key a trip is
+# joined with, used to filter them in TripFilter.
+
+
+@dataclass()
+class RainTrip:
     start_date: str
     duration_sec: float
     city: str
+
+    join_keys = [("city", "start_date")]
+
+    def get_routing_key(self) -> str:
+        return f"{RecordType.TRIP.value}.rain.{self.city}"
+
+    def be_handled_by(self, handler: "TripHandler[T, RainTrip]") -> T:
+        return handler.handle_trip(self)
+
+
+@dataclass()
+class YearTrip:
+    city: str
     start_station_code: str
-    end_station_code: str
     year: str
 
+    join_keys = [("city", "start_station_code", "year")]
+
     def get_routing_key(self) -> str:
-        return f"{RecordType.TRIP}.{self.city}.{self.year}"
+        return f"{RecordType.TRIP.value}.year.{self.city}.{self.year}"
 
-    def be_handled_by(self, handler: "BasicTripHandler[T]") -> T:
+    def be_handled_by(self, handler: "TripHandler[T, YearTrip]") -> T:
         return handler.handle_trip(self)
 
 
 @dataclass()
-class BasicWeather:
-    date: str
-    precipitation: float
+class CityTrip:
     city: str
+    start_station_code: str
+    end_station_code: str
+    year: str
+
+    join_keys = [
+        ("city", "start_station_code", "year"),
+        ("city", "end_station_code", "year"),
+    ]
 
     def get_routing_key(self) -> str:
-        return f"{RecordType.WEATHER}.{self.city}"
+        return f"{RecordType.TRIP.value}.city.{self.city}.{self.year}"
+
+    def be_handled_by(self, handler: "TripHandler[T, CityTrip]") -> T:
+        return handler.handle_trip(self)
 
-    def be_handled_by(self, handler: "BasicWeatherHandler[T]") -> T:
-        return handler.handle_weather(self)
 
+ProjectedTrip = RainTrip | YearTrip | CityTrip
 
-BasicDataRecord = BasicStation | BasicTrip | BasicWeather
+
+@dataclass()
+class TripFilter:
+    """
+    Keys that a pipeline's joiners can join trips with, sent to the parsers
+    once they have every weather & station of the job. The parsers drop the
+    trips of the pipeline with any join key not in it.
+    """
+
+    pipeline: str
+    keys: list[list[str]]
+
+    def get_routing_key(self) -> str:
+        return f"{RecordType.TRIP_FILTER.value}.{self.pipeline}"
+
+    def be_handled_by(self, handler: "TripFilterHandler[T]") -> T:
+        return handler.handle_trip_filter(self)
+
+
+GenericTrip = TypeVar("GenericTrip", RainTrip, YearTrip, CityTrip, contravariant=True)
+
+BasicDataRecord = BasicStation | BasicWeather | ProjectedTrip
 BasicControlRecord = TripsStart | End
 BasicRecord = BasicDataRecord | BasicControlRecord
 
@@ -66,6 +128,11 @@ class BasicWeatherHandler(Protocol[T]):
         ...
 
 
-class BasicTripHandler(Protocol[T]):
-    def handle_trip(self, trip: BasicTrip) -> T:
+class TripHandler(Protocol[T, U]):
+    def handle_trip(self, trip: U) -> T:
+        ...
+
+
+class TripFilterHandler(Protocol[T]):
+    def handle_trip_filter(self, trip_filter: TripFilter) -> T:
         ...
@@ -34,6 +34,22 @@ class CheckProcessedResponse:
         return "check_processed_response"
 
 
+@dataclass
+class CheckProcessedBatch:
+    checks: list[CheckProcessed]
+
+    def get_routing_key(self) -> str:
+        return "check_processed"
+
+
+@dataclass
+class CheckProcessedResponseBatch:
+    responses: list[CheckProcessedResponse]
+
+    def get_routing_key(self) -> str:
+        return "check_processed_response"
+
+
 @dataclass
 class RemoveCheck:
     check_id: str
@@ -48,4 +64,11 @@ class PackageHandler(Protocol[S]):
         ...
 
 
-CommsMessage = Package[T] | CheckProcessed | CheckProcessedResponse | RemoveCheck
+CommsMessage = (
+    Package[T]
+    | CheckProcessed
+    | CheckProcessedResponse
+    | CheckProcessedBatch
+    | CheckProcessedResponseBatch
+    | RemoveCheck
+)
@@ -1,7 +1,7 @@
-from typing import Protocol, TypeVar
+from typing import Protocol, TypeVar, Union
 from dataclasses import dataclass
 
-from common.messages import End, RecordType
+from common.messages import End, RecordType, Start
 
 T = TypeVar("T", covariant=True)
 U = TypeVar("U", contravariant=True)
@@ -14,9 +14,13 @@ class StationInfo:
     longitude: float | None
 
 
+# Past the joiners, days are date ordinals and stations are ids, the indexes
+# of their names in the StationNames sent by the joiners to the reducer.
+
+
 @dataclass()
 class JoinedRainTrip:
-    start_date: str
+    start_day: int  # date.toordinal() of the start date
     duration_sec: float
 
     def be_handled_by(self, handler: "JoinedRecordHandler[T, JoinedRainTrip]") -> T:
@@ -31,7 +35,7 @@ JoinedRainRecords = JoinedRainTrip | End
 
 @dataclass
 class JoinedYearTrip:
-    start_station_name: str
+    start_station: int
     year: str
 
     def be_handled_by(self, handler: "JoinedRecordHandler[T, JoinedYearTrip]") -> T:
@@ -46,7 +50,7 @@ JoinedYearRecords = JoinedYearTrip | End
 
 @dataclass
 class JoinedCityTrip:
-    end_station_name: str
+    end_station: int
     start_station_coordinates: tuple[float, float]
     end_station_coordinates: tuple[float, float]
 
@@ -60,6 +64,27 @@ class JoinedCityTrip:
 JoinedCityRecords = JoinedCityTrip | End
 
 
+@dataclass
+class StationNames:
+    """
+    Names of the stations of a job, each at the index of its id. Every
+    joiner computes the same ones, as they all receive every station.
+    """
+
+    names: list[str]
+
+    def be_handled_by(self, handler: "StationNamesHandler[T]") -> T:
+        return handler.handle_station_names(self)
+
+    def get_routing_key(self) -> str:
+        return RecordType.STATION_NAMES
+
+
+class StationNamesHandler(Protocol[T]):
+    def handle_station_names(self, station_names: StationNames) -> T:
+        ...
+
+
 class JoinedRecordHandler(Protocol[T, U]):
     def handle_joined(self, trip: U) -> T:
         ...
@@ -80,3 +105,5 @@ GenericJoinedTripCov = TypeVar(
     JoinedCityTrip,
     covariant=True,
 )
+# Sent by the joiners to the aggregators
+JoinerRecord = Union[GenericJoinedTrip, End, Start, StationNames]
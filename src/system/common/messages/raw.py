@@ -2,6 +2,7 @@ from typing import Protocol, TypeVar
 from dataclasses import dataclass
 
 from common.messages import End, RecordType, Start, TripsStart
+from common.messages.basic import TripFilter
 
 T = TypeVar("T", covariant=True)
 
@@ -39,3 +40,5 @@ class RawRecordHandler(Protocol[T]):
 
 
 RawRecord = RawLines | End | Start | TripsStart
+# Sent to the parsers, by the input and by the joiners
+ParserRecord = RawRecord | TripFilter
@@ -1,6 +1,27 @@
-from .persistor import StatePersistor
+from .persistor import (
+    StatePersistor,
+    Durability,
+    setup_durability,
+    job_key,
+)
 from .state import WithState
 from .state_appended import WithStateAppended
+from .state_arrays import WithStateArrays
+from .state_incremental import WithStateIncremental
+from .state_mapped import WithStateMapped
+from .state_snapshot import WithStateSnapshot
 from .protocol import WithStateProtocol
 
-__all__ = ["StatePersistor", "WithState", "WithStateProtocol", "WithStateAppended"]
+__all__ = [
+    "StatePersistor",
+    "Durability",
+    "setup_durability",
+    "job_key",
+    "WithState",
+    "WithStateProtocol",
+    "WithStateAppended",
+    "WithStateArrays",
+    "WithStateIncremental",
+    "WithStateMapped",
+    "WithStateSnapshot",
+]
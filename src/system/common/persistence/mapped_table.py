@@ -0,0 +1,303 @@
+"""
+Hash table stored in a memory-mapped file, with a fixed layout.
+
+The file has a header, then the slots (open addressing with linear probing),
+then a pool with the strings. Each slot is the key hash, where its key is in
+the pool and its value packed with struct. String fields of the value are
+stored in the pool too, only once per distinct string, and packed as their
+offset and length.
+
+The header has a checksum of the slots and of the pool, so that a table
+that was only partially written to disk is detected when opening it.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import zlib
+from hashlib import blake2b
+from typing import Any
+
+MAGIC = b"MAPTBL01"
+# magic, capacity, count, strings size, log size, slots checksum, strings crc32
+HEADER = struct.Struct("<8sQQQQQI")
+# key hash, key offset, key length
+SLOT_HEADER = struct.Struct("<QII")
+SLOT_HEADER_FIELDS = 3
+HASH = struct.Struct("<Q")
+STRING_FIELD = "s"
+MIN_CAPACITY = 1024
+MAX_LOAD = 0.7
+# space in the pool for each slot
+STRINGS_PER_SLOT = 64
+
+
+def _hash(key: bytes) -> int:
+    # 0 marks the empty slots
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+class MappedTable:
+    """
+    Table from encoded keys to tuples of fields, described by a struct format
+    where "s" is a string. It grows by rebuilding it with twice the capacity.
+    """
+
+    path: str
+    value_format: str
+    slot: struct.Struct
+    capacity: int
+    count: int
+    strings_size: int
+    # size of the log with the changes already in the table
+    log_size: int
+    slots_checksum: int
+    strings_crc: int
+    # string -> offset in the pool, for the strings added since opening it
+    interned: dict[bytes, int]
+    file: Any
+    map: mmap.mmap
+
+    def __init__(self, path: str, value_format: str) -> None:
+        self.path = path
+        self.value_format = value_format
+        self.slot = struct.Struct(f"<QII{value_format.replace(STRING_FIELD, 'II')}")
+        self.interned = {}
+        if not self.__open():
+            self.__create(MIN_CAPACITY)
+
+    def get(self, key: bytes) -> tuple[Any, ...] | None:
+        index = self.__find(key, _hash(key))
+        if index is None:
+            return None
+        return self.__decode(self.slot.unpack_from(self.map, self.__slot_offset(index)))
+
+    def set(self, key: bytes, fields: tuple[Any, ...]) -> None:
+        strings = [
+            value.encode()
+            for field, value in zip(self.value_format, fields)
+            if field == STRING_FIELD
+        ]
+        # grown first, as growing moves the slots
+        needed = len(key) + sum(map(len, strings))
+        if (
+            self.count + 1 > self.capacity * MAX_LOAD
+            or self.strings_size + needed > self.__strings_capacity()
+        ):
+            self.__grow(needed)
+
+        key_hash = _hash(key)
+        index = self.__find(key, key_hash)
+        if index is None:
+            index = self.__free_slot(key_hash)
+            key_offset = self.__add_string(key, intern=False)
+            self.count += 1
+        else:
+            self.slots_checksum ^= self.__slot_checksum(index)
+            _, key_offset, _ = SLOT_HEADER.unpack_from(
+                self.map, self.__slot_offset(index)
+            )
+
+        packed = []
+        pending_strings = iter(strings)
+        for field, value in zip(self.value_format, fields):
+            if field == STRING_FIELD:
+                data = next(pending_strings)
+                packed += [self.__add_string(data), len(data)]
+            else:
+                packed.append(value)
+        self.slot.pack_into(
+            self.map,
+            self.__slot_offset(index),
+            key_hash,
+            key_offset,
+            len(key),
+            *packed,
+        )
+        self.slots_checksum ^= self.__slot_checksum(index)
+
+    def mark(self, log_size: int) -> None:
+        """
+        Records the size of the log whose changes are all in the table
+        """
+        self.log_size = log_size
+        self.__write_header()
+
+    def items(self) -> list[tuple[bytes, tuple[Any, ...]]]:
+        items = []
+        for index in range(self.capacity):
+            values = self.slot.unpack_from(self.map, self.__slot_offset(index))
+            if values[0] != 0:
+                items.append(
+                    (self.__string(values[1], values[2]), self.__decode(values))
+                )
+        return items
+
+    def clear(self) -> None:
+        self.close()
+        self.__create(MIN_CAPACITY)
+
+    def close(self) -> None:
+        self.map.close()
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __find(self, key: bytes, key_hash: int) -> int | None:
+        index = key_hash % self.capacity
+        while True:
+            offset = self.__slot_offset(index)
+            slot_hash, key_offset, key_length = SLOT_HEADER.unpack_from(
+                self.map, offset
+            )
+            if slot_hash == 0:
+                return None
+            if slot_hash == key_hash and self.__string(key_offset, key_length) == key:
+                return index
+            index = (index + 1) % self.capacity
+
+    def __free_slot(self, key_hash: int) -> int:
+        index = key_hash % self.capacity
+        while HASH.unpack_from(self.map, self.__slot_offset(index))[0] != 0:
+            index = (index + 1) % self.capacity
+        return index
+
+    def __decode(self, values: tuple[Any, ...]) -> tuple[Any, ...]:
+        fields = []
+        i = SLOT_HEADER_FIELDS
+        for field in self.value_format:
+            if field == STRING_FIELD:
+                fields.append(self.__string(values[i], values[i + 1]).decode())
+                i += 2
+            else:
+                fields.append(values[i])
+                i += 1
+        return tuple(fields)
+
+    def __add_string(self, data: bytes, intern: bool = True) -> int:
+        if intern and data in self.interned:
+            return self.interned[data]
+        offset = self.strings_size
+        start = self.__strings_offset() + offset
+        self.map[start : start + len(data)] = data
+        self.strings_size += len(data)
+        self.strings_crc = zlib.crc32(data, self.strings_crc)
+        if intern:
+            self.interned[data] = offset
+        return offset
+
+    def __string(self, offset: int, length: int) -> bytes:
+        start = self.__strings_offset() + offset
+        return self.map[start : start + length]
+
+    def __slot_checksum(self, index: int) -> int:
+        offset = self.__slot_offset(index)
+        return zlib.crc32(self.map[offset : offset + self.slot.size], index)
+
+    def __slot_offset(self, index: int) -> int:
+        return HEADER.size + index * self.slot.size
+
+    def __strings_offset(self) -> int:
+        return HEADER.size + self.capacity * self.slot.size
+
+    def __strings_capacity(self) -> int:
+        return self.capacity * STRINGS_PER_SLOT
+
+    def __file_size(self) -> int:
+        return self.__strings_offset() + self.__strings_capacity()
+
+    def __write_header(self) -> None:
+        HEADER.pack_into(
+            self.map,
+            0,
+            MAGIC,
+            self.capacity,
+            self.count,
+            self.strings_size,
+            self.log_size,
+            self.slots_checksum,
+            self.strings_crc,
+        )
+
+    def __map(self, path: str) -> None:
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def __create(self, capacity: int, path: str | None = None) -> None:
+        self.capacity = capacity
+        self.count = 0
+        self.strings_size = 0
+        self.log_size = 0
+        self.slots_checksum = 0
+        self.strings_crc = 0
+        self.interned = {}
+        with open(path or self.path, "wb") as f:
+            f.truncate(self.__file_size())
+        self.__map(path or self.path)
+        self.__write_header()
+
+    def __open(self) -> bool:
+        """
+        Maps the existing table. Returns False if there's none or it's not
+        valid.
+        """
+        if not os.path.isfile(self.path):
+            return False
+        self.__map(self.path)
+        valid = self.__read_header()
+        if not valid:
+            logging.warning(f"Discarding the invalid table at {self.path}")
+            self.close()
+        return valid
+
+    def __read_header(self) -> bool:
+        if len(self.map) < HEADER.size:
+            return False
+        (
+            magic,
+            self.capacity,
+            self.count,
+            self.strings_size,
+            self.log_size,
+            slots_checksum,
+            strings_crc,
+        ) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or len(self.map) != self.__file_size():
+            return False
+
+        self.slots_checksum = 0
+        slots = self.map[HEADER.size : self.__strings_offset()]
+        size = self.slot.size
+        empty = bytes(HASH.size)
+        for index, start in enumerate(range(0, len(slots), size)):
+            if slots[start : start + HASH.size] != empty:
+                slot = slots[start : start + size]
+                self.slots_checksum ^= zlib.crc32(slot, index)
+        self.strings_crc = zlib.crc32(self.__string(0, self.strings_size))
+        return (self.slots_checksum, self.strings_crc) == (
+            slots_checksum,
+            strings_crc,
+        )
+
+    def __grow(self, extra_strings: int) -> None:
+        """
+        Rebuilds the table with twice the capacity, or more to fit the extra
+        strings
+        """
+        items = self.items()
+        log_size = self.log_size
+        capacity = self.capacity * 2
+        while capacity * STRINGS_PER_SLOT < self.strings_size + extra_strings:
+            capacity *= 2
+        self.close()
+
+        temp_path = f"{self.path}.tmp"
+        self.__create(capacity, temp_path)
+        for key, fields in items:
+            self.set(key, fields)
+        self.mark(log_size)
+        self.close()
+        os.replace(temp_path, self.path)
+        self.__map(self.path)
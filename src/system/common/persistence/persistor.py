@@ -1,14 +1,22 @@
+import gc
 import logging
 import os
-from typing import TypeVar, Any, Iterable
+import time
+from queue import Queue
+from threading import Thread
+from contextlib import contextmanager
+from typing import IO, Callable, Iterator, TypeVar, Any, Iterable
 from enum import StrEnum
 from shutil import rmtree, copytree
 
-from shared.serde import serialize, deserialize
+from shared.serde import deserializer, serialize, trusted_deserializer
 from common.util import singleton, register_self_destruct
 
+from .wal import Operation, OperationKind, WriteAheadLog
+
+# Status of the previous engine, which kept a full copy of the state.
+# Only read to recover from it.
 STATUS_FILE = "/state_persistor_status.txt"
-STATUS_FILE_TEMP = "/state_persistor_status_temp.txt"
 
 
 class Status(StrEnum):
@@ -19,31 +27,157 @@ class Status(StrEnum):
 PATH_BASE = "/state"
 PATH_BACKUP = os.path.join(PATH_BASE, "temp")
 PATH_CURRENT = os.path.join(PATH_BASE, "current")
+# Directory in PATH_CURRENT with the namespace of each job
+JOBS_DIR = "jobs"
+WAL_FILE = os.path.join(PATH_BASE, "wal.log")
 T = TypeVar("T")
 
 LINES_BUFFER_SIZE = 1000
+# The log is emptied once it's bigger than this, as every operation in it
+# is already applied to the state files
+WAL_CHECKPOINT_BYTES = 16 * 1024 * 1024
+# How often to log the write and fsync latencies
+LATENCY_REPORT_SECONDS = 30
+
+
+class Durability(StrEnum):
+    # No write-ahead log, changes are written straight to the state files.
+    # A crash while saving can leave the state half written, so only for
+    # state that can be rebuilt or that lives in a tmpfs.
+    NONE = "none"
+    # Write-ahead log flushed to the OS, survives the process dying but
+    # not the host
+    BUFFERED = "buffered"
+    # Write-ahead log synced to disk on every commit
+    FSYNC = "fsync"
+    # Write-ahead log synced to disk at most every DurabilityFsyncMillis,
+    # on the first commit after that, or by sync() once it passes without
+    # commits. Up to that window of commits can be lost if the host dies.
+    FSYNC_INTERVAL = "fsync_interval"
+
+
+_durability = Durability.BUFFERED
+_fsync_interval = 0.1
+
+
+def setup_durability(durability: Durability, fsync_millis: int) -> None:
+    """
+    Sets the durability of the StatePersistor. Must be called before it's
+    first used.
+    """
+    global _durability, _fsync_interval
+    _durability = durability
+    _fsync_interval = fsync_millis / 1000
+
+
+def job_key(job_id: str, key: str) -> str:
+    """
+    Returns the key in the namespace of the job. All the keys in it are
+    removed at once with StatePersistor().remove_job().
+    """
+    return f"{_job_namespace(job_id)}/{key}"
+
+
+def _job_namespace(job_id: str) -> str:
+    return f"{JOBS_DIR}/{job_id}"
+
+
+class Latency:
+    """
+    Count, total and maximum of a series of durations, in seconds
+    """
+
+    count: int
+    total: float
+    max: float
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def __str__(self) -> str:
+        if not self.count:
+            return "none"
+        avg = self.total / self.count * 1000
+        return f"{self.count} (avg {avg:.3f}ms, max {self.max * 1000:.3f}ms)"
 
 
 @singleton
 class StatePersistor:
+    """
+    Key-value state stored as one file per key in PATH_CURRENT. Each save()
+    first appends all its changes as a single record to a write-ahead log,
+    then applies them to the files. If the process dies while applying them,
+    the log is replayed on the next start.
+
+    How much of that reaches the disk before save() returns depends on the
+    Durability set with setup_durability(). When syncing, the state files
+    are synced too before the log is emptied.
+
+    Keys from job_key() are kept in a directory per job, so a finished job's
+    state is dropped with a single operation and nothing is left behind.
+
+    save_async() hands the writing off to a writer thread. Saves are always
+    written in the order they were made, and reads wait for the ones in
+    progress.
+    """
+
     pending: dict[str, Any]
     pending_append: dict[str, list[str]]
     pending_removed: set[str]
+    # keys appended to after being removed, whose files are started over
+    pending_truncated: set[str]
+    pending_removed_jobs: set[str]
+    wal: WriteAheadLog
+    # key -> size of its file, to know the offset of appends
+    sizes: dict[str, int]
+    durability: Durability
+    # keys written since the log was last emptied, to sync them before that
+    unsynced: set[str]
+    # keys whose files were rewritten by replaying the log on restore
+    recovered: set[str]
+    last_sync: float
+    # whether commits were written to the log since it was last synced
+    wal_unsynced: bool
+    write_latency: Latency
+    sync_latency: Latency
+    last_report: float
+    # saves handed off to the writer thread, with their callbacks
+    writes: "Queue[tuple[list[Operation], Callable[[], None]]]"
+    writer: Thread | None
+    write_error: Exception | None
 
     def __init__(self) -> None:
-        for path in (PATH_BASE, PATH_BACKUP, PATH_CURRENT):
+        for path in (PATH_BASE, PATH_CURRENT):
             if not os.path.isdir(path):
                 os.mkdir(path)
 
-        if not os.path.isfile(STATUS_FILE):
-            self.__set_status(Status.Committed)
-
         self.pending = {}
         self.pending_append = {}
         self.pending_removed = set()
+        self.pending_truncated = set()
+        self.pending_removed_jobs = set()
+        self.sizes = {}
+        self.durability = _durability
+        self.unsynced = set()
+        self.recovered = set()
+        self.last_sync = time.monotonic()
+        self.wal_unsynced = False
+        self.write_latency = Latency()
+        self.sync_latency = Latency()
+        self.last_report = time.monotonic()
+        self.writes = Queue()
+        self.writer = None
+        self.write_error = None
 
         self.__restore()
-        logging.info("Loaded state from disk")
+        logging.info(f"Loaded state from disk (durability: {self.durability})")
 
     def store(self, key: str, value: T) -> None:
         """
@@ -61,26 +195,46 @@ class StatePersistor:
 
         Appends the value with the given key.
         The value must not contain newlines.
+        If the key was removed since the last save, its file is started over
+        with the appended values.
         """
-        self.pending_removed.discard(key)
+        if key in self.pending_removed:
+            self.pending_removed.discard(key)
+            self.pending_truncated.add(key)
         self.pending_append.setdefault(key, []).append(value)
 
-    def iter(self, key: str) -> Iterable[str]:
+    def iter(self, key: str, start: int = 0) -> Iterable[str]:
         """
         Only for append-mode storage.
 
-        Returns an iterator over the values with the given key.
+        Returns an iterator over the values with the given key, from the
+        given size of its file.
         """
+        self.wait_saved()
         path = os.path.join(PATH_CURRENT, key)
         if not os.path.isfile(path):
             return ()
         with open(path, "r") as f:
+            f.seek(start)
             lines = f.readlines(LINES_BUFFER_SIZE)
             while lines:
                 for line in lines:
                     yield line.rstrip("\n")
                 lines = f.readlines(LINES_BUFFER_SIZE)
 
+    def read(self, key: str) -> bytes:
+        """
+        Only for append-mode storage.
+
+        Returns the Committed contents of the file with the given key.
+        """
+        self.wait_saved()
+        path = os.path.join(PATH_CURRENT, key)
+        if not os.path.isfile(path):
+            return b""
+        with open(path, "rb") as f:
+            return f.read()
+
     def remove(self, key: str) -> None:
         """
         Removes the value with the given key.
@@ -90,64 +244,375 @@ class StatePersistor:
         self.pending_append.pop(key, None)
         self.pending_removed.add(key)
 
+    def remove_job(self, job_id: str) -> None:
+        """
+        Removes all the keys in the namespace of the job, including the ones
+        stored or appended to since the last save.
+        Committed on the next call to save().
+        """
+        prefix = job_key(job_id, "")
+        self.pending = {
+            k: v for k, v in self.pending.items() if not k.startswith(prefix)
+        }
+        self.pending_append = {
+            k: v for k, v in self.pending_append.items() if not k.startswith(prefix)
+        }
+        self.pending_removed = {
+            k for k in self.pending_removed if not k.startswith(prefix)
+        }
+        self.pending_truncated = {
+            k for k in self.pending_truncated if not k.startswith(prefix)
+        }
+        self.pending_removed_jobs.add(job_id)
+
+    def size(self, key: str) -> int:
+        """
+        Only for append-mode storage.
+
+        Returns the size of the Committed file with the given key.
+        """
+        return self.__size(key)
+
+    def path(self, key: str) -> str:
+        """
+        Returns the path of a file kept with the state by its owner, for data
+        derived from it. It's neither saved nor restored, but it's removed
+        along with its job's namespace.
+        """
+        path = os.path.join(PATH_CURRENT, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
     def load(self, key: str, type: Any) -> Any | None:
         """
         Loads the last Committed value with the given key.
         """
+        self.wait_saved()
         path = os.path.join(PATH_CURRENT, key)
         if not os.path.isfile(path):
             return None
 
+        with open(path, "r") as f, _paused_gc():
+            return self.__deserializer(key, type)(f.read())
+
+    def load_appended(self, key: str, type: Any, start: int = 0) -> list[Any]:
+        """
+        Only for append-mode storage of serialized values.
+
+        Loads all the values with the given key, from the given size of its
+        file. Faster than deserializing each value from iter(), as they're
+        all decoded at once.
+        """
+        self.wait_saved()
+        path = os.path.join(PATH_CURRENT, key)
+        if not os.path.isfile(path):
+            return []
+
         with open(path, "r") as f:
-            return deserialize(type, f.read())
+            f.seek(start)
+            data = f.read().rstrip("\n")
+        if not data:
+            return []
+        # Serialized values have no newlines, so the lines are the items of
+        # a JSON list once they're separated by commas
+        items = data.replace("\n", ",")
+        with _paused_gc():
+            return self.__deserializer(key, list[type])(f"[{items}]")  # type: ignore
 
     def save(self) -> None:
         """
         Commits all stored values.
         """
-        register_self_destruct("pre_save")
-        self.__save_pending(PATH_BACKUP)
-        self.__set_status(Status.Updating)
-        register_self_destruct("mid_save")
-        self.__save_pending(PATH_CURRENT)
-        self.__set_status(Status.Committed)
-        register_self_destruct("post_save")
+        self.wait_saved()
+        self.__write(self.__take_pending())
+
+    def save_async(self, on_saved: Callable[[], None]) -> None:
+        """
+        Commits all stored values in the writer thread. They're serialized
+        now, so later changes to them are left for the next save. on_saved is
+        called from the writer thread once they're Committed.
+        """
+        operations = self.__take_pending()
+        if self.writer is None:
+            self.writer = Thread(target=self.__write_loop, daemon=True)
+            self.writer.start()
+        self.writes.put((operations, on_saved))
+
+    def wait_saved(self) -> None:
+        """
+        Waits until the saves handed off to the writer thread are Committed.
+        Raises the error of the writer thread, if it failed.
+        """
+        self.writes.join()
+        if self.write_error is not None:
+            raise self.write_error
 
+    def sync_interval(self) -> float | None:
+        """
+        Returns the interval of the log syncs, if they're skipped within it
+        """
+        if self.durability != Durability.FSYNC_INTERVAL:
+            return None
+        return _fsync_interval
+
+    def sync(self) -> None:
+        """
+        Syncs the commits written to the log since it was last synced. The
+        ones skipped within the sync interval are otherwise only synced by the
+        next commit after it, so it must be called once it passes. It's done
+        after the saves handed off to the writer thread, if it's running.
+        """
+        if self.writer is None:
+            self.__sync_skipped()
+        else:
+            self.writes.put(([], self.__sync_skipped))
+
+    def __deserializer(self, key: str, type: Any) -> Callable[[str], Any]:
+        """
+        Returns the decoder of the key's file. The trusted decoders skip the
+        validation, so they're only used for files written by the commits of
+        this engine. The ones rewritten from the log after a crash, or written
+        without it, are validated.
+        """
+        if self.durability == Durability.NONE or key in self.recovered:
+            return deserializer(type)
+        return trusted_deserializer(type)
+
+    def __take_pending(self) -> list[Operation]:
+        register_self_destruct("pre_save")
+        operations = self.__pending_operations()
         self.pending = {}
         self.pending_append = {}
         self.pending_removed = set()
+        self.pending_truncated = set()
+        self.pending_removed_jobs = set()
+        return operations
+
+    def __write_loop(self) -> None:
+        while True:
+            operations, on_saved = self.writes.get()
+            # nothing is written after a failed save, to keep them in order
+            if self.write_error is None:
+                try:
+                    self.__write(operations)
+                except Exception as e:
+                    logging.exception("Failed to save the state")
+                    self.write_error = e
+                else:
+                    try:
+                        on_saved()
+                    except Exception:
+                        logging.exception("Error while notifying a save")
+            self.writes.task_done()
+
+    def __write(self, operations: list[Operation]) -> None:
+        start = time.perf_counter()
+        if operations and self.durability != Durability.NONE:
+            self.wal.append(operations)
+            self.__sync_wal()
+        register_self_destruct("mid_save")
+        for op in operations:
+            self.__apply(op)
+        if operations:
+            self.write_latency.add(time.perf_counter() - start)
+        register_self_destruct("post_save")
+        if self.wal.size >= WAL_CHECKPOINT_BYTES:
+            self.__checkpoint()
+        self.__report_latency()
+
+    def __syncs(self) -> bool:
+        return self.durability in (Durability.FSYNC, Durability.FSYNC_INTERVAL)
+
+    def __sync_wal(self) -> None:
+        if not self.__syncs():
+            return
+        if (
+            self.durability == Durability.FSYNC_INTERVAL
+            and time.monotonic() - self.last_sync < _fsync_interval
+        ):
+            self.wal_unsynced = True
+            return
+        self.__sync_log()
+
+    def __sync_skipped(self) -> None:
+        if self.wal_unsynced:
+            self.__sync_log()
+
+    def __sync_log(self) -> None:
+        start = time.monotonic()
+        self.wal.sync()
+        self.last_sync = time.monotonic()
+        self.wal_unsynced = False
+        self.sync_latency.add(self.last_sync - start)
+
+    def __checkpoint(self) -> None:
+        """
+        Empties the log. When syncing, the state files written since the
+        last checkpoint are synced first, as the log is their only copy
+        on disk until then.
+        """
+        if self.__syncs():
+            start = time.perf_counter()
+            for key in self.unsynced:
+                path = os.path.join(PATH_CURRENT, key)
+                if os.path.isfile(path):
+                    _sync_path(path)
+            # for the files and namespaces created and removed
+            directories = {PATH_CURRENT}
+            for key in self.unsynced:
+                directories.add(os.path.dirname(os.path.join(PATH_CURRENT, key)))
+            for directory in directories:
+                if os.path.isdir(directory):
+                    _sync_path(directory)
+            self.sync_latency.add(time.perf_counter() - start)
+        self.unsynced = set()
+        self.wal.truncate()
+        if self.__syncs():
+            self.wal.sync()
+        # the files of the commits in it were just synced
+        self.wal_unsynced = False
+
+    def __report_latency(self) -> None:
+        now = time.monotonic()
+        if now - self.last_report < LATENCY_REPORT_SECONDS:
+            return
+        if self.write_latency.count:
+            logging.info(
+                f"Saves in the last {now - self.last_report:.0f}s:"
+                f" {self.write_latency}; fsyncs: {self.sync_latency}"
+            )
+        self.write_latency = Latency()
+        self.sync_latency = Latency()
+        self.last_report = now
+
+    def __pending_operations(self) -> list[Operation]:
+        # namespaces go first, as anything stored after removing them
+        # was already left out of them
+        operations = []
+        for job_id in self.pending_removed_jobs:
+            namespace = _job_namespace(job_id)
+            operations.append(Operation(OperationKind.REMOVE_JOB, namespace))
+            prefix = job_key(job_id, "")
+            self.sizes = {
+                k: v for k, v in self.sizes.items() if not k.startswith(prefix)
+            }
 
-    def __save_pending(self, to_path: str) -> None:
         for key, value in self.pending.items():
-            path = os.path.join(to_path, key)
-            with open(path, "w") as f:
-                f.write(serialize(value))
+            data = serialize(value).encode()
+            operations.append(Operation(OperationKind.STORE, key, data))
+            self.sizes[key] = len(data)
 
+        removed_namespaces = tuple(job_key(j, "") for j in self.pending_removed_jobs)
         for key, lines in self.pending_append.items():
-            path = os.path.join(to_path, key)
-            with open(path, "a") as f:
-                f.writelines(f"{v}\n" for v in lines)
+            data = "".join(f"{v}\n" for v in lines).encode()
+            # appending from the start truncates what was removed
+            if key in self.pending_truncated or key.startswith(removed_namespaces):
+                offset = 0
+            else:
+                offset = self.__size(key)
+            operations.append(Operation(OperationKind.APPEND, key, data, offset))
+            self.sizes[key] = offset + len(data)
 
         for key in self.pending_removed:
-            path = os.path.join(to_path, key)
-            if os.path.isfile(path):
-                os.remove(path)
+            operations.append(Operation(OperationKind.REMOVE, key))
+            self.sizes[key] = 0
+        return operations
 
-    def __set_status(self, status: Status) -> None:
-        with open(STATUS_FILE_TEMP, "w") as f:
-            f.write(status.value)
+    def __size(self, key: str) -> int:
+        size = self.sizes.get(key)
+        if size is None:
+            # its file may still be written by the writer thread
+            self.wait_saved()
+            path = os.path.join(PATH_CURRENT, key)
+            size = os.path.getsize(path) if os.path.isfile(path) else 0
+        return size
 
-        # os.rename is atomic
-        os.rename(STATUS_FILE_TEMP, STATUS_FILE)
+    def __apply(self, op: Operation) -> None:
+        """
+        Applies the operation to the state files. Applying it more than once
+        has the same result, so the log can be replayed from any point.
+        """
+        path = os.path.join(PATH_CURRENT, op.key)
+        if self.__syncs():
+            self.unsynced.add(op.key)
+        if op.kind == OperationKind.STORE:
+            with _open_creating_dirs(path, "wb") as f:
+                f.write(op.data)
+        elif op.kind == OperationKind.APPEND:
+            with _open_creating_dirs(path, "ab") as f:
+                f.truncate(op.offset)
+                f.write(op.data)
+        elif op.kind == OperationKind.REMOVE_JOB:
+            rmtree(path, ignore_errors=True)
+        elif os.path.isfile(path):
+            os.remove(path)
 
     def __restore(self) -> None:
+        self.__restore_previous_engine()
+        self.wal = WriteAheadLog(WAL_FILE)
+        if self.__syncs():
+            # for the log itself, if it was just created
+            _sync_path(PATH_BASE)
+        replayed = 0
+        for operations in self.wal.records():
+            for op in operations:
+                self.__apply(op)
+                self.recovered.add(op.key)
+            replayed += 1
+        self.__checkpoint()
+        if replayed:
+            logging.info(f"Replayed {replayed} commits from the write-ahead log")
+
+    def __restore_previous_engine(self) -> None:
+        """
+        Recovers the state left by the previous engine, if it was interrupted
+        in the middle of a save, and removes its files
+        """
+        if not os.path.isfile(STATUS_FILE):
+            return
         with open(STATUS_FILE, "r") as f:
             status = Status(f.read())
 
-        if status == Status.Committed:
-            rmtree(PATH_BACKUP)
-            copytree(PATH_CURRENT, PATH_BACKUP)
-        elif status == Status.Updating:
+        if status == Status.Updating:
             rmtree(PATH_CURRENT)
             copytree(PATH_BACKUP, PATH_CURRENT)
-            self.__set_status(Status.Committed)
+        rmtree(PATH_BACKUP, ignore_errors=True)
+        os.remove(STATUS_FILE)
+
+
+def _sync_path(path: str) -> None:
+    """
+    Syncs a file or directory to disk
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _open_creating_dirs(path: str, mode: str) -> IO[Any]:
+    """
+    Opens the file, creating the directory of its namespace if needed
+    """
+    try:
+        return open(path, mode)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, mode)
+
+
+@contextmanager
+def _paused_gc() -> Iterator[None]:
+    """
+    Pauses the garbage collector while restoring a state. It only creates
+    objects, which would otherwise trigger collections that can't free
+    anything.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
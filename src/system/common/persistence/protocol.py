@@ -10,3 +10,7 @@ class WithStateProtocol(Protocol):
     @abstractmethod
     def store_to(self, key: str) -> None:
         raise NotImplementedError()
+
+    @abstractmethod
+    def remove_from(self, key: str) -> None:
+        raise NotImplementedError()
@@ -21,3 +21,6 @@ class WithState(Generic[S]):
 
     def store_to(self, key: str) -> None:
         StatePersistor().store(key, self.state)
+
+    def remove_from(self, key: str) -> None:
+        StatePersistor().remove(key)
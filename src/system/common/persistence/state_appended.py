@@ -1,6 +1,6 @@
 from typing import Generic, TypeVar
 
-from shared.serde import get_generic_types, deserialize, serialize
+from shared.serde import get_generic_types, serialize
 
 from .persistor import StatePersistor
 
@@ -22,11 +22,8 @@ class WithStateAppended(Generic[K, V]):
 
     def restore_from(self, key: str) -> None:
         key_type, value_type = get_generic_types(self, WithStateAppended)
-        items = (
-            deserialize(tuple[key_type, value_type], x)  # type: ignore
-            for x in StatePersistor().iter(key)
-        )
-        self.state = {x: y for x, y in items}
+        items = StatePersistor().load_appended(key, tuple[key_type, value_type])  # type: ignore # noqa
+        self.state = dict(items)
         self.__pending = {}
 
     def store_to(self, store_key: str) -> None:
@@ -36,3 +33,6 @@ class WithStateAppended(Generic[K, V]):
         for key, value in self.__pending.items():
             StatePersistor().append(store_key, serialize((key, value)))
         self.__pending = {}
+
+    def remove_from(self, key: str) -> None:
+        StatePersistor().remove(key)
@@ -0,0 +1,112 @@
+from array import array
+from base64 import b64decode, b64encode
+from itertools import chain
+from typing import Any, Generic, TypeVar
+
+from shared.serde import get_generic_types, serialize
+
+from .persistor import StatePersistor
+from .state_snapshot import WithStateSnapshot
+
+K = TypeVar("K")
+
+# typecodes of the counts and sums arrays
+COUNT_TYPECODE = "q"
+SUM_TYPECODE = "d"
+
+
+class WithStateArrays(WithStateSnapshot, Generic[K]):
+    """
+    State of a count and a sum per key, kept in arrays indexed by the slot
+    of each key instead of in an object per key, so that adding a value
+    doesn't allocate anything once its key has a slot. It's stored as a
+    snapshot plus a log of the slots that changed after it, with a line per
+    commit, and restored lazily, as described in WithStateSnapshot.
+    Snapshots store the arrays packed, as base64 of their bytes.
+    """
+
+    __indexes: dict[K, int]
+    __keys: list[K]
+    __counts: "array[int]"
+    __sums: "array[float]"
+    # slots changed since the last commit
+    __dirty: set[int]
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def add(self, key: K, value: float = 0) -> None:
+        """
+        Counts the value of the given key and adds it to its sum
+        """
+        if self._restored_key is not None:
+            self._load_restored()
+        slot = self.__indexes.get(key)
+        if slot is None:
+            slot = self.__new_slot(key)
+        self.__counts[slot] += 1
+        self.__sums[slot] += value
+        self.__dirty.add(slot)
+
+    def entries(self) -> list[tuple[K, int, float]]:
+        """
+        Returns the key, count and sum of each key
+        """
+        self._load_restored()
+        return list(zip(self.__keys, self.__counts, self.__sums))
+
+    def reset(self) -> None:
+        self.__indexes = {}
+        self.__keys = []
+        self.__counts = array(COUNT_TYPECODE)
+        self.__sums = array(SUM_TYPECODE)
+        self.__dirty = set()
+        self._replaced_state()
+
+    def _size(self) -> int:
+        return len(self.__keys)
+
+    def _dirty(self) -> set[Any]:
+        return self.__dirty
+
+    def _snapshot(self) -> Any:
+        return (list(self.__keys), _pack(self.__counts), _pack(self.__sums))
+
+    def _log_lines(self, dirty: set[Any]) -> list[str]:
+        # a line per commit, as serializing each entry on its own is slower
+        keys, counts, sums = self.__keys, self.__counts, self.__sums
+        return [serialize([(keys[x], counts[x], sums[x]) for x in dirty])]
+
+    def __new_slot(self, key: K) -> int:
+        slot = len(self.__keys)
+        self.__indexes[key] = slot
+        self.__keys.append(key)
+        self.__counts.append(0)
+        self.__sums.append(0)
+        return slot
+
+    def _load(self, key: str, log_key: str) -> int:
+        (key_type,) = get_generic_types(self, WithStateArrays)
+        snapshot = StatePersistor().load(key, tuple[list[key_type], str, str])  # type: ignore # noqa
+        lines = StatePersistor().load_appended(
+            log_key, list[tuple[key_type, int, float]]  # type: ignore
+        )
+        entries = list(chain.from_iterable(lines))
+        self.reset()
+        if snapshot is not None:
+            keys, counts, sums = snapshot
+            self.__indexes = {x: i for i, x in enumerate(keys)}
+            self.__keys = keys
+            self.__counts.frombytes(b64decode(counts))
+            self.__sums.frombytes(b64decode(sums))
+        for entry_key, count, total in entries:
+            slot = self.__indexes.get(entry_key)
+            if slot is None:
+                slot = self.__new_slot(entry_key)
+            self.__counts[slot] = count
+            self.__sums[slot] = total
+        return len(entries)
+
+
+def _pack(values: "array[int] | array[float]") -> str:
+    return b64encode(values.tobytes()).decode()
@@ -0,0 +1,92 @@
+from typing import Any, Generic, TypeVar
+
+from shared.serde import get_generic_types, serialize
+
+from .persistor import StatePersistor
+from .state_snapshot import WithStateSnapshot
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class TrackedDict(dict[K, V]):
+    """
+    Dict that keeps the keys that changed since the last commit. Values
+    returned by setdefault() are marked too, as they're usually modified in
+    place. Values modified in place must be accessed through it.
+    """
+
+    dirty: set[K]
+
+    def __init__(self, *args: Any) -> None:
+        super().__init__(*args)
+        self.dirty = set()
+
+    def __setitem__(self, key: K, value: V) -> None:
+        super().__setitem__(key, value)
+        self.dirty.add(key)
+
+    def __delitem__(self, key: K) -> None:
+        super().__delitem__(key)
+        self.dirty.add(key)
+
+    def setdefault(self, key: K, default: V) -> V:  # type: ignore[override]
+        self.dirty.add(key)
+        return super().setdefault(key, default)
+
+    def pop(self, key: K, *default: Any) -> Any:
+        self.dirty.add(key)
+        return super().pop(key, *default)
+
+    def clear(self) -> None:
+        self.dirty.update(self)
+        super().clear()
+
+
+class WithStateIncremental(WithStateSnapshot, Generic[K, V]):
+    """
+    Dict state stored as a snapshot plus a log of the entries that changed
+    after it, with a line per entry, and restored lazily, as described in
+    WithStateSnapshot.
+    """
+
+    __state: TrackedDict[K, V]
+
+    def __init__(self) -> None:
+        self.state = {}
+
+    @property
+    def state(self) -> dict[K, V]:
+        self._load_restored()
+        return self.__state
+
+    @state.setter
+    def state(self, value: dict[K, V]) -> None:
+        self.__state = TrackedDict(value)
+        self._replaced_state()
+
+    def _size(self) -> int:
+        return len(self.__state)
+
+    def _dirty(self) -> set[Any]:
+        return self.__state.dirty
+
+    def _snapshot(self) -> Any:
+        return dict(self.__state)
+
+    def _log_lines(self, dirty: set[Any]) -> list[str]:
+        return [serialize((x, self.__state.get(x))) for x in dirty]
+
+    def _load(self, key: str, log_key: str) -> int:
+        key_type, value_type = get_generic_types(self, WithStateIncremental)
+        state = StatePersistor().load(key, dict[key_type, value_type]) or {}  # type: ignore # noqa
+        entries = StatePersistor().load_appended(
+            log_key, tuple[key_type, value_type | None]  # type: ignore
+        )
+        for entry_key, value in entries:
+            if value is None:
+                state.pop(entry_key, None)
+            else:
+                state[entry_key] = value
+        self.__state = TrackedDict(state)
+        return len(entries)
@@ -0,0 +1,151 @@
+import os
+from typing import Any, Generic, TypeVar
+
+from shared.serde import get_generic_types, serialize
+
+from .mapped_table import MappedTable
+from .persistor import StatePersistor
+
+K = TypeVar("K", bound=tuple[str, ...])
+V = TypeVar("V")
+
+KEY_SEPARATOR = "\x1f"
+# decoded values kept in memory, the table is cleared once it's bigger
+CACHE_SIZE = 4096
+
+
+class WithStateMapped(Generic[K, V]):
+    """
+    Dict state with string tuple keys, kept in a MappedTable next to the
+    state instead of in memory. Changes are appended to a log like in
+    WithStateAppended, which is what's Committed. The table records how much
+    of the log it has, so restoring only replays what comes after that. It's
+    rebuilt from the log when it's ahead of it (written but not Committed)
+    or not valid. That's done on the first access after restoring it, so
+    that restarting doesn't wait for every job's table.
+
+    value_format is the struct format of the fields of the values, with "s"
+    for strings. Values other than a single field must override
+    _pack_value() and _unpack_value().
+    """
+
+    value_format: str
+    __table: MappedTable | None
+    # key restored from, while its table isn't opened yet
+    __restored_key: str | None
+    __pending: dict[K, V]
+    __cache: dict[K, V | None]
+    # size of the log once the pending entries are appended
+    __log_size: int
+
+    def __init__(self) -> None:
+        self.__table = None
+        self.__restored_key = None
+        self.__pending = {}
+        self.__cache = {}
+        self.__log_size = 0
+
+    def set(self, key: K, value: V) -> None:
+        self.__pending[key] = value
+        self.__cache[key] = value
+
+    def get(self, key: K) -> V | None:
+        if key in self.__cache:
+            return self.__cache[key]
+        value = self.__pending.get(key)
+        if value is None and self.__restored_key is not None:
+            self.__bind(self.__restored_key)
+        if value is None and self.__table is not None:
+            fields = self.__table.get(self.__encode_key(key))
+            value = None if fields is None else self._unpack_value(fields)
+        if len(self.__cache) >= CACHE_SIZE:
+            self.__cache = {}
+        self.__cache[key] = value
+        return value
+
+    def items(self) -> list[tuple[K, V]]:
+        """
+        Returns every entry, reading the whole table
+        """
+        if self.__restored_key is not None:
+            self.__bind(self.__restored_key)
+        items: dict[K, V] = {}
+        if self.__table is not None:
+            for key, fields in self.__table.items():
+                items[self.__decode_key(key)] = self._unpack_value(fields)
+        items.update(self.__pending)
+        return list(items.items())
+
+    def restore_from(self, key: str) -> None:
+        self.__close()
+        self.__restored_key = key
+        self.__pending = {}
+        self.__cache = {}
+
+    def store_to(self, store_key: str) -> None:
+        if len(self.__pending) == 0:
+            return
+
+        table = self.__bind(store_key)
+        for key, value in self.__pending.items():
+            line = serialize((key, value))
+            StatePersistor().append(store_key, line)
+            table.set(self.__encode_key(key), self._pack_value(value))
+            self.__log_size += len(line.encode()) + 1
+        table.mark(self.__log_size)
+        self.__pending = {}
+
+    def remove_from(self, key: str) -> None:
+        StatePersistor().remove(key)
+        self.__close()
+        path = StatePersistor().path(self.__table_key(key))
+        if os.path.isfile(path):
+            os.remove(path)
+
+    def _pack_value(self, value: V) -> tuple[Any, ...]:
+        return (value,)
+
+    def _unpack_value(self, fields: tuple[Any, ...]) -> V:
+        return fields[0]  # type: ignore
+
+    def __bind(self, key: str) -> MappedTable:
+        """
+        Opens the table of the log with the given key, bringing it up to date
+        with the Committed log
+        """
+        if self.__table is not None:
+            return self.__table
+
+        log_size = StatePersistor().size(key)
+        table = MappedTable(
+            StatePersistor().path(self.__table_key(key)), self.value_format
+        )
+        if table.log_size > log_size:
+            table.clear()
+        if table.log_size < log_size:
+            key_type, value_type = get_generic_types(self, WithStateMapped)
+            entries = StatePersistor().load_appended(
+                key, tuple[key_type, value_type], table.log_size  # type: ignore
+            )
+            for entry_key, value in entries:
+                table.set(self.__encode_key(entry_key), self._pack_value(value))
+            table.mark(log_size)
+        self.__table = table
+        self.__restored_key = None
+        self.__log_size = log_size
+        return table
+
+    def __close(self) -> None:
+        if self.__table is not None:
+            self.__table.close()
+            self.__table = None
+        self.__restored_key = None
+
+    def __encode_key(self, key: K) -> bytes:
+        return KEY_SEPARATOR.join(key).encode()
+
+    def __decode_key(self, key: bytes) -> K:
+        return tuple(key.decode().split(KEY_SEPARATOR))  # type: ignore
+
+    def __table_key(self, key: str) -> str:
+        return f"{key}_table"
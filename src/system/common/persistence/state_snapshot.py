@@ -0,0 +1,108 @@
+from abc import ABC, abstractmethod
+from typing import Any
+
+from .persistor import StatePersistor
+
+# Minimum amount of logged entries before replacing them with a new snapshot
+COMPACT_MIN_ENTRIES = 1000
+
+
+class WithStateSnapshot(ABC):
+    """
+    State stored as a snapshot plus a log of the entries that changed after
+    it, so that each commit only writes what changed. The log is replaced by
+    a new snapshot once it's longer than the state itself. Restoring it is
+    deferred until the state is first accessed, so that restarting doesn't
+    wait for the state of every job.
+
+    Subclasses keep the state and the entries changed since the last commit,
+    and call _load_restored() before accessing the state.
+    """
+
+    # key restored from, while the state isn't loaded yet
+    _restored_key: str | None
+    # entries in the log since the last snapshot
+    __logged: int
+    # whether the whole state was replaced since the last commit
+    __replaced: bool
+
+    def restore_from(self, key: str) -> None:
+        self._restored_key = key
+
+    def store_to(self, key: str) -> None:
+        if self._restored_key is not None:
+            # not loaded, so nothing changed
+            return
+        dirty = self._dirty()
+        if self.__replaced or self.__logged + len(dirty) > max(
+            COMPACT_MIN_ENTRIES, self._size()
+        ):
+            StatePersistor().store(key, self._snapshot())
+            StatePersistor().remove(_log_key(key))
+            self.__logged = 0
+            self.__replaced = False
+        elif len(dirty) > 0:
+            for line in self._log_lines(dirty):
+                StatePersistor().append(_log_key(key), line)
+            self.__logged += len(dirty)
+        dirty.clear()
+
+    def remove_from(self, key: str) -> None:
+        StatePersistor().remove(key)
+        StatePersistor().remove(_log_key(key))
+
+    def _replaced_state(self) -> None:
+        """
+        Marks the whole state as replaced, to store it as a new snapshot on
+        the next commit
+        """
+        self._restored_key = None
+        self.__logged = 0
+        self.__replaced = True
+
+    def _load_restored(self) -> None:
+        """
+        Loads the state restored with restore_from(), if it isn't loaded yet
+        """
+        key = self._restored_key
+        if key is None:
+            return
+        self.__logged = self._load(key, _log_key(key))
+        self._restored_key = None
+        self.__replaced = False
+
+    @abstractmethod
+    def _size(self) -> int:
+        """
+        Returns the amount of entries in the state
+        """
+
+    @abstractmethod
+    def _dirty(self) -> set[Any]:
+        """
+        Returns the entries changed since the last commit. It's cleared once
+        they're stored.
+        """
+
+    @abstractmethod
+    def _snapshot(self) -> Any:
+        """
+        Returns the whole state, as stored in the snapshot
+        """
+
+    @abstractmethod
+    def _log_lines(self, dirty: set[Any]) -> list[str]:
+        """
+        Returns the lines appended to the log for the changed entries
+        """
+
+    @abstractmethod
+    def _load(self, key: str, log_key: str) -> int:
+        """
+        Loads the snapshot stored with the key and applies the log stored with
+        the log key to it. Returns the amount of entries in the log.
+        """
+
+
+def _log_key(key: str) -> str:
+    return f"{key}_log"
@@ -0,0 +1,109 @@
+"""
+Write-ahead log used by StatePersistor.
+
+Each commit is a single record: its payload length and CRC32, followed by
+the operations in it. Every operation is its kind, key, offset and data.
+A record that is cut short or doesn't match its checksum was never fully
+written, so it and anything after it is ignored when replaying.
+"""
+
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import BinaryIO, Iterator
+
+# payload length, crc32
+RECORD_HEADER = struct.Struct("<II")
+# kind, key length, offset, data length
+OPERATION_HEADER = struct.Struct("<BHQI")
+
+
+class OperationKind(IntEnum):
+    STORE = 0
+    APPEND = 1
+    REMOVE = 2
+    # removes the namespace of a job, with all its keys
+    REMOVE_JOB = 3
+
+
+@dataclass
+class Operation:
+    kind: OperationKind
+    key: str
+    data: bytes = b""
+    # size of the file before appending, so that appends can be replayed
+    offset: int = 0
+
+
+class WriteAheadLog:
+    path: str
+    file: BinaryIO
+    size: int
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "ab")
+        self.size = self.file.tell()
+
+    def append(self, operations: list[Operation]) -> None:
+        """
+        Appends a record with the operations of a commit
+        """
+        parts = []
+        for op in operations:
+            key = op.key.encode()
+            parts.append(
+                OPERATION_HEADER.pack(op.kind, len(key), op.offset, len(op.data))
+            )
+            parts.append(key)
+            parts.append(op.data)
+        payload = b"".join(parts)
+        self.file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self.file.write(payload)
+        self.file.flush()
+        self.size += RECORD_HEADER.size + len(payload)
+
+    def sync(self) -> None:
+        """
+        Syncs the appended records to disk
+        """
+        os.fsync(self.file.fileno())
+
+    def records(self) -> Iterator[list[Operation]]:
+        """
+        Returns the operations of each complete record, in order
+        """
+        with open(self.path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos + RECORD_HEADER.size <= len(data):
+            length, checksum = RECORD_HEADER.unpack_from(data, pos)
+            start = pos + RECORD_HEADER.size
+            payload = data[start : start + length]
+            if len(payload) != length or zlib.crc32(payload) != checksum:
+                return
+            yield self.__decode(payload)
+            pos = start + length
+
+    def truncate(self) -> None:
+        """
+        Empties the log, once all its operations are in the state files
+        """
+        self.file.truncate(0)
+        self.size = 0
+
+    @staticmethod
+    def __decode(payload: bytes) -> list[Operation]:
+        operations = []
+        pos = 0
+        while pos < len(payload):
+            kind, key_len, offset, data_len = OPERATION_HEADER.unpack_from(payload, pos)
+            pos += OPERATION_HEADER.size
+            key = payload[pos : pos + key_len].decode()
+            pos += key_len
+            data = payload[pos : pos + data_len]
+            pos += data_len
+            operations.append(Operation(OperationKind(kind), key, data, offset))
+        return operations
@@ -3,9 +3,12 @@ import logging
 import os
 import random
 import math
+import time
 
 T = TypeVar("T")
 SELF_DESTRUCT_KEY_PREFIX = "SELF_DESTRUCT_"
+# Imported first thing by every process, so roughly when it started
+PROCESS_STARTED = time.monotonic()
 
 
 def singleton(cls: Type[T]) -> Callable[[], T]:
@@ -28,7 +31,7 @@ class Runner(Protocol):
 
 
 def process_loop(factory: Callable[[], Runner]) -> None:
-    runner = factory()
+    runner = _start(factory, PROCESS_STARTED)
     logging.info("Starting process loop")
     while True:
         try:
@@ -40,10 +43,25 @@ def process_loop(factory: Callable[[], Runner]) -> None:
                 f"Exception in process loop. Restarting process. Details: {e}"
             )
         runner.cleanup()
-        runner = factory()
+        runner = _start(factory, time.monotonic())
     runner.cleanup()
 
 
+def _start(factory: Callable[[], Runner], started: float) -> Runner:
+    """
+    Creates the runner, which restores its state, logging how long it took
+    to be ready since the given time
+    """
+    restore_started = time.monotonic()
+    runner = factory()
+    now = time.monotonic()
+    logging.info(
+        f"Ready after {now - started:.3f}s, restoring took"
+        f" {now - restore_started:.3f}s"
+    )
+    return runner
+
+
 def register_self_destruct(key: str) -> None:
     """
     Registers a key to be used for self destructing the process. The probability
@@ -2,6 +2,7 @@ import logging
 import zmq
 
 from shared.log import setup_logs
+from common.persistence import setup_durability
 from common.util import process_loop
 
 from .input_server import InputServer
@@ -33,6 +34,7 @@ class Runner:
 
 def main() -> None:
     setup_logs(Config().log_level)
+    setup_durability(Config().durability, Config().durability_fsync_millis)
 
     process_loop(lambda: Runner())
 
@@ -17,7 +17,7 @@ from shared.socket import SocketStopWrapper
 
 from common.messages import RecordType, End, Start, TripsStart
 from common.messages.raw import RawLines
-from common.persistence import StatePersistor, WithState
+from common.persistence import StatePersistor, WithState, job_key
 
 from ..comms import SystemCommunication
 from .phase import PhaseValidator, Phase
@@ -54,10 +54,10 @@ class ClientHandler(WithState[State]):
         self.socket = socket
         self.on_finish = on_finish
 
-        self.restore_from(job_id)
+        self.restore_from(self._store_key())
         if self.state.client_identity is None:
             raise RuntimeError("Client identity not set")
-        self.store_to(self.job_id)
+        self.store_to(self._store_key())
         if self.state.latest_start is None:
             comms.setup_job_queue(job_id)
             self.comms.send_msg(self.job_id, Start())
@@ -78,7 +78,7 @@ class ClientHandler(WithState[State]):
         logging.info(
             f"Job {self.job_id} | Receiving {msg.record_type}s from {msg.city}"
         )
-        self.store_to(self.job_id)
+        self.store_to(self._store_key())
         if (
             previous_phase == Phase.STATIONS_WEATHER
             and self.state.phase.current() == Phase.TRIPS
@@ -112,13 +112,13 @@ class ClientHandler(WithState[State]):
         msg_id = self.__get_msg_id(msg.batch_number)
         self.__set_latest_batch(msg.batch_number)
         self.comms.send_msg(self.job_id, raw, msg_id)
-        self.store_to(self.job_id)
+        self.store_to(self._store_key())
         return Ack(msg.batch_number)
 
     @handle_message.register
     def handle_all_sent(self, all_sent: AllSent) -> ServerMessagesInput:
         self.comms.send_msg(self.job_id, End())
-        StatePersistor().remove(self.job_id)
+        StatePersistor().remove_job(self.job_id)
         self.on_finish(self.job_id)
         return Ack()
 
@@ -136,3 +136,6 @@ class ClientHandler(WithState[State]):
         ):
             return None
         return f"{self.state.latest_start.city};{batch_number}"
+
+    def _store_key(self) -> str:
+        return job_key(self.job_id, "client")
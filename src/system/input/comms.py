@@ -1,14 +1,15 @@
 from threading import Event, Thread
-from typing import Callable
+from typing import Any, Callable
 
 from common.comms_base import (
     SystemCommunicationBase,
     CommsSend,
     setup_job_queues,
     HeartbeatSender,
+    package_headers,
 )
 from common.messages.comms import Package
-from common.messages.raw import RawRecord
+from common.messages.raw import ParserRecord, RawRecord
 from common.persistence import StatePersistor
 
 from .config import Config
@@ -16,13 +17,15 @@ from .config import Config
 PENDING_KEY = "_pending_package"
 
 
-class SystemCommunication(CommsSend[Package[RawRecord]], SystemCommunicationBase):
+# encoded as the parsers' in type, which the joiners send trip filters with too
+class SystemCommunication(CommsSend[Package[ParserRecord]], SystemCommunicationBase):
     pending_package: Package[RawRecord] | None = None
     stop_event: Event
     thread: Thread | None = None
 
     def __init__(self) -> None:
         super().__init__(Config())
+        self.out_serialization = Config().out_serialization
         self.pending_package = StatePersistor().load(
             PENDING_KEY, Package[RawRecord] | None
         )
@@ -30,12 +33,15 @@ class SystemCommunication(CommsSend[Package[RawRecord]], SystemCommunicationBase
         self.channel.confirm_delivery()
         HeartbeatSender(self, Config()).setup_timer()
 
-    def _get_routing_details(self, msg: Package[RawRecord]) -> tuple[str, str]:
+    def _get_routing_details(self, msg: Package[ParserRecord]) -> tuple[str, str]:
         return (
             Config().out_exchange,
             f"{msg.job_id}.{msg.messages[0].get_routing_key()}",
         )
 
+    def _get_headers(self, msg: Package[ParserRecord]) -> dict[str, Any]:
+        return package_headers(msg)
+
     def setup_job_queue(self, job_id: str) -> None:
         self.__wait_until(
             lambda: setup_job_queues(
@@ -1,4 +1,5 @@
 from common.config_base import ConfigBase
+from common.comms_base import Serialization
 from common.util import singleton
 
 
@@ -9,12 +10,16 @@ class Config(ConfigBase):
 
     # Middleware settings
     out_exchange: str
+    out_serialization: Serialization
     out_batchs_queues: dict[str, list[str]]  # queue -> routing keys
 
     def __init__(self) -> None:
         super().__init__("input")
         self.address = self.get("Address")
         self.out_exchange = self.get("InExchange", section="parsers")
+        self.out_serialization = Serialization(
+            self.get("InSerialization", section="parsers")
+        )
         self.max_jobs = self.get_int("MaxJobs")
 
         self.out_batchs_queues = {
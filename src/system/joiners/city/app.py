@@ -1,7 +1,9 @@
 import logging
 from shared.log import setup_logs
 
+from common.messages.basic import CityTrip
 from common.messages.joined import JoinedCityTrip
+from common.persistence import setup_durability
 from common.util import process_loop
 
 from ..common.comms import JoinerComms
@@ -12,10 +14,13 @@ from .config import Config
 
 def main() -> None:
     setup_logs(Config().log_level)
+    setup_durability(Config().durability, Config().durability_fsync_millis)
 
     process_loop(
-        lambda: JoinHandler[JoinedCityTrip](
-            Config(), JoinerComms[JoinedCityTrip](Config()), lambda: CityJoiner()
+        lambda: JoinHandler[JoinedCityTrip, CityTrip](
+            Config(),
+            JoinerComms[JoinedCityTrip, CityTrip](Config()),
+            lambda: CityJoiner(),
         )
     )
     logging.info("Exiting gracefully")
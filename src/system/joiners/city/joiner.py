@@ -1,9 +1,12 @@
 from dataclasses import dataclass
 import logging
+from typing import Any
 
-from common.messages.basic import BasicStation, BasicTrip, BasicWeather
+from common.messages.basic import BasicStation, BasicWeather, CityTrip
 from common.messages.joined import JoinedCityTrip
-from common.persistence import WithStateAppended
+from common.persistence import WithStateMapped
+
+from ..common.station_ids import station_ids
 
 
 @dataclass
@@ -17,7 +20,16 @@ Key = tuple[str, str, str]
 Value = StationData
 
 
-class CityJoiner(WithStateAppended[Key, Value]):
+class CityJoiner(WithStateMapped[Key, Value]):
+    # name, latitude, longitude
+    value_format = "sdd"
+    # station name -> id, built on the first trip
+    station_ids: dict[str, int] | None
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.station_ids = None
+
     def handle_station(self, station: BasicStation) -> None:
         if station.latitude is None or station.longitude is None:
             logging.debug(
@@ -33,15 +45,37 @@ class CityJoiner(WithStateAppended[Key, Value]):
     def handle_weather(self, weather: BasicWeather) -> None:
         logging.warn("Unexpected Weather received on year joiner")
 
-    def handle_trip(self, trip: BasicTrip) -> JoinedCityTrip | None:
+    def handle_trip(self, trip: CityTrip) -> JoinedCityTrip | None:
         start = self.__get_station_data(trip.city, trip.start_station_code, trip.year)
         end = self.__get_station_data(trip.city, trip.end_station_code, trip.year)
         if start is None or end is None:
             return None
-        return JoinedCityTrip(end.name, start.coordinates, end.coordinates)
+        return JoinedCityTrip(
+            self.__station_id(end.name), start.coordinates, end.coordinates
+        )
+
+    def trip_keys(self) -> list[Key]:
+        # stations are only stored with their coordinates
+        return [key for key, _ in self.items()]
+
+    def station_names(self) -> list[str]:
+        self.station_ids = station_ids(station.name for _, station in self.items())
+        return list(self.station_ids)
+
+    def __station_id(self, name: str) -> int:
+        if self.station_ids is None:
+            self.station_names()
+        return self.station_ids[name]  # type: ignore
 
     def __get_station_data(self, city: str, code: str, year: str) -> StationData | None:
-        station = self.state.get((city, code, year), None)
+        station = self.get((city, code, year))
         if station is None:
             logging.debug(f"Missing station data for code {code}, year {year} ({city})")
         return station
+
+    def _pack_value(self, value: Value) -> tuple[Any, ...]:
+        return (value.name, *value.coordinates)
+
+    def _unpack_value(self, fields: tuple[Any, ...]) -> Value:
+        name, latitude, longitude = fields
+        return StationData(name, (latitude, longitude))
@@ -1,26 +1,52 @@
-from typing import Callable, Generic
+from functools import cached_property
+from typing import Any, Callable, Generic
 
 from common.messages import End, Start
-from common.messages.basic import BasicRecord
-from common.messages.joined import GenericJoinedTrip
+from common.messages.basic import (
+    BasicControlRecord,
+    BasicRecord,
+    BasicStation,
+    BasicWeather,
+    GenericTrip,
+    TripFilter,
+)
+from common.messages.joined import GenericJoinedTrip, JoinerRecord, StationNames
+from common.messages.raw import ParserRecord
 from common.comms_base import ReliableComms, setup_job_queues, HeartbeatSender
+from shared.serde import get_generic_types
 
 from .config import Config
 
-__all__ = ["GenericJoinedTrip"]
+__all__ = ["GenericJoinedTrip", "GenericTrip"]
 
 
 class JoinerComms(
-    Generic[GenericJoinedTrip],
-    ReliableComms[BasicRecord, GenericJoinedTrip | End | Start],
+    Generic[GenericJoinedTrip, GenericTrip],
+    ReliableComms[
+        BasicStation | BasicWeather | GenericTrip | BasicControlRecord,
+        GenericJoinedTrip | End | Start | TripFilter | StationNames,
+    ],
 ):
     config: Config
 
     def __init__(self, config: Config) -> None:
         self.config = config
-        super().__init__(config, duplicate_filter_config=config)
+        super().__init__(
+            config,
+            duplicate_filter_config=config,
+            out_serialization=config.out_serialization,
+        )
         HeartbeatSender(self, config).setup_timer()
 
+    @cached_property
+    def in_type(self) -> Any:
+        """
+        Packages are decoded as the parsers' out type instead of the records
+        this pipeline handles, so that any record they send can be decoded.
+        Only this pipeline's trips are routed to its queues.
+        """
+        return BasicRecord
+
     def _load_definitions(self) -> None:
         # in
         for id in range(1, self.config.host_count + 1):
@@ -32,9 +58,18 @@ class JoinerComms(
         others_queue = self.config.in_others_queue_format.format(host_id=self.id)
         self._start_consuming_from(others_queue)
 
+    def _get_out_type(self, exchange: str) -> Any:
+        # the trip filters are the only records sent to the parsers
+        if exchange == self.config.parsers_exchange:
+            return ParserRecord
+        joined_type = get_generic_types(self, JoinerComms)[0]
+        return JoinerRecord[joined_type]  # type: ignore
+
     def _get_routing_details(
-        self, msg: GenericJoinedTrip | End | Start
+        self, msg: GenericJoinedTrip | End | Start | TripFilter | StationNames
     ) -> tuple[str, str]:
+        if isinstance(msg, TripFilter):
+            return self.config.parsers_exchange, msg.get_routing_key()
         return self.config.out_exchange, msg.get_routing_key()
 
     def start_consuming_trips(self, job_id: str) -> None:
@@ -1,19 +1,26 @@
 from common.config_base import ConfigBase
+from common.comms_base import FilterMode, Serialization
 
 
 class Config(ConfigBase):
     name: str
     parsers_count: int
     prefetch_count: int
+    group_commit_messages: int
+    group_commit_millis: int
+    async_commit: bool
 
     in_exchange: str
     in_trips_queue_format: str
     in_others_queue_format: str
     in_others_queue_routing_keys: list[str]
     out_exchange: str
+    out_serialization: Serialization
     out_queues: dict[str, list[str]]  # queue -> routing keys
+    parsers_exchange: str
 
     host_count: int
+    duplicate_filter: FilterMode
     filters_exchange: str
     filters_routing_keys_format: list[str]
     filters_queue_format: str
@@ -23,6 +30,9 @@ class Config(ConfigBase):
         super().__init__(ConfigBase.subsection("joiners", name))
         self.parsers_count = self.get_int("PARSERS_SCALE")
         self.prefetch_count = self.get_int("PrefetchCount")
+        self.group_commit_messages = self.get_int("GroupCommitMessages")
+        self.group_commit_millis = self.get_int("GroupCommitMillis")
+        self.async_commit = self.get_bool("AsyncCommit")
 
         self.in_exchange = self.get("InExchange")
         self.in_trips_queue_format = self.get_named("InTripsQueueFormat")
@@ -31,11 +41,19 @@ class Config(ConfigBase):
         self.out_exchange = self.get("InExchangeFormat", section="aggregators").replace(
             "{name}", self.name
         )
+        self.out_serialization = Serialization(
+            self.get(
+                "InSerialization",
+                section=ConfigBase.subsection("aggregators", self.name),
+            )
+        )
         self.host_count = self.get_int(f"{name.upper()}_JOINERS_SCALE")
+        self.duplicate_filter = FilterMode(self.get("DuplicateFilter"))
         self.filters_exchange = self.get_named("FiltersExchangeFormat")
         self.filters_routing_keys_format = self.get_json("FiltersRoutingKeysFormat")
         self.filters_queue_format = self.get_named("FiltersQueueFormat")
         self.out_queues = self.__get_out_queues()
+        self.parsers_exchange = self.get("InExchange", section="parsers")
 
     def get_named(self, key: str) -> str:
         return super().get(key).replace("{name}", self.name)
@@ -2,29 +2,33 @@ import logging
 from typing import Callable, Generic
 
 from common.messages import Message
-from common.messages.basic import BasicRecord
+from common.messages.basic import (
+    BasicControlRecord,
+    BasicStation,
+    BasicWeather,
+)
 from common.job_tracker import JobTracker
 
 from .phases import Phase, Joiner
 from .phases.weather_stations import WeatherStationsPhase
-from .comms import JoinerComms, GenericJoinedTrip
+from .comms import JoinerComms, GenericJoinedTrip, GenericTrip
 from .config import Config
 
-JoinerFactory = Callable[[], Joiner[GenericJoinedTrip]]
+JoinerFactory = Callable[[], Joiner[GenericJoinedTrip, GenericTrip]]
 
 
-class JoinHandler(Generic[GenericJoinedTrip]):
-    comms: JoinerComms[GenericJoinedTrip]
+class JoinHandler(Generic[GenericJoinedTrip, GenericTrip]):
+    comms: JoinerComms[GenericJoinedTrip, GenericTrip]
     config: Config
-    jobs: dict[str, Phase[GenericJoinedTrip]]
-    joiner_factory: JoinerFactory[GenericJoinedTrip]
+    jobs: dict[str, Phase[GenericJoinedTrip, GenericTrip]]
+    joiner_factory: JoinerFactory[GenericJoinedTrip, GenericTrip]
     job_tracker: JobTracker
 
     def __init__(
         self,
         config: Config,
-        comms: JoinerComms[GenericJoinedTrip],
-        joiner_factory: JoinerFactory[GenericJoinedTrip],
+        comms: JoinerComms[GenericJoinedTrip, GenericTrip],
+        joiner_factory: JoinerFactory[GenericJoinedTrip, GenericTrip],
     ) -> None:
         self.comms = comms
         self.config = config
@@ -46,7 +50,10 @@ class JoinHandler(Generic[GenericJoinedTrip]):
     def cleanup(self) -> None:
         self.comms.close()
 
-    def handle_record(self, msg: Message[BasicRecord]) -> None:
+    def handle_record(
+        self,
+        msg: Message[BasicStation | BasicWeather | GenericTrip | BasicControlRecord],
+    ) -> None:
         if msg.job_id in self.job_tracker.state.completed:
             return
 
@@ -59,8 +66,8 @@ class JoinHandler(Generic[GenericJoinedTrip]):
         if msg.job_id in self.jobs:
             self.jobs[msg.job_id].store_state()
 
-    def __joiner(self, job_id: str) -> Phase[GenericJoinedTrip]:
-        return WeatherStationsPhase[GenericJoinedTrip](
+    def __joiner(self, job_id: str) -> Phase[GenericJoinedTrip, GenericTrip]:
+        return WeatherStationsPhase[GenericJoinedTrip, GenericTrip](
             self.comms,
             self.config,
             self.joiner_factory(),
@@ -1,36 +1,48 @@
 from abc import ABC, abstractmethod
 import logging
-from typing import Generic, Callable, Protocol
+from typing import Generic, Callable, Protocol, Sequence
 from dataclasses import dataclass
 
 from common.messages import End, TripsStart
 from common.messages.basic import (
     BasicStation,
-    BasicTrip,
     BasicWeather,
+    GenericTrip,
 )
 from common.messages.joined import GenericJoinedTrip, GenericJoinedTripCov
 from common.messages.basic import (
-    BasicTripHandler,
+    TripHandler,
     BasicWeatherHandler,
     BasicStationHandler,
 )
-from common.persistence import WithState, WithStateProtocol
+from common.persistence import WithState, WithStateProtocol, job_key
 
 from ..config import Config
 from ..comms import JoinerComms
 
-__all__ = ["GenericJoinedTrip"]
+__all__ = ["GenericJoinedTrip", "GenericTrip"]
 
 
 class Joiner(
     BasicStationHandler[None],
     BasicWeatherHandler[None],
-    BasicTripHandler[GenericJoinedTripCov | None],
+    TripHandler[GenericJoinedTripCov | None, GenericTrip],
     WithStateProtocol,
     Protocol,
 ):
-    ...
+    def trip_keys(self) -> Sequence[tuple[str, ...]]:
+        """
+        Returns the keys that trips can be joined with, once all the weather
+        & stations were received
+        """
+        ...
+
+    def station_names(self) -> list[str] | None:
+        """
+        Returns the names of the stations by id if the joined trips have
+        them, once all the weather & stations were received
+        """
+        ...
 
 
 @dataclass
@@ -41,18 +53,18 @@ class State:
     trips_phase: bool
 
 
-class Phase(ABC, Generic[GenericJoinedTrip], WithState[State]):
-    comms: JoinerComms[GenericJoinedTrip]
+class Phase(ABC, Generic[GenericJoinedTrip, GenericTrip], WithState[State]):
+    comms: JoinerComms[GenericJoinedTrip, GenericTrip]
     config: Config
-    joiner: Joiner[GenericJoinedTrip]
+    joiner: Joiner[GenericJoinedTrip, GenericTrip]
     job_id: str
     on_finish: Callable[[str], None]
 
     def __init__(
         self,
-        comms: JoinerComms[GenericJoinedTrip],
+        comms: JoinerComms[GenericJoinedTrip, GenericTrip],
         config: Config,
-        joiner: Joiner[GenericJoinedTrip],
+        joiner: Joiner[GenericJoinedTrip, GenericTrip],
         job_id: str,
         on_finish: Callable[[str], None],
         state: State | None = None,
@@ -65,22 +77,28 @@ class Phase(ABC, Generic[GenericJoinedTrip], WithState[State]):
         self.on_finish = on_finish
 
     @abstractmethod
-    def handle_weather(self, weather: BasicWeather) -> "Phase[GenericJoinedTrip]":
+    def handle_weather(
+        self, weather: BasicWeather
+    ) -> "Phase[GenericJoinedTrip, GenericTrip]":
         raise NotImplementedError()
 
     @abstractmethod
-    def handle_station(self, station: BasicStation) -> "Phase[GenericJoinedTrip]":
+    def handle_station(
+        self, station: BasicStation
+    ) -> "Phase[GenericJoinedTrip, GenericTrip]":
         raise NotImplementedError()
 
     @abstractmethod
-    def handle_trips_start(self, start: TripsStart) -> "Phase[GenericJoinedTrip]":
+    def handle_trips_start(
+        self, start: TripsStart
+    ) -> "Phase[GenericJoinedTrip, GenericTrip]":
         raise NotImplementedError()
 
     @abstractmethod
-    def handle_trip(self, trip: BasicTrip) -> "Phase[GenericJoinedTrip]":
+    def handle_trip(self, trip: GenericTrip) -> "Phase[GenericJoinedTrip, GenericTrip]":
         raise NotImplementedError()
 
-    def handle_end(self, end: End) -> "Phase[GenericJoinedTrip]":
+    def handle_end(self, end: End) -> "Phase[GenericJoinedTrip, GenericTrip]":
         if end.host is None:
             logging.warn("Received End without host id")
             return self
@@ -91,13 +109,13 @@ class Phase(ABC, Generic[GenericJoinedTrip], WithState[State]):
         )
         return self
 
-    def store_state(self) -> "Phase[GenericJoinedTrip]":
+    def store_state(self) -> "Phase[GenericJoinedTrip, GenericTrip]":
         self.store_to(self._control_store_key())
         self.joiner.store_to(self._joiner_store_key())
         return self
 
     def _control_store_key(self) -> str:
-        return f"control_{self.job_id}"
+        return job_key(self.job_id, "control")
 
     def _joiner_store_key(self) -> str:
-        return f"joiner_{self.job_id}"
+        return job_key(self.job_id, "joiner")
@@ -4,35 +4,42 @@ from typing import Generic
 from common.messages import End, TripsStart
 from common.messages.basic import (
     BasicStation,
-    BasicTrip,
     BasicWeather,
 )
 from common.persistence import StatePersistor
 
-from . import Phase, GenericJoinedTrip
+from . import Phase, GenericJoinedTrip, GenericTrip
 
 
-class TripsPhase(Phase[GenericJoinedTrip], Generic[GenericJoinedTrip]):
-    def handle_station(self, station: BasicStation) -> Phase[GenericJoinedTrip]:
+class TripsPhase(
+    Phase[GenericJoinedTrip, GenericTrip], Generic[GenericJoinedTrip, GenericTrip]
+):
+    def handle_station(
+        self, station: BasicStation
+    ) -> Phase[GenericJoinedTrip, GenericTrip]:
         self.__warn("Station")
         return self
 
-    def handle_weather(self, weather: BasicWeather) -> Phase[GenericJoinedTrip]:
+    def handle_weather(
+        self, weather: BasicWeather
+    ) -> Phase[GenericJoinedTrip, GenericTrip]:
         self.__warn("Weather")
         return self
 
-    def handle_trips_start(self, start: TripsStart) -> Phase[GenericJoinedTrip]:
+    def handle_trips_start(
+        self, start: TripsStart
+    ) -> Phase[GenericJoinedTrip, GenericTrip]:
         self.__warn(f"TripsStart (host id: {start.host})")
         return self
 
-    def handle_trip(self, trip: BasicTrip) -> Phase[GenericJoinedTrip]:
+    def handle_trip(self, trip: GenericTrip) -> Phase[GenericJoinedTrip, GenericTrip]:
         joined_trip = self.joiner.handle_trip(trip)
         if joined_trip is not None:
             self.comms.send(self.job_id, joined_trip)
         self.state.count += 1
         return self
 
-    def handle_end(self, end: End) -> Phase[GenericJoinedTrip]:
+    def handle_end(self, end: End) -> Phase[GenericJoinedTrip, GenericTrip]:
         super().handle_end(end)
         self.check_ends()
         return self
@@ -53,8 +60,7 @@ class TripsPhase(Phase[GenericJoinedTrip], Generic[GenericJoinedTrip]):
             f" node: {self.state.count}"
         )
         self.comms.stop_consuming_trips(self.job_id)
-        StatePersistor().remove(self._control_store_key())
-        StatePersistor().remove(self._joiner_store_key())
+        StatePersistor().remove_job(self.job_id)
         self.on_finish(self.job_id)
         self.comms.send(self.job_id, End(self.comms.id), force_msg_id=None)
 
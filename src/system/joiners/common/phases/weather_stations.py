@@ -4,30 +4,39 @@ from typing import Generic
 from common.messages import End, TripsStart, Start
 from common.messages.basic import (
     BasicStation,
-    BasicTrip,
     BasicWeather,
+    TripFilter,
 )
+from common.messages.joined import StationNames
 
-from . import Phase, GenericJoinedTrip
+from . import Phase, GenericJoinedTrip, GenericTrip
 from .trips import TripsPhase
 
 
-class WeatherStationsPhase(Phase[GenericJoinedTrip], Generic[GenericJoinedTrip]):
-    def handle_station(self, station: BasicStation) -> Phase[GenericJoinedTrip]:
+class WeatherStationsPhase(
+    Phase[GenericJoinedTrip, GenericTrip], Generic[GenericJoinedTrip, GenericTrip]
+):
+    def handle_station(
+        self, station: BasicStation
+    ) -> Phase[GenericJoinedTrip, GenericTrip]:
         self.joiner.handle_station(station)
         return self
 
-    def handle_weather(self, weather: BasicWeather) -> Phase[GenericJoinedTrip]:
+    def handle_weather(
+        self, weather: BasicWeather
+    ) -> Phase[GenericJoinedTrip, GenericTrip]:
         self.joiner.handle_weather(weather)
         return self
 
-    def handle_trips_start(self, start: TripsStart) -> Phase[GenericJoinedTrip]:
+    def handle_trips_start(
+        self, start: TripsStart
+    ) -> Phase[GenericJoinedTrip, GenericTrip]:
         if start.host is None:
             logging.warn("Received TripsStart without host id")
             return self
         return self.__handle_trips_start(start.host)
 
-    def __handle_trips_start(self, host: str) -> Phase[GenericJoinedTrip]:
+    def __handle_trips_start(self, host: str) -> Phase[GenericJoinedTrip, GenericTrip]:
         self.state.starts_received.add(host)
         logging.debug(
             f"Job {self.job_id} | Parser {host} finished sending weather &"
@@ -42,17 +51,30 @@ class WeatherStationsPhase(Phase[GenericJoinedTrip], Generic[GenericJoinedTrip])
         )
         self.state.trips_phase = True
         self.store_state()
-        self.comms.send(self.job_id, Start(self.comms.id), force_msg_id=None)
+        # committed with the trips phase at once, as it's not entered again
+        records: list[TripFilter | StationNames | Start] = [self.__trip_filter()]
+        station_names = self.joiner.station_names()
+        if station_names is not None:
+            records.append(StationNames(station_names))
+        records.append(Start(self.comms.id))
+        self.comms.send_all(self.job_id, records, force_msg_id=None)
         return self.__next_phase()
 
-    def handle_trip(self, trip: BasicTrip) -> Phase[GenericJoinedTrip]:
+    def __trip_filter(self) -> TripFilter:
+        keys = [list(x) for x in self.joiner.trip_keys()]
+        logging.info(
+            f"Job {self.job_id} | Sending the parsers a filter with {len(keys)} keys"
+        )
+        return TripFilter(self.config.name, keys)
+
+    def handle_trip(self, trip: GenericTrip) -> Phase[GenericJoinedTrip, GenericTrip]:
         logging.warn(
             f"Job {self.job_id} | Unexpected Trip received while receiving weather &"
             " stations"
         )
         return self
 
-    def handle_end(self, end: End) -> Phase[GenericJoinedTrip]:
+    def handle_end(self, end: End) -> Phase[GenericJoinedTrip, GenericTrip]:
         super().handle_end(end)
         logging.debug(
             f"Job {self.job_id} | Received End from parser {end.host} before all Starts"
@@ -65,7 +87,7 @@ class WeatherStationsPhase(Phase[GenericJoinedTrip], Generic[GenericJoinedTrip])
             return self.__handle_trips_start(end.host)
         return self
 
-    def restore_state(self) -> "Phase[GenericJoinedTrip]":
+    def restore_state(self) -> "Phase[GenericJoinedTrip, GenericTrip]":
         self.restore_from(self._control_store_key())
         self.joiner.restore_from(self._joiner_store_key())
 
@@ -73,7 +95,7 @@ class WeatherStationsPhase(Phase[GenericJoinedTrip], Generic[GenericJoinedTrip])
             return self.__next_phase()
         return self
 
-    def __next_phase(self) -> TripsPhase[GenericJoinedTrip]:
+    def __next_phase(self) -> TripsPhase[GenericJoinedTrip, GenericTrip]:
         self.comms.start_consuming_trips(self.job_id)
         phase = TripsPhase(
             self.comms,
@@ -0,0 +1,10 @@
+from typing import Iterable
+
+
+def station_ids(names: Iterable[str]) -> dict[str, int]:
+    """
+    Returns the id of each station name, its index once sorted. They're only
+    built once every station was received, so all the joiners of a pipeline
+    give the same ids to the same names. The dict is in the order of the ids.
+    """
+    return {name: i for i, name in enumerate(sorted(set(names)))}
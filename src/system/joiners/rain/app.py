@@ -1,7 +1,9 @@
 import logging
 from shared.log import setup_logs
 
+from common.messages.basic import RainTrip
 from common.messages.joined import JoinedRainTrip
+from common.persistence import setup_durability
 from common.util import process_loop
 
 from ..common.comms import JoinerComms
@@ -12,10 +14,13 @@ from .config import Config
 
 def main() -> None:
     setup_logs(Config().log_level)
+    setup_durability(Config().durability, Config().durability_fsync_millis)
 
     process_loop(
-        lambda: JoinHandler[JoinedRainTrip](
-            Config(), JoinerComms[JoinedRainTrip](Config()), lambda: RainJoiner()
+        lambda: JoinHandler[JoinedRainTrip, RainTrip](
+            Config(),
+            JoinerComms[JoinedRainTrip, RainTrip](Config()),
+            lambda: RainJoiner(),
         )
     )
     logging.info("Exiting gracefully")
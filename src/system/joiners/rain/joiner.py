@@ -1,8 +1,9 @@
+from datetime import date
 import logging
 
-from common.messages.basic import BasicStation, BasicTrip, BasicWeather
+from common.messages.basic import BasicStation, BasicWeather, RainTrip
 from common.messages.joined import JoinedRainTrip
-from common.persistence import WithStateAppended
+from common.persistence import WithStateMapped
 
 from .config import Config
 
@@ -11,22 +12,32 @@ Key = tuple[str, str]
 Value = float
 
 
-class RainJoiner(WithStateAppended[Key, Value]):
+class RainJoiner(WithStateMapped[Key, Value]):
+    value_format = "d"
+
     def handle_station(self, station: BasicStation) -> None:
         logging.warn("Unexpected Station received on rain joiner")
 
     def handle_weather(self, weather: BasicWeather) -> None:
         self.set((weather.city, weather.date), weather.precipitation)
 
-    def handle_trip(self, trip: BasicTrip) -> JoinedRainTrip | None:
+    def handle_trip(self, trip: RainTrip) -> JoinedRainTrip | None:
         precipitation = self._get_join_data(trip)
         if precipitation is None or precipitation <= Config().precipitation_threshold:
             return None
 
-        return JoinedRainTrip(trip.start_date, trip.duration_sec)
+        start_day = date.fromisoformat(trip.start_date).toordinal()
+        return JoinedRainTrip(start_day, trip.duration_sec)
+
+    def trip_keys(self) -> list[Key]:
+        threshold = Config().precipitation_threshold
+        return [key for key, precipitation in self.items() if precipitation > threshold]
+
+    def station_names(self) -> None:
+        return None
 
-    def _get_join_data(self, trip: BasicTrip) -> float | None:
-        weather = self.state.get((trip.city, trip.start_date), None)
+    def _get_join_data(self, trip: RainTrip) -> float | None:
+        weather = self.get((trip.city, trip.start_date))
         if weather is None:
             logging.debug(f"Missing weather for date {trip.start_date} ({trip.city})")
             return None
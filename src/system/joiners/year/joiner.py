@@ -1,30 +1,52 @@
 import logging
 
-from common.messages.basic import BasicStation, BasicTrip, BasicWeather
+from common.messages.basic import BasicStation, BasicWeather, YearTrip
 from common.messages.joined import JoinedYearTrip
-from common.persistence import WithStateAppended
+from common.persistence import WithStateMapped
+
+from ..common.station_ids import station_ids
 
 # (city, code, year) -> name
 Key = tuple[str, str, str]
 Value = str
 
 
-class YearJoiner(WithStateAppended[Key, Value]):
+class YearJoiner(WithStateMapped[Key, Value]):
+    value_format = "s"
+    # station name -> id, built on the first trip
+    station_ids: dict[str, int] | None
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.station_ids = None
+
     def handle_station(self, station: BasicStation) -> None:
         self.set((station.city, station.code, station.year), station.name)
 
     def handle_weather(self, weather: BasicWeather) -> None:
         logging.warn("Unexpected Weather received on year joiner")
 
-    def handle_trip(self, trip: BasicTrip) -> JoinedYearTrip | None:
+    def handle_trip(self, trip: YearTrip) -> JoinedYearTrip | None:
         name = self._get_join_data(trip)
         if name is None:
             return None
 
-        return JoinedYearTrip(name, trip.year)
+        return JoinedYearTrip(self.__station_id(name), trip.year)
+
+    def trip_keys(self) -> list[Key]:
+        return [key for key, _ in self.items()]
+
+    def station_names(self) -> list[str]:
+        self.station_ids = station_ids(name for _, name in self.items())
+        return list(self.station_ids)
+
+    def __station_id(self, name: str) -> int:
+        if self.station_ids is None:
+            self.station_names()
+        return self.station_ids[name]  # type: ignore
 
-    def _get_join_data(self, trip: BasicTrip) -> str | None:
-        name = self.state.get((trip.city, trip.start_station_code, trip.year), None)
+    def _get_join_data(self, trip: YearTrip) -> str | None:
+        name = self.get((trip.city, trip.start_station_code, trip.year))
         if name is None:
             logging.debug(
                 f"Missing station name for code {trip.start_station_code}, year"
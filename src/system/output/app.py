@@ -2,6 +2,7 @@ import logging
 import zmq
 
 from shared.log import setup_logs
+from common.persistence import setup_durability
 from common.util import process_loop
 
 from .stats import StatsStorage
@@ -36,6 +37,7 @@ class Runner:
 def main() -> None:
     config = Config()
     setup_logs(config.log_level)
+    setup_durability(config.durability, config.durability_fsync_millis)
 
     process_loop(lambda: Runner())
 
@@ -1,3 +1,5 @@
+from pika import BasicProperties
+
 from common.comms_base import SystemCommunicationBase, ReliableReceive, HeartbeatSender
 from common.messages.stats import StatsRecord
 from common.persistence import StatePersistor
@@ -15,7 +17,12 @@ class SystemCommunication(ReliableReceive[StatsRecord], SystemCommunicationBase)
         self._start_consuming_from(Config().in_queue)
 
     def _process_message(
-        self, message: str, queue: str, delivery_tag: int | None, redelivered: bool
+        self,
+        body: bytes,
+        properties: BasicProperties,
+        queue: str,
+        delivery_tag: int | None,
+        redelivered: bool,
     ) -> None:
-        super()._process_message(message, queue, delivery_tag, redelivered)
+        super()._process_message(body, properties, queue, delivery_tag, redelivered)
         StatePersistor().save()
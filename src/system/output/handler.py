@@ -84,7 +84,7 @@ class ClientHandlerInternal:
         requested or by adding him to the list of clients waiting for that stat
         """
         msg: ClientMessage[GetStat] = deserialize(
-            ClientMessage[GetStat], self.clients_socket.recv_string()
+            ClientMessage[GetStat], self.clients_socket.recv()
         )
         stat = self.stats.get(msg.job_id, msg.payload.stat_type)
         log = f"Job {msg.job_id} | Received request for stat {msg.payload.stat_type}"
@@ -5,19 +5,13 @@ from common.messages.stats import (
     StatType,
     StatsRecord,
 )
-from common.persistence import WithState
+from common.persistence import WithStateIncremental
 
 
 # job_id -> stat_type -> stat
-Stats = dict[str, dict[StatType, Stat]]
-
-
-class StatsStorage(WithState[Stats]):
+class StatsStorage(WithStateIncremental[str, dict[StatType, Stat]]):
     lock: Lock = Lock()
 
-    def __init__(self) -> None:
-        super().__init__({})
-
     def store(self, job_id: str, stat: StatsRecord) -> None:
         with self.lock:
             stats = self.state.setdefault(job_id, {})
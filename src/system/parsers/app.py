@@ -1,17 +1,23 @@
 import logging
 
 from shared.log import setup_logs
+from common.persistence import setup_durability
 from common.util import process_loop
 
 from .config import Config
 from .parse_handler import ParseHandler
+from .parse_pool import ParsePool
 from .comms import SystemCommunication
 
 
 def main() -> None:
     setup_logs(Config().log_level)
+    setup_durability(Config().durability, Config().durability_fsync_millis)
 
-    process_loop(lambda: ParseHandler(SystemCommunication()))
+    # forked before connecting, and kept across restarts of the process loop
+    pool = ParsePool(Config().parse_workers)
+    process_loop(lambda: ParseHandler(SystemCommunication(), pool))
+    pool.close()
     logging.info("Exiting gracefully")
 
 
@@ -1,15 +1,19 @@
 from typing import Callable
 
 from common.comms_base import ReliableComms, setup_job_queues, HeartbeatSender
-from common.messages.raw import RawRecord
+from common.messages.raw import ParserRecord
 from common.messages.basic import BasicRecord
 
 from .config import Config
 
 
-class SystemCommunication(ReliableComms[RawRecord, BasicRecord]):
+class SystemCommunication(ReliableComms[ParserRecord, BasicRecord]):
     def __init__(self) -> None:
-        super().__init__(Config(), duplicate_filter_config=Config())
+        super().__init__(
+            Config(),
+            duplicate_filter_config=Config(),
+            out_serialization=Config().out_serialization,
+        )
         HeartbeatSender(self, Config()).setup_timer()
 
     def _load_definitions(self) -> None:
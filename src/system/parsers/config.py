@@ -1,10 +1,17 @@
 from common.config_base import ConfigBase
+from common.comms_base import FilterMode, Serialization
 from common.util import singleton
 
+from .parse import TRIP_PROJECTIONS
+
 
 @singleton
 class Config(ConfigBase):
     prefetch_count: int
+    group_commit_messages: int
+    group_commit_millis: int
+    async_commit: bool
+    parse_workers: int
 
     in_exchange: str
     in_trip_lines_format: str
@@ -12,9 +19,12 @@ class Config(ConfigBase):
     in_others_queue_format: str
     in_others_queue_routing_keys: list[str]
     out_exchange: str
+    out_serialization: Serialization
     out_queues_format: dict[str, list[str]]  # queue -> routing keys
+    trip_pipelines: list[str]
 
     host_count: int
+    duplicate_filter: FilterMode
     filters_exchange: str
     filters_routing_keys_format: list[str]
     filters_queue_format: str
@@ -22,6 +32,10 @@ class Config(ConfigBase):
     def __init__(self) -> None:
         super().__init__("parsers")
         self.prefetch_count = self.get_int("PrefetchCount")
+        self.group_commit_messages = self.get_int("GroupCommitMessages")
+        self.group_commit_millis = self.get_int("GroupCommitMillis")
+        self.async_commit = self.get_bool("AsyncCommit")
+        self.parse_workers = self.get_int("ParseWorkers")
         self.in_exchange = self.get("InExchange")
         self.in_trip_lines_format = self.get("InTripLinesQueueFormat")
         self.in_weather_station_lines_format = self.get(
@@ -30,11 +44,23 @@ class Config(ConfigBase):
         self.in_others_queue_format = self.get("InOthersQueueFormat")
         self.in_others_queue_routing_keys = self.get_json("InOthersQueueRoutingKeys")
         self.out_exchange = self.get("InExchange", section="joiners")
+        self.out_serialization = Serialization(
+            self.get("InSerialization", section="joiners")
+        )
         self.host_count = self.get_int("PARSERS_SCALE")
+        self.duplicate_filter = FilterMode(self.get("DuplicateFilter"))
         self.filters_exchange = self.get("FiltersExchange")
         self.filters_routing_keys_format = self.get_json("FiltersRoutingKeysFormat")
         self.filters_queue_format = self.get("FiltersQueueFormat")
         self.out_queues_format = self.__get_out_queues("joiners")
+        self.trip_pipelines = self.__get_trip_pipelines("joiners")
+
+    def __get_trip_pipelines(self, next_section: str) -> list[str]:
+        pipelines = self.get_subsections(next_section)
+        unknown = [x for x in pipelines if x not in TRIP_PROJECTIONS]
+        if len(unknown) > 0:
+            raise ValueError(f"No trip projection for the pipelines {unknown}")
+        return pipelines
 
     def __get_out_queues(self, next_section: str) -> dict[str, list[str]]:
         out_queues = {}
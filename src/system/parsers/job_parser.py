@@ -1,15 +1,33 @@
 from dataclasses import dataclass
 import logging
-from typing import Callable
+from itertools import chain
+from typing import Callable, Iterable
 
-from common.messages import End, TripsStart, Start
-from common.messages.basic import BasicRecord
+from common.messages import End, RecordType, TripsStart, Start
+from common.messages.basic import BasicRecord, BasicStation, BasicWeather, TripFilter
 from common.messages.raw import RawLines, RawRecord
 
-from common.persistence import WithState, StatePersistor
-
-from .parse import get_indexes, get_rows, parse_trip, parse_station, parse_weather
+from common.persistence import WithState, StatePersistor, job_key
+
+from .parse import (
+    STATION_COLUMNS,
+    TRIP_COLUMNS,
+    TRIP_PROJECTIONS,
+    WEATHER_COLUMNS,
+    Columns,
+    ColumnsGetter,
+    ColumnsParser,
+    columns_getter,
+    filter_trips,
+    make_records,
+    project_trips,
+    station_columns,
+    trip_columns,
+    weather_columns,
+)
+from .parse_pool import ParsePool
 from .comms import SystemCommunication
+from .config import Config
 
 
 @dataclass
@@ -22,23 +40,36 @@ class State:
 
 class JobParser(WithState[State]):
     comms: SystemCommunication
+    pool: ParsePool
     job_id: str
     on_finish: Callable[["JobParser"], None]
+    # (record type, city) -> header of its lines and the getter of its columns
+    getters: dict[tuple[RecordType, str], tuple[str, ColumnsGetter]]
+    # pipeline -> keys its joiners can join trips with, once they sent them
+    trip_filters: dict[str, set[tuple[str, ...]]]
 
     def __init__(
         self,
         comms: SystemCommunication,
+        pool: ParsePool,
         job_id: str,
         on_finish: Callable[["JobParser"], None],
     ) -> None:
         super().__init__(State())
         self.comms = comms
+        self.pool = pool
         self.job_id = job_id
         self.on_finish = on_finish
+        self.getters = {}
+        self.trip_filters = {}
         self.restore_state()
 
     def restore_state(self) -> None:
-        self.restore_from(self.job_id)
+        self.restore_from(self._store_key())
+        for pipeline in Config().trip_pipelines:
+            keys = StatePersistor().load(self.__filter_key(pipeline), list[list[str]])
+            if keys is not None:
+                self.trip_filters[pipeline] = {tuple(x) for x in keys}
         self.__status_changed()
 
     def __status_changed(self) -> None:
@@ -64,7 +95,7 @@ class JobParser(WithState[State]):
             self.comms.set_all_trip_lines_done_callback(self.job_id, self.__finished)
 
     def store_state(self) -> None:
-        self.store_to(self.job_id)
+        self.store_to(self._store_key())
 
     def handle_start(self, start: Start) -> None:
         pass
@@ -87,15 +118,56 @@ class JobParser(WithState[State]):
         self.comms.send(self.job_id, TripsStart(self.comms.id), force_msg_id=None)
 
     def handle_station_lines(self, batch: RawLines) -> None:
-        self.__send_parsed(batch, parse_station)
+        self.__send_parsed(
+            batch,
+            STATION_COLUMNS,
+            station_columns,
+            lambda parsed: make_records(BasicStation, parsed),
+        )
 
     def handle_weather_lines(self, batch: RawLines) -> None:
-        self.__send_parsed(batch, parse_weather)
+        self.__send_parsed(
+            batch,
+            WEATHER_COLUMNS,
+            weather_columns,
+            lambda parsed: make_records(BasicWeather, parsed),
+        )
 
     def handle_trip_lines(self, batch: RawLines) -> None:
-        self.__send_parsed(batch, parse_trip)
+        self.__send_parsed(batch, TRIP_COLUMNS, trip_columns, self.__project_trips)
         self.state.count += len(batch.lines)
 
+    def __project_trips(self, parsed: Columns) -> Iterable[BasicRecord]:
+        """
+        Builds the trips for each pipeline, with only the fields its joiners use
+        and only the ones they can join if they sent their filter
+        """
+        return chain.from_iterable(
+            self.__project_pipeline_trips(parsed, x) for x in Config().trip_pipelines
+        )
+
+    def __project_pipeline_trips(
+        self, parsed: Columns, pipeline: str
+    ) -> list[BasicRecord]:
+        record_type = TRIP_PROJECTIONS[pipeline]
+        projected = project_trips(parsed, record_type)
+        keys = self.trip_filters.get(pipeline)
+        if keys is not None:
+            projected = filter_trips(projected, record_type, keys)
+        return make_records(record_type, projected)
+
+    def handle_trip_filter(self, trip_filter: TripFilter) -> None:
+        if trip_filter.pipeline in self.trip_filters:
+            return  # sent by every joiner of the pipeline
+        logging.info(
+            f"Job {self.job_id} | Received the {trip_filter.pipeline} trips filter,"
+            f" with {len(trip_filter.keys)} keys"
+        )
+        self.trip_filters[trip_filter.pipeline] = {tuple(x) for x in trip_filter.keys}
+        StatePersistor().store(
+            self.__filter_key(trip_filter.pipeline), trip_filter.keys
+        )
+
     def handle_end(self, end: End) -> None:
         if self.state.received_end:
             return  # probably a redelivery
@@ -108,7 +180,7 @@ class JobParser(WithState[State]):
             f" node: {self.state.count}. Sending End"
         )
         self.comms.stop_consuming_trip_lines(self.job_id)
-        StatePersistor().remove(self.job_id)
+        StatePersistor().remove_job(self.job_id)
         self.on_finish(self)
         self.comms.send(self.job_id, End(self.comms.id), force_msg_id=None)
 
@@ -118,16 +190,34 @@ class JobParser(WithState[State]):
     def __send_parsed(
         self,
         batch: RawLines,
-        parse_func: Callable[[list[str], dict[str, int], str], BasicRecord],
+        columns: tuple[str, ...],
+        parse_columns: ColumnsParser,
+        make: Callable[[Columns], Iterable[BasicRecord]],
     ) -> None:
-        indexes = get_indexes(batch)
-        rows = get_rows(batch)
-        for row in rows:
-            if self.comms.is_stopped():
-                logging.debug(
-                    f"Job {self.job_id} | Parser was stopped, skipping remaining"
-                    " records"
-                )
-                break
-            msg = parse_func(row, indexes, batch.city)
-            self.comms.send(self.job_id, msg)
+        if self.comms.is_stopped():
+            logging.debug(
+                f"Job {self.job_id} | Parser was stopped, skipping remaining records"
+            )
+            return
+        getter = self.__getter(batch, columns)
+        parsed = self.pool.parse(parse_columns, batch.lines, getter, batch.city)
+        self.comms.send_all(self.job_id, make(parsed))
+
+    def __getter(self, batch: RawLines, columns: tuple[str, ...]) -> ColumnsGetter:
+        """
+        Returns the getter of the columns for the batch's header, built once
+        for each record type and city
+        """
+        key = (batch.record_type, batch.city)
+        cached = self.getters.get(key)
+        if cached is not None and cached[0] == batch.columns:
+            return cached[1]
+        getter = columns_getter(batch.columns, columns)
+        self.getters[key] = (batch.columns, getter)
+        return getter
+
+    def _store_key(self) -> str:
+        return job_key(self.job_id, "parser")
+
+    def __filter_key(self, pipeline: str) -> str:
+        return job_key(self.job_id, f"trip_filter_{pipeline}")
@@ -1,11 +1,48 @@
-from typing import Iterable
+from dataclasses import fields
+from itertools import compress, repeat
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Sequence, TypeVar
 from datetime import date, timedelta
 
-from common.messages.basic import BasicStation, BasicTrip, BasicWeather
-from common.messages.raw import RawLines
+from common.messages.basic import CityTrip, ProjectedTrip, RainTrip, YearTrip
 
+T = TypeVar("T")
 SPLIT_CHAR = ","
 
+# Columns read by each parser, in the order it receives them
+STATION_COLUMNS = ("code", "name", "latitude", "longitude", "yearid")
+TRIP_COLUMNS = (
+    "start_date",
+    "duration_sec",
+    "start_station_code",
+    "end_station_code",
+    "yearid",
+)
+WEATHER_COLUMNS = ("date", "prectot")
+
+# pipeline -> trips with the fields its joiners use
+TRIP_PROJECTIONS: dict[str, type[ProjectedTrip]] = {
+    "rain": RainTrip,
+    "year": YearTrip,
+    "city": CityTrip,
+}
+# Fields of the columns returned by trip_columns(), projected for each pipeline
+TRIP_FIELDS = [
+    "start_date",
+    "duration_sec",
+    "city",
+    "start_station_code",
+    "end_station_code",
+    "year",
+]
+
+# Picks the columns of a parser from a split line
+ColumnsGetter = Callable[[list[str]], tuple[str, ...]]
+# Values of each field of the parsed records, in the order of their fields
+Columns = list[Sequence[Any]]
+# Parses a batch of lines into the Columns of its records
+ColumnsParser = Callable[[list[str], ColumnsGetter, str], Columns]
+
 
 def parse_optional_float(value: str) -> float | None:
     if value == "":
@@ -13,41 +50,88 @@ def parse_optional_float(value: str) -> float | None:
     return float(value)
 
 
-def get_indexes(batch: RawLines) -> dict[str, int]:
-    return {x: i for i, x in enumerate(batch.columns.split(SPLIT_CHAR))}
+def get_indexes(columns: str) -> dict[str, int]:
+    return {x: i for i, x in enumerate(columns.split(SPLIT_CHAR))}
 
 
-def get_rows(batch: RawLines) -> Iterable[list[str]]:
-    return (x.split(SPLIT_CHAR) for x in batch.lines)
+def columns_getter(columns: str, names: tuple[str, ...]) -> ColumnsGetter:
+    """
+    Returns a function that picks the named columns from a line split with the
+    given header
+    """
+    indexes = get_indexes(columns)
+    return itemgetter(*(indexes[name] for name in names))
 
 
-def parse_station(row: list[str], indexes: dict[str, int], city: str) -> BasicStation:
-    return BasicStation(
-        code=row[indexes["code"]],
-        name=row[indexes["name"]],
-        latitude=parse_optional_float(row[indexes["latitude"]]),
-        longitude=parse_optional_float(row[indexes["longitude"]]),
-        year=row[indexes["yearid"]],
-        city=city,
-    )
+def get_columns(
+    lines: list[str], getter: ColumnsGetter, count: int
+) -> list[tuple[str, ...]]:
+    """
+    Splits the lines and returns each of the count columns picked by the getter
+    """
+    columns = list(zip(*map(getter, (x.split(SPLIT_CHAR) for x in lines))))
+    return columns or [()] * count
 
 
-def parse_trip(row: list[str], indexes: dict[str, int], city: str) -> BasicTrip:
-    start_date = row[indexes["start_date"]].split(" ")[0]
-    return BasicTrip(
-        start_date=start_date,
-        duration_sec=max(float(row[indexes["duration_sec"]]), 0),
-        city=city,
-        start_station_code=row[indexes["start_station_code"]],
-        end_station_code=row[indexes["end_station_code"]],
-        year=row[indexes["yearid"]],
+def station_columns(lines: list[str], getter: ColumnsGetter, city: str) -> Columns:
+    code, name, latitude, longitude, year = get_columns(
+        lines, getter, len(STATION_COLUMNS)
     )
+    return [
+        code,
+        name,
+        [parse_optional_float(x) for x in latitude],
+        [parse_optional_float(x) for x in longitude],
+        year,
+        [city] * len(lines),
+    ]
 
 
-def parse_weather(row: list[str], indexes: dict[str, int], city: str) -> BasicWeather:
-    day_minus_1 = date.fromisoformat(row[indexes["date"]]) - timedelta(days=1)
-    return BasicWeather(
-        date=day_minus_1.isoformat(),
-        precipitation=float(row[indexes["prectot"]]),
-        city=city,
+def trip_columns(lines: list[str], getter: ColumnsGetter, city: str) -> Columns:
+    start_date, duration_sec, start_station_code, end_station_code, year = get_columns(
+        lines, getter, len(TRIP_COLUMNS)
     )
+    return [
+        [x.split(" ", 1)[0] for x in start_date],
+        [max(float(x), 0) for x in duration_sec],
+        [city] * len(lines),
+        start_station_code,
+        end_station_code,
+        year,
+    ]
+
+
+def weather_columns(lines: list[str], getter: ColumnsGetter, city: str) -> Columns:
+    day, precipitation = get_columns(lines, getter, len(WEATHER_COLUMNS))
+    one_day = timedelta(days=1)
+    return [
+        [(date.fromisoformat(x) - one_day).isoformat() for x in day],
+        list(map(float, precipitation)),
+        [city] * len(lines),
+    ]
+
+
+def make_records(record_type: Callable[..., T], columns: Columns) -> list[T]:
+    return list(map(record_type, *columns))
+
+
+def project_trips(columns: Columns, record_type: type[ProjectedTrip]) -> Columns:
+    """
+    Picks the columns of the fields of the projected trip from the columns
+    of every trip field
+    """
+    return [columns[TRIP_FIELDS.index(x.name)] for x in fields(record_type)]
+
+
+def filter_trips(
+    columns: Columns, record_type: type[ProjectedTrip], keys: set[tuple[str, ...]]
+) -> Columns:
+    """
+    Keeps the projected trips whose join keys are all in the given keys
+    """
+    names = [x.name for x in fields(record_type)]
+    keep: Iterable[bool] = repeat(True)
+    for key_fields in record_type.join_keys:
+        key_columns = [columns[names.index(x)] for x in key_fields]
+        keep = [k and key in keys for k, key in zip(keep, zip(*key_columns))]
+    return [list(compress(column, keep)) for column in columns]
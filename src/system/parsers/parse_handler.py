@@ -1,20 +1,23 @@
 import logging
 
 from common.messages import Message
-from common.messages.raw import RawRecord
+from common.messages.raw import ParserRecord
 from common.job_tracker import JobTracker
 
 from .comms import SystemCommunication
 from .job_parser import JobParser
+from .parse_pool import ParsePool
 
 
 class ParseHandler:
     comms: SystemCommunication
+    pool: ParsePool
     jobs: dict[str, JobParser]
     job_tracker: JobTracker
 
-    def __init__(self, comms: SystemCommunication) -> None:
+    def __init__(self, comms: SystemCommunication, pool: ParsePool) -> None:
         self.comms = comms
+        self.pool = pool
         self.jobs = {}
         self.job_tracker = JobTracker()
         self.job_tracker.restore(self.jobs, self.__parser)
@@ -32,7 +35,7 @@ class ParseHandler:
         self.job_tracker.finished_job(job.job_id)
         self.comms.finished_job(job.job_id)
 
-    def handle_record(self, msg: Message[RawRecord]) -> None:
+    def handle_record(self, msg: Message[ParserRecord]) -> None:
         if msg.job_id in self.job_tracker.state.completed:
             return
 
@@ -47,4 +50,4 @@ class ParseHandler:
             self.jobs[msg.job_id].store_state()
 
     def __parser(self, job_id: str) -> JobParser:
-        return JobParser(self.comms, job_id, self.finished)
+        return JobParser(self.comms, self.pool, job_id, self.finished)
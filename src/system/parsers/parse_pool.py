@@ -0,0 +1,54 @@
+from itertools import chain
+import multiprocessing
+from multiprocessing.pool import Pool
+
+from .parse import Columns, ColumnsGetter, ColumnsParser
+
+# batches are only split in chunks of at least this many lines
+MIN_CHUNK_LINES = 1000
+
+
+class ParsePool:
+    """
+    Parses batches of lines in a pool of worker processes, so that a parser
+    can use more than one core. Each batch is split in one chunk per worker,
+    and their columns are joined in the same order as the lines. Columns are
+    returned instead of records as they're much cheaper to send between
+    processes. The batch is still handled within its message, so its records
+    are sent in the same package as when parsing it in the consumer process.
+
+    With 0 workers, batches are parsed in the calling process. The workers
+    are forked, so the pool must be created before connecting to RabbitMQ.
+    """
+
+    workers: int
+    pool: Pool | None
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.pool = None
+        if workers > 0:
+            self.pool = multiprocessing.get_context("fork").Pool(workers)
+
+    def parse(
+        self,
+        parse_columns: ColumnsParser,
+        lines: list[str],
+        getter: ColumnsGetter,
+        city: str,
+    ) -> Columns:
+        chunks = min(self.workers, len(lines) // MIN_CHUNK_LINES)
+        if self.pool is None or chunks <= 1:
+            return parse_columns(lines, getter, city)
+
+        size = -(-len(lines) // chunks)
+        parsed = self.pool.starmap(
+            parse_columns,
+            ((lines[i : i + size], getter, city) for i in range(0, len(lines), size)),
+        )
+        return [list(chain.from_iterable(column)) for column in zip(*parsed)]
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
@@ -2,6 +2,7 @@ import logging
 from shared.log import setup_logs
 
 from common.messages.aggregated import PartialCityAverages
+from common.persistence import setup_durability
 from common.util import process_loop
 
 from ..common.reduction_handler import ReductionHandler
@@ -12,6 +13,7 @@ from .reducer import CityReducer
 
 def main() -> None:
     setup_logs(Config().log_level)
+    setup_durability(Config().durability, Config().durability_fsync_millis)
 
     process_loop(
         lambda: ReductionHandler[PartialCityAverages](
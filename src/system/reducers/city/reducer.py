@@ -1,15 +1,13 @@
 from common.messages.aggregated import PartialCityAverages, StationInfo
 from common.messages.stats import CityAverages, StatsRecord
-from common.persistence import WithState
+from common.persistence import WithStateIncremental
 
 from .config import Config
 
-Averages = dict[str, StationInfo]  # station name -> info
 
-
-class CityReducer(WithState[Averages]):
-    def __init__(self) -> None:
-        super().__init__({})
+# station id -> info
+class CityReducer(WithStateIncremental[int, StationInfo]):
+    uses_station_names = True
 
     def handle_aggregated(self, avg: PartialCityAverages) -> None:
         for station, station_average in avg.distance_averages.items():
@@ -25,9 +23,9 @@ class CityReducer(WithState[Averages]):
             )
             current.count = total_count
 
-    def get_value(self) -> StatsRecord:
+    def get_value(self, station_names: list[str]) -> StatsRecord:
         result = {}
-        for name, average in self.state.items():
+        for station, average in self.state.items():
             if average.average_distance >= Config().min_distance_km:
-                result[name] = average.average_distance
+                result[station_names[station]] = average.average_distance
         return CityAverages(result)
@@ -3,6 +3,7 @@ from typing import Generic
 from common.comms_base import ReliableComms, HeartbeatSender
 from common.messages import End
 from common.messages.aggregated import GenericAggregatedRecord
+from common.messages.joined import StationNames
 from common.messages.stats import StatsRecord
 
 from .config import Config
@@ -10,13 +11,17 @@ from .config import Config
 
 class ReducerComms(
     Generic[GenericAggregatedRecord],
-    ReliableComms[GenericAggregatedRecord | End, StatsRecord],
+    ReliableComms[GenericAggregatedRecord | End | StationNames, StatsRecord],
 ):
     config: Config
 
     def __init__(self, config: Config) -> None:
         self.config = config
-        super().__init__(config, add_job_id_to_routing_key=False)
+        super().__init__(
+            config,
+            add_job_id_to_routing_key=False,
+            out_serialization=config.out_serialization,
+        )
         HeartbeatSender(self, config).setup_timer()
 
     def _load_definitions(self) -> None:
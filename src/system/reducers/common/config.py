@@ -1,23 +1,34 @@
 from common.config_base import ConfigBase
+from common.comms_base import Serialization
 
 
 class Config(ConfigBase):
     name: str
     aggregators_count: int
     prefetch_count: int
+    group_commit_messages: int
+    group_commit_millis: int
+    async_commit: bool
 
     in_exchange: str
     in_queue: str
     out_exchange: str
     out_queue: str
+    out_serialization: Serialization
 
     def __init__(self, name: str) -> None:
         super().__init__(f"reducers.{name}")
         self.aggregators_count = self.get_int(f"{name.upper()}_AGGREGATORS_SCALE")
         self.prefetch_count = self.get_int("PrefetchCount")
+        self.group_commit_messages = self.get_int("GroupCommitMessages")
+        self.group_commit_millis = self.get_int("GroupCommitMillis")
+        self.async_commit = self.get_bool("AsyncCommit")
         self.name = name
 
         self.in_exchange = self.get("InExchange")
         self.in_queue = self.get("InQueueFormat").replace("{name}", self.name)
         self.out_exchange = self.get("InExchange", section="output")
         self.out_queue = self.get("InQueue", section="output")
+        self.out_serialization = Serialization(
+            self.get("InSerialization", section="output")
+        )
@@ -7,17 +7,21 @@ from common.messages.aggregated import (
 )
 from common.messages.stats import StatsRecord
 from common.messages import End
-from common.persistence import WithState, WithStateProtocol, StatePersistor
+from common.messages.joined import StationNames
+from common.persistence import WithState, WithStateProtocol, StatePersistor, job_key
 
 from .config import Config
 from .comms import ReducerComms
 
 
 class Reducer(WithStateProtocol, Protocol[GenericAggregatedRecord]):
+    # whether get_value() needs the names of the station ids
+    uses_station_names: bool
+
     def handle_aggregated(self, aggregated: GenericAggregatedRecord) -> None:
         ...
 
-    def get_value(self) -> StatsRecord:
+    def get_value(self, station_names: list[str]) -> StatsRecord:
         ...
 
 
@@ -31,6 +35,8 @@ class JobReducer(Generic[GenericAggregatedRecord], WithState[State]):
     config: Config
     reducer: Reducer[GenericAggregatedRecord]
     job_id: str
+    # names of the station ids sent by the joiners, for the final result
+    station_names: list[str] | None
     on_finish: Callable[["JobReducer[GenericAggregatedRecord]"], None]
 
     def __init__(
@@ -46,11 +52,21 @@ class JobReducer(Generic[GenericAggregatedRecord], WithState[State]):
         self.reducer = reducer
         self.config = config
         self.job_id = job_id
+        self.station_names = None
         self.on_finish = on_finish
 
     def handle_aggregated(self, aggregated: GenericAggregatedRecord) -> None:
         self.reducer.handle_aggregated(aggregated)
 
+    def handle_station_names(self, station_names: StationNames) -> None:
+        # forwarded once per job by the first aggregator, but it may be resent
+        # if it restarts before committing that it did
+        if self.station_names is not None:
+            return
+        self.station_names = station_names.names
+        StatePersistor().store(self._station_names_key(), station_names.names)
+        self.__check_finished()
+
     def handle_end(self, end: End) -> None:
         if end.host is None:
             logging.warn(f"Job {self.job_id} | Received End without host id")
@@ -60,13 +76,25 @@ class JobReducer(Generic[GenericAggregatedRecord], WithState[State]):
             f"Job {self.job_id} | Aggregator {end.host} finished sending averages"
             f" ({len(self.state.ends_received)}/{self.config.aggregators_count})"
         )
+        self.__check_finished()
+
+    def __check_finished(self) -> None:
         if len(self.state.ends_received) < self.config.aggregators_count:
             return
+        if self.reducer.uses_station_names and self.station_names is None:
+            logging.warning(
+                f"Job {self.job_id} | Received every End before the station names,"
+                " waiting for them"
+            )
+            return
 
-        StatePersistor().remove(self._control_store_key())
-        StatePersistor().remove(self._joiner_store_key())
+        StatePersistor().remove_job(self.job_id)
         self.on_finish(self)
-        self.comms.send(self.job_id, self.reducer.get_value(), force_msg_id=None)
+        self.comms.send(
+            self.job_id,
+            self.reducer.get_value(self.station_names or []),
+            force_msg_id=None,
+        )
 
     def store_state(self) -> None:
         self.store_to(self._control_store_key())
@@ -75,9 +103,13 @@ class JobReducer(Generic[GenericAggregatedRecord], WithState[State]):
     def restore_state(self) -> None:
         self.restore_from(self._control_store_key())
         self.reducer.restore_from(self._joiner_store_key())
+        self.station_names = StatePersistor().load(self._station_names_key(), list[str])
 
     def _control_store_key(self) -> str:
-        return f"control_{self.job_id}"
+        return job_key(self.job_id, "control")
 
     def _joiner_store_key(self) -> str:
-        return f"joiner_{self.job_id}"
+        return job_key(self.job_id, "joiner")
+
+    def _station_names_key(self) -> str:
+        return job_key(self.job_id, "station_names")
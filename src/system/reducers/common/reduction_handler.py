@@ -5,6 +5,7 @@ from common.messages.aggregated import (
     GenericAggregatedRecordContr as GenericAggregatedRecord,
 )
 from common.messages import End, Message
+from common.messages.joined import StationNames
 from common.job_tracker import JobTracker
 
 from .job_reducer import JobReducer, Reducer
@@ -30,8 +31,9 @@ class ReductionHandler(Generic[GenericAggregatedRecord]):
         self.jobs = {}
         self.config = config
         self.reducer_factory = reducer_factory
+        # Jobs in progress are restored on their first message, as until then
+        # there's nothing to do for them
         self.job_tracker = JobTracker()
-        self.job_tracker.restore(self.jobs, self.__reducer)
 
     def run(self) -> None:
         self.comms.set_callback(self.handle_record)
@@ -46,13 +48,18 @@ class ReductionHandler(Generic[GenericAggregatedRecord]):
         self.job_tracker.finished_job(job.job_id)
         self.comms.finished_job(job.job_id)
 
-    def handle_record(self, msg: Message[GenericAggregatedRecord | End]) -> None:
+    def handle_record(
+        self, msg: Message[GenericAggregatedRecord | End | StationNames]
+    ) -> None:
         if msg.job_id in self.job_tracker.state.completed:
             return
 
         if msg.job_id not in self.jobs:
-            logging.info(f"Starting job {msg.job_id}")
-            self.job_tracker.start_job(msg.job_id)
+            if msg.job_id in self.job_tracker.state.in_progress:
+                logging.info(f"Restoring job {msg.job_id}")
+            else:
+                logging.info(f"Starting job {msg.job_id}")
+                self.job_tracker.start_job(msg.job_id)
             handler = self.__reducer(msg.job_id)
             self.jobs[msg.job_id] = handler
 
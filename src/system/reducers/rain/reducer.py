@@ -1,17 +1,17 @@
+from datetime import date
+
 from common.messages.aggregated import DateInfo, PartialRainAverages
 from common.messages.stats import RainAverages, StatsRecord
-from common.persistence import WithState
-
-Averages = dict[str, DateInfo]  # date -> info
+from common.persistence import WithStateIncremental
 
 
-class RainReducer(WithState[Averages]):
-    def __init__(self) -> None:
-        super().__init__({})
+# day ordinal -> info
+class RainReducer(WithStateIncremental[int, DateInfo]):
+    uses_station_names = False
 
     def handle_aggregated(self, avg: PartialRainAverages) -> None:
-        for date, date_average in avg.duration_averages.items():
-            current = self.state.setdefault(date, DateInfo(0, 0))
+        for day, date_average in avg.duration_averages.items():
+            current = self.state.setdefault(day, DateInfo(0, 0))
 
             total_count = current.count + date_average.count
             current_factor = current.count / total_count
@@ -23,5 +23,10 @@ class RainReducer(WithState[Averages]):
             )
             current.count = total_count
 
-    def get_value(self) -> StatsRecord:
-        return RainAverages({x: y.average_duration for x, y in self.state.items()})
+    def get_value(self, station_names: list[str]) -> StatsRecord:
+        return RainAverages(
+            {
+                date.fromordinal(x).isoformat(): y.average_duration
+                for x, y in self.state.items()
+            }
+        )
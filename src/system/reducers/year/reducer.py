@@ -1,42 +1,35 @@
-from dataclasses import dataclass
-
 from common.messages.aggregated import PartialYearCounts
 from common.messages.stats import YearCounts, StatsRecord
-from common.persistence import WithState
+from common.persistence import WithStateIncremental
 
 from .config import Config
 
-
-@dataclass
-class Counts:
-    # station name -> count
-    counts_year_base: dict[str, int]
-    counts_year_compared: dict[str, int]
+YEAR_BASE = 0
+YEAR_COMPARED = 1
 
 
-class YearReducer(WithState[Counts]):
-    def __init__(self) -> None:
-        super().__init__(Counts({}, {}))
+# (YEAR_BASE or YEAR_COMPARED, station id) -> count
+class YearReducer(WithStateIncremental[tuple[int, int], int]):
+    uses_station_names = True
 
     def handle_aggregated(self, counts: PartialYearCounts) -> None:
-        self.__merge_counts(self.state.counts_year_base, counts.counts_year_base)
-        self.__merge_counts(
-            self.state.counts_year_compared, counts.counts_year_compared
-        )
+        self.__merge_counts(YEAR_BASE, counts.counts_year_base)
+        self.__merge_counts(YEAR_COMPARED, counts.counts_year_compared)
 
-    def __merge_counts(
-        self, counts: dict[str, int], other_counts: dict[str, int]
-    ) -> None:
+    def __merge_counts(self, year: int, other_counts: dict[int, int]) -> None:
         for station, count in other_counts.items():
-            counts[station] = counts.get(station, 0) + count
+            key = (year, station)
+            self.state[key] = self.state.get(key, 0) + count
 
-    def get_value(self) -> StatsRecord:
+    def get_value(self, station_names: list[str]) -> StatsRecord:
         result = {}
-        for station, count_year_compared in self.state.counts_year_compared.items():
-            count_year_base = self.state.counts_year_base.get(station, None)
+        for (year, station), count_year_compared in self.state.items():
+            if year != YEAR_COMPARED:
+                continue
+            count_year_base = self.state.get((YEAR_BASE, station), None)
             if (
                 count_year_base is not None
                 and count_year_compared > count_year_base * Config().factor
             ):
-                result[station] = (count_year_base, count_year_compared)
+                result[station_names[station]] = (count_year_base, count_year_compared)
         return YearCounts(result)